@@ -1,13 +1,39 @@
 # aiml/agent.py
 import math
 import random
+import time
+from array import array
 
 from utils import pixel_to_grid, grid_to_pixel_center
-from aiml.pathfinding import astar_pathfinding
+from aiml.pathfinding import astar_pathfinding, DStarLite
+from aiml.qtable import QTable, cell_block, states_for
+from aiml.reservation import cell_step_ticks
+from aiml.view import drone_view
 import config
 
+# shared by every drone without a path; paths are replaced, never edited in place
+_NO_PATH = array("i")
+
+
 class Drone:
-    def __init__(self, id, x, y, image_path):
+    """One drone's simulation state; drawing lives in aiml.view.
+
+    ``path`` holds flat cell indices (row * grid_size + col) in a compact
+    ``array('i')``; ``waypoint(i)`` gives the pixel centre a drone flies to.
+    """
+
+    __slots__ = (
+        "id", "x", "y", "task", "state", "speed", "package", "path", "current_waypoint_index",
+        "battery", "low_battery_threshold", "image_path",
+        "grid_size", "q_table", "q_block", "q_side", "epsilon", "rng",
+        "last_strategic_state", "last_strategic_action", "reward_step", "reward_total",
+        "current_task_pathlen", "incremental_replanning", "planner", "waited", "rewindow_at",
+        "replanned", "plan_ms", "plan_expanded", "strategic_ms",
+        # scratch space of aiml.rl_controller.RLController
+        "prev_dist_x", "prev_dist_y",
+    )
+
+    def __init__(self, id, x, y, image_path=None, q_table=None, rng=None):
         self.id = id
         self.x = float(x)
         self.y = float(y)
@@ -15,19 +41,26 @@ class Drone:
         self.state = "idle"
         self.speed = getattr(config, "DRONE_SPEED", 2.0)
         self.package = False
-        self.path = []
+        self.path = _NO_PATH
         self.current_waypoint_index = 0
         self.battery = getattr(config, "DRONE_BATTERY_START", 100.0)
         self.low_battery_threshold = getattr(config, "DRONE_LOW_BATTERY_THRESHOLD", 20.0)
-
-        # Q-Learning Attributes (kept)
-        size = getattr(config, "GRID_SIZE", 10)
-        self.q_table = {f"{chr(65+r)}{c+1}": [0.0, 0.0] for r in range(size) for c in range(size)}
-        self.learning_rate = 0.1
-        self.discount_factor = 0.9
+        # icon for the (lazily loaded) pygame view
+        self.image_path = image_path
+
+        # Q-Learning Attributes: a view into a (possibly shared) QTable, states are cell ids
+        self.grid_size = getattr(config, "GRID_SIZE", 10)
+        if q_table is None:
+            q_table = QTable(states_for(self.grid_size, max_bytes=getattr(config, "Q_TABLE_MAX_BYTES", None))).view()
+        self.q_table = q_table
+        # on grids larger than the table, blocks of q_block x q_block cells share a state
+        self.q_block = cell_block(self.grid_size, q_table.table.states)
+        self.q_side = -(-self.grid_size // self.q_block)
         self.epsilon = 0.2
+        # exploration draws; the owning Simulation passes its seeded Random
+        self.rng = rng or random
 
-        self.last_strategic_state_label = None
+        self.last_strategic_state = None
         self.last_strategic_action = None
 
         # RL reward tracking
@@ -37,33 +70,52 @@ class Drone:
         # used to compute short-path bonus on delivery
         self.current_task_pathlen = None
 
-        # image load (defensive)
-        try:
-            import pygame
-            self.image = pygame.image.load(image_path).convert_alpha()
-            self.image = pygame.transform.scale(self.image, (40, 40))
-        except Exception:
-            try:
-                import pygame
-                self.image = pygame.Surface((30, 30), pygame.SRCALPHA)
-                pygame.draw.circle(self.image, (0, 255, 0), (15, 15), 15)
-            except Exception:
-                self.image = None
+        # incremental replanning (D* Lite) keeps search state between replans
+        self.incremental_replanning = getattr(config, "INCREMENTAL_REPLANNING", False)
+        self.planner = None
+        # cooperative routing: ticks spent on a wait waypoint, and the waypoint
+        # index at which the next window is reserved (see ReservationTable)
+        self.waited = 0
+        self.rewindow_at = None
+
+        # planning cost of the last update (read by Simulation per tick)
+        self.replanned = False
+        self.plan_ms = 0.0
+        self.plan_expanded = 0
+        self.strategic_ms = 0.0
+
+    # ---------------------------------------------
+    # Waypoints
+    # ---------------------------------------------
+    def waypoint(self, i):
+        """Pixel centre of the i-th waypoint."""
+        return grid_to_pixel_center(divmod(self.path[i], self.grid_size))
+
+    def waypoints(self, start=0):
+        """Pixel centres of the waypoints from ``start`` on."""
+        n = self.grid_size
+        return [grid_to_pixel_center(divmod(c, n)) for c in self.path[start:]]
+
+    def _cells(self, path_grid):
+        n = self.grid_size
+        return array("i", [r * n + c for r, c in path_grid])
 
     def _add_reward(self, amount):
         """Internal helper to add reward for the step and to total."""
         self.reward_step += float(amount)
         self.reward_total += float(amount)
 
+    def _cell_id(self):
+        row, col = pixel_to_grid((self.x, self.y))
+        return (row // self.q_block) * self.q_side + col // self.q_block
+
     def choose_strategic_action(self):
-        current_grid_pos = pixel_to_grid((self.x, self.y))
-        self.last_strategic_state_label = f"{chr(65 + current_grid_pos[0])}{current_grid_pos[1] + 1}"
+        self.last_strategic_state = self._cell_id()
 
-        if random.uniform(0, 1) < self.epsilon:
-            self.last_strategic_action = random.choice([0, 1])
+        if self.rng.uniform(0, 1) < self.epsilon:
+            self.last_strategic_action = self.rng.choice([0, 1])
         else:
-            q_values = self.q_table[self.last_strategic_state_label]
-            self.last_strategic_action = q_values.index(max(q_values))
+            self.last_strategic_action = self.q_table.best_action(self.last_strategic_state)
 
         if self.last_strategic_action == 1:
             depot_coords = grid_to_pixel_center((0, 0))
@@ -76,27 +128,20 @@ class Drone:
 
     def set_task(self, pickup_coords, drop_coords, is_strategic=False):
         # Q-learning update for last strategic choice (kept from previous)
-        if self.last_strategic_state_label is not None and not is_strategic:
+        if self.last_strategic_state is not None and not is_strategic:
             travel_dist = math.hypot(pickup_coords[0] - self.x, pickup_coords[1] - self.y)
             reward = (getattr(config, "WINDOW_WIDTH", 0) - travel_dist) / 100.0
 
             if self.last_strategic_action == 1:
                 reward -= 5.0
 
-            old_q_value = self.q_table[self.last_strategic_state_label][self.last_strategic_action]
-            current_grid_pos = pixel_to_grid((self.x, self.y))
-            next_state_label = f"{chr(65 + current_grid_pos[0])}{current_grid_pos[1] + 1}"
-            future_optimal_value = max(self.q_table[next_state_label])
-            new_q_value = old_q_value + self.learning_rate * (
-                reward + self.discount_factor * future_optimal_value - old_q_value
-            )
-            self.q_table[self.last_strategic_state_label][self.last_strategic_action] = new_q_value
-            self.last_strategic_state_label = None
+            self.q_table.update(self.last_strategic_state, self.last_strategic_action, reward, self._cell_id())
+            self.last_strategic_state = None
 
         self.task = {"pickup": pickup_coords, "drop": drop_coords, "is_strategic_move": is_strategic}
         self.state = "to_pickup"
         self.package = False
-        self.path = []
+        self.path = _NO_PATH
         self.current_waypoint_index = 0
         self.current_task_pathlen = None
         # no immediate reward here
@@ -123,13 +168,19 @@ class Drone:
         if not self.path or self.current_waypoint_index >= len(self.path):
             return True, log_message
 
-        target_pos = self.path[self.current_waypoint_index]
-        tx, ty = target_pos
+        target = self.path[self.current_waypoint_index]
+        tx, ty = grid_to_pixel_center(divmod(target, self.grid_size))
         dx, dy = tx - self.x, ty - self.y
         dist = math.hypot(dx, dy)
 
         tolerance = getattr(config, "WAYPOINT_TOLERANCE", 1.0)
         if dist <= self.speed + tolerance:
+            if dist == 0 and self.current_waypoint_index and self.path[self.current_waypoint_index - 1] == target:
+                # a repeated waypoint (cooperative routing): hover for one cell step
+                self.waited += 1
+                if self.waited < cell_step_ticks(self.speed, config.CELL_SIZE, tolerance):
+                    return False, log_message
+                self.waited = 0
             self.x, self.y = float(tx), float(ty)
             self.current_waypoint_index += 1
             if self.current_waypoint_index >= len(self.path):
@@ -140,9 +191,108 @@ class Drone:
         self.y += (dy / dist) * self.speed
         return False, log_message
 
-    def update(self, obstacle_grid_coords):
+    def coast(self, ticks, obstacle_grid_coords, reservations=None):
+        """Apply up to ``ticks`` uneventful ticks at once; returns how many were applied.
+
+        An uneventful tick is one where update() would only drain the
+        battery and fly towards the next waypoint (or hover on a wait
+        waypoint) without reaching it. The same float operations run in the
+        same order, so coasting n ticks and then calling update() leaves the
+        drone exactly as n + 1 update() calls would. Coasting stops before
+        the first tick that reaches a waypoint, needs a plan or a new
+        reservation window, finds its cells blocked or runs out of battery.
+        """
+        if self.task is None or not self.path or self.current_waypoint_index >= len(self.path):
+            return 0
+        if reservations is not None and self.rewindow_at is not None and self.current_waypoint_index >= self.rewindow_at:
+            return 0
+        target = self.path[self.current_waypoint_index]
+        target_grid = divmod(target, self.grid_size)
+        if target_grid in obstacle_grid_coords:
+            return 0
+        tx, ty = grid_to_pixel_center(target_grid)
+        speed = self.speed
+        reach = speed + getattr(config, "WAYPOINT_TOLERANCE", 1.0)
+        drain = getattr(config, "DRAIN_RATE_WITH_PACKAGE", 0.05) if self.package else getattr(config, "DRAIN_RATE_IDLE", 0.02)
+        move = float(getattr(config, "REWARD_MOVE", -0.05))
+        hover = (self.current_waypoint_index and self.path[self.current_waypoint_index - 1] == target)
+        hover_ticks = cell_step_ticks(speed, config.CELL_SIZE, getattr(config, "WAYPOINT_TOLERANCE", 1.0))
+        done = 0
+        while done < ticks and self.battery > 0:
+            dx, dy = tx - self.x, ty - self.y
+            dist = math.hypot(dx, dy)
+            if dist <= reach:
+                if not (hover and dist == 0 and self.waited + 1 < hover_ticks):
+                    break
+                self.waited += 1
+            else:
+                if pixel_to_grid((self.x, self.y)) in obstacle_grid_coords:
+                    break
+                self.x += (dx / dist) * speed
+                self.y += (dy / dist) * speed
+            self.battery -= drain
+            self.reward_step = 0.0 + move
+            self.reward_total += move
+            done += 1
+        if done:
+            self.replanned = False
+            self.plan_ms = 0.0
+            self.plan_expanded = 0
+            self.strategic_ms = 0.0
+        return done
+
+    def plan_path(self, start_grid, end_grid, obstacle_grid_coords, path_cache=None, changes=None):
+        """Grid path from start to end using the incremental planner, the shared cache or plain A*.
+
+        ``changes`` (a ChangeLog of obstacle toggles) lets the incremental
+        planner catch up without diffing the whole grid."""
+        t0 = time.perf_counter()
+        stats = {"expanded": 0}
+        if self.incremental_replanning:
+            planner = self.planner
+            if planner is None or planner.goal != end_grid:
+                planner = self.planner = DStarLite(getattr(config, "GRID_SIZE", 10), start_grid, end_grid,
+                                                   obstacle_grid_coords, changes)
+            else:
+                planner.move_start(start_grid)
+                planner.update_obstacles(obstacle_grid_coords, changes)
+            expanded_before = planner.expanded
+            path_grid = planner.find_path()
+            stats["expanded"] = planner.expanded - expanded_before
+        elif path_cache is not None:
+            path_grid = path_cache.find_path(start_grid, end_grid, obstacle_grid_coords, stats)
+        else:
+            path_grid = astar_pathfinding(getattr(config, "GRID_SIZE", 10), start_grid, end_grid, obstacle_grid_coords, stats)
+        self.plan_ms += (time.perf_counter() - t0) * 1000.0
+        self.plan_expanded += stats["expanded"]
+        return path_grid
+
+    def _reserve(self, path_grid, reservations, obstacle_grid_coords):
+        """Route the next window of ``path_grid`` around other drones' reservations."""
+        t0 = time.perf_counter()
+        stats = {"expanded": 0}
+        cells, reserved = reservations.plan(self.id, path_grid, obstacle_grid_coords, stats)
+        # re-reserve once half of the window is flown, unless it already ends at the goal
+        if reserved < len(cells):
+            self.rewindow_at = max(1, reserved - reservations.window // 2)
+        else:
+            self.rewindow_at = None
+        self.plan_ms += (time.perf_counter() - t0) * 1000.0
+        self.plan_expanded += stats["expanded"]
+        return cells
+
+    def update(self, obstacle_grid_coords, path_cache=None, blocked=None, reservations=None, changes=None):
+        """Advance one tick. ``blocked`` may carry a precomputed answer to
+        "is my current cell or next waypoint an obstacle" (Simulation gets it
+        from its spatial index); when None it is checked here. With a
+        ReservationTable, paths are planned cooperatively (see aiml.reservation);
+        ``changes`` is passed on to plan_path."""
         # reset step reward at beginning of update (so UI shows reward_step for this step)
         self.reward_step = 0.0
+        self.replanned = False
+        self.plan_ms = 0.0
+        self.plan_expanded = 0
+        self.strategic_ms = 0.0
         log_message = None
 
         if self.task is None:
@@ -152,26 +302,38 @@ class Drone:
 
         # dynamic replanning: if next waypoint or current cell is blocked -> replan and give small positive reward for avoiding
         if self.path and self.current_waypoint_index < len(self.path):
-            next_waypoint_pixel = self.path[self.current_waypoint_index]
-            next_waypoint_grid = pixel_to_grid(next_waypoint_pixel)
-            current_grid = pixel_to_grid((self.x, self.y))
-
-            if next_waypoint_grid in obstacle_grid_coords or current_grid in obstacle_grid_coords:
-                self.path = []
+            if blocked is None:
+                next_waypoint_grid = divmod(self.path[self.current_waypoint_index], self.grid_size)
+                current_grid = pixel_to_grid((self.x, self.y))
+                blocked = next_waypoint_grid in obstacle_grid_coords or current_grid in obstacle_grid_coords
+
+            if blocked:
+                self.path = _NO_PATH
+                self.replanned = True
                 self._add_reward(getattr(config, "REWARD_AVOID", 1.0))
                 log_message = f"Bot {self.id} obstacle detected — replanning. (+{getattr(config,'REWARD_AVOID',1.0):.2f})"
+            elif reservations is not None and self.rewindow_at is not None and self.current_waypoint_index >= self.rewindow_at:
+                # the drone stands on the waypoint it just reached: reserve the next window from here
+                rest = self.path[self.current_waypoint_index - 1:]
+                route = [divmod(cell, self.grid_size) for i, cell in enumerate(rest) if i == 0 or cell != rest[i - 1]]
+                self.path = self._cells(self._reserve(route, reservations, obstacle_grid_coords))
+                self.current_waypoint_index = 1
+                self.waited = 0
 
         # compute path if needed
         if not self.path:
             start_grid = pixel_to_grid((self.x, self.y))
             end_grid = pixel_to_grid(self.task["pickup"]) if self.state == "to_pickup" else pixel_to_grid(self.task["drop"])
 
-            path_grid = astar_pathfinding(getattr(config, "GRID_SIZE", 10), start_grid, end_grid, obstacle_grid_coords)
+            path_grid = self.plan_path(start_grid, end_grid, obstacle_grid_coords, path_cache, changes)
 
             if path_grid:
-                self.path = [grid_to_pixel_center(p) for p in path_grid]
-                self.current_waypoint_index = 0
                 self.current_task_pathlen = len(path_grid)  # store for short-path bonus
+                if reservations is not None:
+                    path_grid = self._reserve(path_grid, reservations, obstacle_grid_coords)
+                self.path = self._cells(path_grid)
+                self.current_waypoint_index = 0
+                self.waited = 0
             else:
                 # could not find path -> penalty
                 self._add_reward(getattr(config, "REWARD_BLOCKED", -5.0))
@@ -184,13 +346,17 @@ class Drone:
         if move_log:
             log_message = (log_message if log_message else "") + move_log
 
+        # battery ran out during the move: the task was dropped
+        if self.task is None:
+            return log_message
+
         if reached_destination:
             # strategic move finish
             if self.task.get("is_strategic_move", False):
                 # no extra reward beyond the return base applied earlier
                 self.task = None
                 self.state = "idle"
-                self.path = []
+                self.path = _NO_PATH
                 return log_message
 
             if self.state == "to_pickup":
@@ -198,7 +364,7 @@ class Drone:
                 self.x, self.y = self.task["pickup"]
                 self.state = "to_drop"
                 self.package = True
-                self.path = []
+                self.path = _NO_PATH
                 self._add_reward(getattr(config, "REWARD_PICKUP", 5.0))
                 log_message = (log_message or "") + f"Bot {self.id} reached pickup. (+{getattr(config,'REWARD_PICKUP',5.0):.2f})"
             elif self.state == "to_drop":
@@ -219,9 +385,11 @@ class Drone:
                 # reset state
                 self.task = None
                 self.state = "idle"
-                self.path = []
+                self.path = _NO_PATH
                 # after delivery, may choose strategic action
+                t0 = time.perf_counter()
                 strategic_msg = self.choose_strategic_action()
+                self.strategic_ms = (time.perf_counter() - t0) * 1000.0
                 # choose_strategic_action may add return_base reward and will also set a task if returning
                 if strategic_msg:
                     log_message = (log_message or "") + " " + strategic_msg
@@ -229,21 +397,6 @@ class Drone:
         # return log message (string), reward_step accessible via attributes
         return log_message
 
-    def draw(self, surface, font):
-        try:
-            import pygame
-            if self.path and len(self.path) > self.current_waypoint_index:
-                points = [(self.x, self.y)] + self.path[self.current_waypoint_index:]
-                pygame.draw.lines(surface, getattr(config, "PATH_COLOR", (0, 120, 255)), False, points, 2)
-
-            if self.image:
-                img_rect = self.image.get_rect(center=(int(self.x), int(self.y)))
-                surface.blit(self.image, img_rect)
-
-            label = font.render(f"Bot {self.id}", True, getattr(config, "INFO_TEXT_COLOR", (0, 0, 0)))
-            surface.blit(label, (self.x - 15, self.y - 35))
-
-            if self.package:
-                pygame.draw.rect(surface, (255, 255, 0), (int(self.x) - 4, int(self.y) + 12, 8, 8))
-        except Exception:
-            pass
\ No newline at end of file
+    def draw(self, surface, font, view=None):
+        """Draw with ``view`` (default: the shared pygame view for this drone's icon)."""
+        (view or drone_view(self.image_path or "drone_icon.png")).draw(self, surface, font)
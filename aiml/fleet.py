@@ -0,0 +1,475 @@
+# aiml/fleet.py
+import math
+import random
+import time
+from array import array
+
+import numpy as np
+
+from utils import drone_home, pixel_to_grid, grid_to_pixel_center
+from aiml.occupancy import OccupancyGrid
+from aiml.pathfinding import astar_pathfinding, DStarLite
+from aiml.qtable import QTable, cell_block, states_for
+from aiml.reservation import cell_step_ticks
+import config
+
+# state codes (index into STATE_NAMES)
+IDLE = 0
+TO_PICKUP = 1
+TO_DROP = 2
+DROPPING = 3
+STATE_NAMES = ["idle", "to_pickup", "to_drop", "dropping"]
+
+_NO_PATH = array("i")
+
+
+# ---------------------------------------------
+# math.hypot, vectorized
+# ---------------------------------------------
+# np.hypot differs from math.hypot in the last bit for about one pair in
+# 200, which is enough for a fleet to drift away from Drone. These follow
+# CPython's vector_norm (scaled, error-free squares and one correction step).
+def _split(x):
+    t = x * 134217729.0  # 2 ** 27 + 1
+    hi = t - (t - x)
+    return hi, x - hi
+
+
+def _two_product(a, b):
+    """a * b rounded, and its exact rounding error."""
+    z = a * b
+    ah, al = _split(a)
+    bh, bl = _split(b)
+    return z, al * bl - (((z - ah * bh) - al * bh) - ah * bl)
+
+
+def _fast_sum(a, b):
+    x = a + b
+    return x, b - (x - a)
+
+
+def _hypot(dx, dy):
+    ax = np.abs(dx)
+    ay = np.abs(dy)
+    top = np.maximum(ax, ay)
+    _, exponent = np.frexp(top)
+    scale = np.ldexp(1.0, -exponent)
+    csum = np.ones_like(top)
+    frac1 = np.zeros_like(top)
+    frac2 = np.zeros_like(top)
+    for v in (ax, ay):
+        v = v * scale
+        hi, lo = _two_product(v, v)
+        csum, rest = _fast_sum(csum, hi)
+        frac1 += lo
+        frac2 += rest
+    with np.errstate(invalid="ignore", divide="ignore"):
+        h = np.sqrt(csum - 1.0 + (frac1 + frac2))
+        hi, lo = _two_product(-h, h)
+        csum, rest = _fast_sum(csum, hi)
+        frac1 += lo
+        frac2 += rest
+        h += (csum - 1.0 + (frac1 + frac2)) / (2.0 * h)
+        h /= scale
+    return np.where(top == 0, 0.0, h)
+
+
+class Fleet:
+    """Struct-of-arrays drone fleet.
+
+    Holds what a list of ``Drone`` objects holds, one NumPy array per field,
+    and moves every drone in a single vectorized pass. Per-drone Python work
+    is limited to the sparse events of a tick (obstacle hits, reservation
+    windows, planning, hovering on a wait waypoint, pickup and delivery),
+    run in drone order so that shared state (the ReservationTable, the rng,
+    a shared Q-table) sees the same calls as a loop of ``Drone.update``.
+    ``step`` matches that loop tick for tick, float for float; see
+    benchmarks/bench_fleet.py.
+    """
+
+    def __init__(self, count, positions=None, q_table=None, rng=None):
+        self.count = count
+        self.grid_size = getattr(config, "GRID_SIZE", 10)
+        self.cell_size = getattr(config, "CELL_SIZE", 60)
+
+        # config is read once here instead of on every move
+        self.tolerance = getattr(config, "WAYPOINT_TOLERANCE", 1.0)
+        self.drain_package = getattr(config, "DRAIN_RATE_WITH_PACKAGE", 0.05)
+        self.drain_idle = getattr(config, "DRAIN_RATE_IDLE", 0.02)
+        self.reward_move = float(getattr(config, "REWARD_MOVE", -0.05))
+        self.reward_avoid = float(getattr(config, "REWARD_AVOID", 1.0))
+        self.reward_blocked = float(getattr(config, "REWARD_BLOCKED", -5.0))
+        self.reward_low_battery = float(getattr(config, "REWARD_LOW_BATTERY", -3.0))
+        self.reward_pickup = float(getattr(config, "REWARD_PICKUP", 5.0))
+        self.reward_deliver = float(getattr(config, "REWARD_DELIVER", 10.0))
+        self.reward_return = float(getattr(config, "REWARD_RETURN_BASE", 2.0))
+        self.short_path_multiplier = getattr(config, "REWARD_SHORT_PATH_MULTIPLIER", 0.5)
+        self.window_width = getattr(config, "WINDOW_WIDTH", 0)
+        self.incremental_replanning = getattr(config, "INCREMENTAL_REPLANNING", False)
+
+        self.ids = np.arange(1, count + 1)
+        if positions is None:
+            positions = [drone_home(i) for i in range(count)]
+        pos = np.asarray(positions, dtype=np.float64).reshape(count, 2)
+        self.x = pos[:, 0].copy()
+        self.y = pos[:, 1].copy()
+        self.speed = np.full(count, getattr(config, "DRONE_SPEED", 2.0), dtype=np.float64)
+        self.battery = np.full(count, getattr(config, "DRONE_BATTERY_START", 100.0), dtype=np.float64)
+        self.low_battery_threshold = getattr(config, "DRONE_LOW_BATTERY_THRESHOLD", 20.0)
+
+        self.state = np.zeros(count, dtype=np.int8)
+        self.has_task = np.zeros(count, dtype=bool)
+        self.strategic = np.zeros(count, dtype=bool)
+        self.package = np.zeros(count, dtype=bool)
+        self.pickup = np.zeros((count, 2), dtype=np.float64)
+        self.drop = np.zeros((count, 2), dtype=np.float64)
+
+        # paths: one array('i') of flat cell ids per drone, as in Drone,
+        # plus the current target cell and its pixel centre
+        self.paths = [_NO_PATH] * count
+        self.path_len = np.zeros(count, dtype=np.int32)
+        self.wp = np.zeros(count, dtype=np.int32)
+        self.target = np.zeros(count, dtype=np.int64)
+        self.target_x = np.zeros(count, dtype=np.float64)
+        self.target_y = np.zeros(count, dtype=np.float64)
+        self.task_pathlen = np.full(count, -1, dtype=np.int32)
+        # cooperative routing: ticks hovered on a wait waypoint, and the
+        # waypoint index that triggers the next reservation window (-1: none)
+        self.waited = np.zeros(count, dtype=np.int32)
+        self.rewindow_at = np.full(count, -1, dtype=np.int32)
+        # D* Lite state per drone (INCREMENTAL_REPLANNING)
+        self.planners = [None] * count
+
+        self.reward_step = np.zeros(count, dtype=np.float64)
+        self.reward_total = np.zeros(count, dtype=np.float64)
+
+        # strategic Q-learning: a slice per drone, or slice 0 for all when the table has one
+        if q_table is None:
+            q_table = QTable(states_for(self.grid_size, count, max_bytes=getattr(config, "Q_TABLE_MAX_BYTES", None)),
+                             agents=count)
+        self.q_table = q_table
+        self.q_agent = np.zeros(count, dtype=np.int64) if q_table.agents == 1 else np.arange(count)
+        self.q_block = cell_block(self.grid_size, q_table.states)
+        self.q_side = -(-self.grid_size // self.q_block)
+        self.epsilon = 0.2
+        # exploration draws, in drone order
+        self.rng = rng or random
+        self.last_strategic_state = np.full(count, -1, dtype=np.int64)
+        self.last_strategic_action = np.zeros(count, dtype=np.int8)
+
+        # planning cost of the last step
+        self.replanned = np.zeros(count, dtype=bool)
+        self.plan_ms = np.zeros(count, dtype=np.float64)
+        self.plan_expanded = np.zeros(count, dtype=np.int64)
+        self.strategic_ms = np.zeros(count, dtype=np.float64)
+
+    # ---------------------------------------------
+    # Grid helpers
+    # ---------------------------------------------
+    def _cells_at(self, idx):
+        """Flat cell ids under drones ``idx`` (vectorized utils.pixel_to_grid)."""
+        last = self.grid_size - 1
+        col = np.clip((self.x[idx] // self.cell_size).astype(np.int64), 0, last)
+        row = np.clip((self.y[idx] // self.cell_size).astype(np.int64), 0, last)
+        return row * self.grid_size + col
+
+    def _cell_id(self, i):
+        row, col = pixel_to_grid((self.x[i], self.y[i]))
+        return (row // self.q_block) * self.q_side + col // self.q_block
+
+    def _blocked_cells(self, obstacles):
+        if isinstance(obstacles, OccupancyGrid) and obstacles.size == self.grid_size:
+            return obstacles.array.reshape(-1)
+        return OccupancyGrid(self.grid_size, obstacles).array.reshape(-1)
+
+    def _add_reward(self, i, amount):
+        self.reward_step[i] += amount
+        self.reward_total[i] += amount
+
+    def _cells(self, path_grid):
+        n = self.grid_size
+        return array("i", [r * n + c for r, c in path_grid])
+
+    def _set_path(self, i, cells, start):
+        self.paths[i] = cells
+        self.path_len[i] = len(cells)
+        self.wp[i] = start
+        self._set_target(i)
+
+    def _clear_path(self, i):
+        self.paths[i] = _NO_PATH
+        self.path_len[i] = 0
+
+    def _set_target(self, i):
+        if self.wp[i] < self.path_len[i]:
+            cell = self.paths[i][self.wp[i]]
+            self.target[i] = cell
+            self.target_x[i], self.target_y[i] = grid_to_pixel_center(divmod(cell, self.grid_size))
+
+    # ---------------------------------------------
+    # Tasks and strategic decisions (Drone.set_task / choose_strategic_action)
+    # ---------------------------------------------
+    def set_task(self, i, pickup_coords, drop_coords, is_strategic=False):
+        if self.last_strategic_state[i] >= 0 and not is_strategic:
+            travel_dist = math.hypot(pickup_coords[0] - self.x[i], pickup_coords[1] - self.y[i])
+            reward = (self.window_width - travel_dist) / 100.0
+            action = int(self.last_strategic_action[i])
+            if action == 1:
+                reward -= 5.0
+            self.q_table.update(self.last_strategic_state[i], action, reward, self._cell_id(i), self.q_agent[i])
+            self.last_strategic_state[i] = -1
+
+        self.pickup[i] = pickup_coords
+        self.drop[i] = drop_coords
+        self.has_task[i] = True
+        self.strategic[i] = is_strategic
+        self.state[i] = TO_PICKUP
+        self.package[i] = False
+        self._clear_path(i)
+        self.wp[i] = 0
+        self.task_pathlen[i] = -1
+
+    def choose_strategic_action(self, i):
+        state = self._cell_id(i)
+        self.last_strategic_state[i] = state
+
+        if self.rng.uniform(0, 1) < self.epsilon:
+            action = self.rng.choice([0, 1])
+        else:
+            action = self.q_table.best_action(state, self.q_agent[i])
+        self.last_strategic_action[i] = action
+
+        drone_id = self.ids[i]
+        if action == 1:
+            depot_coords = grid_to_pixel_center((0, 0))
+            self.set_task(i, depot_coords, depot_coords, is_strategic=True)
+            self._add_reward(i, self.reward_return)
+            return f"Bot {drone_id} returning to depot. (+{self.reward_return:.2f})"
+        return f"Bot {drone_id} staying idle."
+
+    # ---------------------------------------------
+    # Planning (Drone.plan_path / _reserve)
+    # ---------------------------------------------
+    def _plan(self, i, start_grid, end_grid, obstacle_grid_coords, path_cache, changes):
+        t0 = time.perf_counter()
+        stats = {"expanded": 0}
+        if self.incremental_replanning:
+            planner = self.planners[i]
+            if planner is None or planner.goal != end_grid:
+                planner = self.planners[i] = DStarLite(self.grid_size, start_grid, end_grid,
+                                                       obstacle_grid_coords, changes)
+            else:
+                planner.move_start(start_grid)
+                planner.update_obstacles(obstacle_grid_coords, changes)
+            expanded_before = planner.expanded
+            path_grid = planner.find_path()
+            stats["expanded"] = planner.expanded - expanded_before
+        elif path_cache is not None:
+            path_grid = path_cache.find_path(start_grid, end_grid, obstacle_grid_coords, stats)
+        else:
+            path_grid = astar_pathfinding(self.grid_size, start_grid, end_grid, obstacle_grid_coords, stats)
+        self.plan_ms[i] += (time.perf_counter() - t0) * 1000.0
+        self.plan_expanded[i] += stats["expanded"]
+        return path_grid
+
+    def _reserve(self, i, path_grid, reservations, obstacle_grid_coords):
+        t0 = time.perf_counter()
+        stats = {"expanded": 0}
+        cells, reserved = reservations.plan(int(self.ids[i]), path_grid, obstacle_grid_coords, stats)
+        self.rewindow_at[i] = max(1, reserved - reservations.window // 2) if reserved < len(cells) else -1
+        self.plan_ms[i] += (time.perf_counter() - t0) * 1000.0
+        self.plan_expanded[i] += stats["expanded"]
+        return cells
+
+    def _route(self, i, obstacle_grid_coords, path_cache, reservations, changes):
+        """Plan drone ``i``'s path to its current goal; returns a log line on failure."""
+        start_grid = pixel_to_grid((self.x[i], self.y[i]))
+        goal = self.pickup[i] if self.state[i] == TO_PICKUP else self.drop[i]
+        end_grid = pixel_to_grid(goal)
+        path_grid = self._plan(i, start_grid, end_grid, obstacle_grid_coords, path_cache, changes)
+        if path_grid:
+            self.task_pathlen[i] = len(path_grid)
+            if reservations is not None:
+                path_grid = self._reserve(i, path_grid, reservations, obstacle_grid_coords)
+            self._set_path(i, self._cells(path_grid), 0)
+            self.waited[i] = 0
+            return None
+        self._add_reward(i, self.reward_blocked)
+        self.has_task[i] = False
+        self.state[i] = IDLE
+        return f"Bot {self.ids[i]} cannot find path. (-{abs(self.reward_blocked):.2f})"
+
+    def _rewindow(self, i, obstacle_grid_coords, reservations):
+        # the drone stands on the waypoint it just reached: reserve the next window from here
+        rest = self.paths[i][self.wp[i] - 1:]
+        route = [divmod(cell, self.grid_size) for k, cell in enumerate(rest) if k == 0 or cell != rest[k - 1]]
+        self._set_path(i, self._cells(self._reserve(i, route, reservations, obstacle_grid_coords)), 1)
+        self.waited[i] = 0
+
+    # ---------------------------------------------
+    # Step
+    # ---------------------------------------------
+    def step(self, obstacle_grid_coords, path_cache=None, reservations=None, changes=None):
+        """Advance every drone by one tick; returns the log lines in drone order.
+
+        Takes what ``Drone.update`` takes; the caller advances
+        ``reservations`` to the tick first, as Simulation.step does.
+        """
+        logs = {}
+        self.reward_step[:] = 0.0
+        self.replanned[:] = False
+        self.plan_ms[:] = 0.0
+        self.plan_expanded[:] = 0
+        self.strategic_ms[:] = 0.0
+        self.state[~self.has_task] = IDLE
+
+        active = np.flatnonzero(self.has_task)
+        if active.size == 0:
+            return []
+        blocked = self._blocked_cells(obstacle_grid_coords)
+
+        # dynamic replanning when the next waypoint or current cell is blocked,
+        # else a new reservation window once half of the last one is flown
+        following = active[self.wp[active] < self.path_len[active]]
+        hit = blocked[self.target[following]] | blocked[self._cells_at(following)]
+        rewindow = np.zeros(0, dtype=following.dtype)
+        if reservations is not None:
+            clear = following[~hit]
+            due = self.rewindow_at[clear]
+            rewindow = clear[(due >= 0) & (self.wp[clear] >= due)]
+        hit = following[hit]
+        events = np.union1d(np.union1d(hit, rewindow), active[self.path_len[active] == 0])
+        if events.size:
+            hit_mask = np.zeros(self.count, dtype=bool)
+            hit_mask[hit] = True
+            for i in events:
+                if hit_mask[i]:
+                    self._clear_path(i)
+                    self.replanned[i] = True
+                    self._add_reward(i, self.reward_avoid)
+                    logs[i] = f"Bot {self.ids[i]} obstacle detected — replanning. (+{self.reward_avoid:.2f})"
+                elif self.path_len[i]:
+                    self._rewindow(i, obstacle_grid_coords, reservations)
+                if not self.path_len[i]:
+                    msg = self._route(i, obstacle_grid_coords, path_cache, reservations, changes)
+                    if msg:
+                        logs[i] = msg
+
+        # battery drain and movement shaping (Drone.move_along_path)
+        moving = np.flatnonzero(self.has_task)
+        self.reward_step[moving] = 0.0
+        charged = self.battery[moving] > 0
+        for i in moving[~charged]:
+            self.battery[i] = 0.0
+            self._add_reward(i, self.reward_low_battery)
+            logs[i] = (logs.get(i) or "") + f"Bot {self.ids[i]} out of battery. (-{abs(self.reward_low_battery):.2f})"
+            self.has_task[i] = False
+            self.state[i] = IDLE
+        moving = moving[charged]
+        self.battery[moving] -= np.where(self.package[moving], self.drain_package, self.drain_idle)
+        self.reward_step[moving] += self.reward_move
+        self.reward_total[moving] += self.reward_move
+
+        at_end = self.wp[moving] >= self.path_len[moving]
+        reached = [moving[at_end]]
+        going = moving[~at_end]
+        if going.size:
+            dx = self.target_x[going] - self.x[going]
+            dy = self.target_y[going] - self.y[going]
+            dist = _hypot(dx, dy)
+            snap = dist <= self.speed[going] + self.tolerance
+
+            # a repeated waypoint (cooperative routing): hover for one cell step
+            hold = np.zeros_like(snap)
+            for k in np.flatnonzero(snap & (dist == 0) & (self.wp[going] > 0)):
+                i = going[k]
+                if self.paths[i][self.wp[i] - 1] == self.target[i]:
+                    self.waited[i] += 1
+                    if self.waited[i] < cell_step_ticks(self.speed[i], self.cell_size, self.tolerance):
+                        snap[k] = False
+                        hold[k] = True
+                    else:
+                        self.waited[i] = 0
+
+            steer = ~snap & ~hold
+            ids = going[steer]
+            self.x[ids] += (dx[steer] / dist[steer]) * self.speed[ids]
+            self.y[ids] += (dy[steer] / dist[steer]) * self.speed[ids]
+
+            ids = going[snap]
+            self.x[ids] = self.target_x[ids]
+            self.y[ids] = self.target_y[ids]
+            self.wp[ids] += 1
+            done = self.wp[ids] >= self.path_len[ids]
+            reached.append(ids[done])
+            for i in ids[~done]:
+                self._set_target(i)
+
+        for i in np.sort(np.concatenate(reached)):
+            msg = self._on_reached(i, logs.get(i))
+            if msg:
+                logs[i] = msg
+
+        return [logs[i] for i in sorted(logs)]
+
+    def _on_reached(self, i, log_message):
+        if self.strategic[i]:
+            self.has_task[i] = False
+            self.state[i] = IDLE
+            self._clear_path(i)
+            return log_message
+
+        drone_id = self.ids[i]
+        state = self.state[i]
+        if state == TO_PICKUP:
+            self.x[i], self.y[i] = self.pickup[i]
+            self.state[i] = TO_DROP
+            self.package[i] = True
+            self._clear_path(i)
+            self._add_reward(i, self.reward_pickup)
+            log_message = (log_message or "") + f"Bot {drone_id} reached pickup. (+{self.reward_pickup:.2f})"
+        elif state == TO_DROP:
+            self.state[i] = DROPPING
+        elif state == DROPPING:
+            self.package[i] = False
+            self._add_reward(i, self.reward_deliver)
+            bonus = 0.0
+            if self.task_pathlen[i] >= 0:
+                bonus = max(0.0, (self.grid_size - int(self.task_pathlen[i]))) * self.short_path_multiplier
+                if bonus > 0:
+                    self._add_reward(i, bonus)
+            total_gain = self.reward_deliver + bonus
+            log_message = (log_message or "") + f"Bot {drone_id} delivered the package. (+{total_gain:.2f})"
+
+            self.has_task[i] = False
+            self.state[i] = IDLE
+            self._clear_path(i)
+            t0 = time.perf_counter()
+            strategic_msg = self.choose_strategic_action(i)
+            self.strategic_ms[i] = (time.perf_counter() - t0) * 1000.0
+            if strategic_msg:
+                log_message = (log_message or "") + " " + strategic_msg
+        return log_message
+
+    # ---------------------------------------------
+    # Views
+    # ---------------------------------------------
+    def drone_state(self, i):
+        """Same dict shape Simulation.get_state emits for a Drone."""
+        task = None
+        if self.has_task[i]:
+            task = {
+                "pickup": tuple(self.pickup[i].tolist()),
+                "drop": tuple(self.drop[i].tolist()),
+                "is_strategic_move": bool(self.strategic[i]),
+            }
+        return {
+            "id": int(self.ids[i]),
+            "x": float(self.x[i]),
+            "y": float(self.y[i]),
+            "state": STATE_NAMES[self.state[i]],
+            "battery": float(self.battery[i]),
+            "task": task,
+            "reward_step": float(self.reward_step[i]),
+            "reward_total": float(self.reward_total[i]),
+        }
@@ -0,0 +1,346 @@
+# aiml/hpa.py
+import heapq
+
+from aiml.pathfinding import MOVES
+
+# entrances at least this wide get a transition at each end instead of one in the middle
+_WIDE_ENTRANCE = 6
+
+
+class HierarchicalPlanner:
+    """HPA* (hierarchical path-finding A*) over square clusters of cells.
+
+    The grid is cut into ``cluster_size`` x ``cluster_size`` clusters. Each
+    border between two neighbouring clusters is scanned for entrances (runs
+    of cells free on both sides); an entrance contributes one or two
+    transitions, pairs of cells facing each other across the border. Their
+    cells are the nodes of an abstract graph: linked across the border at
+    cost 1 and, inside a cluster, by their breadth-first distances within
+    that cluster.
+
+    Clusters are built the first time a search reaches them and cached;
+    :meth:`update_cell` drops only the clusters (and borders) a toggled cell
+    can change. A query links start and goal to the nodes of their clusters,
+    runs A* over the abstract graph and refines each abstract edge into cells
+    with a search limited to one cluster, so work grows with the route and
+    not with the map. Paths are valid and close to, but not always, shortest.
+
+    A ``weight`` above 1 inflates the abstract heuristic: far fewer clusters
+    are visited (and built) on long routes, and the abstract route costs at
+    most ``weight`` times the best one.
+
+    ``find_path`` has the PathCache signature, so it can back a PathCache or
+    be passed to Drone.update as the planner itself.
+    """
+
+    def __init__(self, grid_size, obstacles, cluster_size=16, weight=1.0):
+        self.grid_size = grid_size
+        self.cluster_size = cluster_size
+        self.weight = weight
+        self.clusters_per_side = -(-grid_size // cluster_size)
+        self.bind(obstacles)
+
+    def bind(self, obstacles):
+        """Plan against ``obstacles`` (an OccupancyGrid) from now on; drops every cluster."""
+        self.blocked = obstacles.flat
+        self.reset()
+
+    def reset(self):
+        # (kind, cluster row, cluster col) -> [(cell, cell across)]; "e": east border, "s": south
+        self._borders = {}
+        # (cluster row, cluster col) -> {node cell: [(neighbour cell, cost)]}
+        self._clusters = {}
+        self.built = 0
+
+    def __len__(self):
+        return len(self._clusters)
+
+    # ---------------------------------------------
+    # Abstract graph
+    # ---------------------------------------------
+    def _bounds(self, cr, cc):
+        k = self.cluster_size
+        n = self.grid_size
+        return cr * k, min(cr * k + k, n), cc * k, min(cc * k + k, n)
+
+    def _border(self, kind, cr, cc):
+        key = (kind, cr, cc)
+        transitions = self._borders.get(key)
+        if transitions is not None:
+            return transitions
+        n = self.grid_size
+        blocked = self.blocked
+        r0, r1, c0, c1 = self._bounds(cr, cc)
+        if kind == "e":
+            # column c1 - 1 of this cluster faces column c1 of the next one
+            pairs = [((r * n + c1 - 1), (r * n + c1)) for r in range(r0, r1)]
+        else:
+            pairs = [(((r1 - 1) * n + c), (r1 * n + c)) for c in range(c0, c1)]
+        transitions = []
+        run = []
+        for pair in pairs + [None]:
+            if pair is not None and not blocked[pair[0]] and not blocked[pair[1]]:
+                run.append(pair)
+                continue
+            if run:
+                if len(run) >= _WIDE_ENTRANCE:
+                    transitions += [run[0], run[-1]]
+                else:
+                    transitions.append(run[len(run) // 2])
+                run = []
+        self._borders[key] = transitions
+        return transitions
+
+    def _cluster(self, cr, cc):
+        """The abstract edges of the nodes in cluster (cr, cc), built on first use."""
+        graph = self._clusters.get((cr, cc))
+        if graph is not None:
+            return graph
+        last = self.clusters_per_side - 1
+        crossings = []
+        # transitions are stored once per border: (own cell, cell across) from either side
+        if cc < last:
+            crossings += self._border("e", cr, cc)
+        if cr < last:
+            crossings += self._border("s", cr, cc)
+        if cc > 0:
+            crossings += [(b, a) for a, b in self._border("e", cr, cc - 1)]
+        if cr > 0:
+            crossings += [(b, a) for a, b in self._border("s", cr - 1, cc)]
+
+        graph = {}
+        for own, across in crossings:
+            graph.setdefault(own, []).append((across, 1))
+        nodes = list(graph)
+        box = self._bounds(cr, cc)
+        adj = self._neighbours(box)
+        for i, node in enumerate(nodes):
+            dist = self._distances(node, box, nodes[i + 1:], adj)
+            for other, d in dist.items():
+                graph[node].append((other, d))
+                graph[other].append((node, d))
+        self._clusters[(cr, cc)] = graph
+        self.built += 1
+        return graph
+
+    def _cluster_of(self, idx):
+        r, c = divmod(idx, self.grid_size)
+        return r // self.cluster_size, c // self.cluster_size
+
+    def update_cell(self, cell):
+        """Forget what a toggle of ``cell`` (row, col) can change: its cluster and the borders it lies on."""
+        r, c = cell
+        k = self.cluster_size
+        cr, cc = r // k, c // k
+        self._clusters.pop((cr, cc), None)
+        r0, r1, c0, c1 = self._bounds(cr, cc)
+        # a border cell also changes the transitions, seen from both clusters
+        for on_edge, key, other in ((r == r0 and cr > 0, ("s", cr - 1, cc), (cr - 1, cc)),
+                                    (r == r1 - 1, ("s", cr, cc), (cr + 1, cc)),
+                                    (c == c0 and cc > 0, ("e", cr, cc - 1), (cr, cc - 1)),
+                                    (c == c1 - 1, ("e", cr, cc), (cr, cc + 1))):
+            if on_edge:
+                self._borders.pop(key, None)
+                self._clusters.pop(other, None)
+
+    # ---------------------------------------------
+    # Searches inside one or a few clusters
+    # ---------------------------------------------
+    def _box(self, a, b):
+        """Rows r0..r1 and columns c0..c1 (end exclusive) covering clusters ``a`` and ``b``."""
+        ar0, ar1, ac0, ac1 = self._bounds(*a)
+        br0, br1, bc0, bc1 = self._bounds(*b)
+        return min(ar0, br0), max(ar1, br1), min(ac0, bc0), max(ac1, bc1)
+
+    def _neighbours(self, box):
+        """Free neighbours of every cell of ``box``, by local id ``(r - r0) * width + (c - c0)``.
+
+        Blocked cells get their free neighbours too (a search may start in
+        one, like A*), but are nobody's neighbour.
+        """
+        n = self.grid_size
+        r0, r1, c0, c1 = box
+        w = c1 - c0
+        free = []
+        for r in range(r0, r1):
+            free += [not b for b in self.blocked[r * n + c0:r * n + c1]]
+        adj = []
+        last_row = (r1 - r0 - 1) * w
+        for i, _ in enumerate(free):
+            c = i % w
+            # MOVES order: left, right, up, down
+            adj.append([j for j, ok in ((i - 1, c > 0), (i + 1, c < w - 1), (i - w, i >= w), (i + w, i < last_row))
+                        if ok and free[j]])
+        return adj
+
+    def _bfs(self, adj, box, source, targets):
+        """Breadth-first search over ``adj`` from grid cell ``source`` until every target is reached.
+
+        Returns (distances, parents, expanded), both lists by local id (-1: not reached).
+        """
+        n = self.grid_size
+        r0, _, c0, _ = box
+        w = len(adj) // (box[1] - r0)
+        local = [(t // n - r0) * w + t % n - c0 for t in targets]
+        src = (source // n - r0) * w + source % n - c0
+        wanted = set(local)
+        wanted.discard(src)
+        dist = [-1] * len(adj)
+        parents = [-1] * len(adj)
+        dist[src] = 0
+        queue = [src]
+        for i in queue:
+            if not wanted:
+                break
+            d = dist[i] + 1
+            for j in adj[i]:
+                if dist[j] < 0:
+                    dist[j] = d
+                    parents[j] = i
+                    wanted.discard(j)
+                    queue.append(j)
+        return dist, parents, len(queue)
+
+    def _distances(self, source, box, targets, adj=None):
+        """{target: distance} for the ``targets`` reachable from ``source`` without leaving ``box``."""
+        if adj is None:
+            adj = self._neighbours(box)
+        n = self.grid_size
+        r0, _, c0, _ = box
+        w = box[3] - c0
+        dist, _, _ = self._bfs(adj, box, source, targets)
+        found = {}
+        for t in targets:
+            d = dist[(t // n - r0) * w + t % n - c0]
+            if d >= 0:
+                found[t] = d
+        return found
+
+    def _local_path(self, start, goal, box, stats):
+        """Shortest cells from ``start`` to ``goal`` inside ``box``, or None."""
+        n = self.grid_size
+        r0, _, c0, _ = box
+        w = box[3] - c0
+        dist, parents, expanded = self._bfs(self._neighbours(box), box, start, [goal])
+        if stats is not None:
+            stats["expanded"] = stats.get("expanded", 0) + expanded
+        i = (goal // n - r0) * w + goal % n - c0
+        if dist[i] < 0:
+            return None
+        cells = []
+        while i != -1:
+            cells.append((r0 + i // w) * n + c0 + i % w)
+            i = parents[i]
+        return cells[::-1]
+
+    # ---------------------------------------------
+    # Queries
+    # ---------------------------------------------
+    def find_path(self, start, goal, obstacles=None, stats=None):
+        """A path of (row, col) cells from ``start`` to ``goal``, or None.
+
+        ``obstacles`` is ignored: the planner searches the grid it is bound to
+        (see :meth:`bind`), whose changes the owner reports to :meth:`update_cell`.
+        """
+        n = self.grid_size
+        sr, sc = start
+        gr, gc = goal
+        if not (0 <= sr < n and 0 <= sc < n and 0 <= gr < n and 0 <= gc < n):
+            return None
+        s = sr * n + sc
+        g = gr * n + gc
+        if s == g:
+            return [start]
+        if self.blocked[g]:
+            return None
+
+        s_cluster = self._cluster_of(s)
+        g_cluster = self._cluster_of(g)
+        if abs(s_cluster[0] - g_cluster[0]) <= 1 and abs(s_cluster[1] - g_cluster[1]) <= 1:
+            # close by: a direct search over the (at most 2 x 2) clusters avoids
+            # the detour through transitions on short trips
+            cells = self._local_path(s, g, self._box(s_cluster, g_cluster), stats)
+            if cells is not None:
+                return [divmod(idx, n) for idx in cells]
+
+        # start and goal join the abstract graph through their cluster's nodes
+        s_graph = self._cluster(*s_cluster)
+        g_graph = self._cluster(*g_cluster)
+        start_edges = list(self._distances(s, self._bounds(*s_cluster), list(s_graph)).items())
+        # a start on a transition also has its border crossings
+        start_edges += s_graph.get(s, [])
+        goal_edges = self._distances(g, self._bounds(*g_cluster), list(g_graph))
+
+        route = self._abstract_search(s, g, start_edges, goal_edges, stats)
+        if route is not None:
+            return [divmod(idx, n) for idx in self._refine(route, stats)]
+        if self.blocked[s]:
+            # a drone inside an obstacle may leave it across a cluster border,
+            # where no transition is: continue from each free neighbour instead
+            best = None
+            for dr, dc in MOVES:
+                nr, nc = sr + dr, sc + dc
+                if 0 <= nr < n and 0 <= nc < n and not self.blocked[nr * n + nc]:
+                    path = self.find_path((nr, nc), goal, stats=stats)
+                    if path is not None and (best is None or len(path) < len(best)):
+                        best = path
+            if best is not None:
+                return [start] + best
+        return None
+
+    def _abstract_search(self, s, g, start_edges, goal_edges, stats):
+        n = self.grid_size
+        gr, gc = divmod(g, n)
+        weight = self.weight
+        g_score = {s: 0}
+        parents = {s: -1}
+        closed = set()
+        # (f, h, g, node): ties on f prefer the node closer to the goal
+        open_heap = [(0, 0, 0, s)]
+        expanded = 0
+        route = None
+        while open_heap:
+            _, _, cost, idx = heapq.heappop(open_heap)
+            if idx in closed or cost > g_score[idx]:
+                continue
+            closed.add(idx)
+            expanded += 1
+            if idx == g:
+                route = []
+                while idx != -1:
+                    route.append(idx)
+                    idx = parents[idx]
+                route.reverse()
+                break
+            if idx == s:
+                edges = start_edges
+            else:
+                edges = self._cluster(*self._cluster_of(idx))[idx]
+            if idx in goal_edges:
+                edges = edges + [(g, goal_edges[idx])]
+            for nxt, step in edges:
+                ng = cost + step
+                if nxt not in closed and ng < g_score.get(nxt, ng + 1):
+                    g_score[nxt] = ng
+                    parents[nxt] = idx
+                    r, c = divmod(nxt, n)
+                    h = abs(r - gr) + abs(c - gc)
+                    heapq.heappush(open_heap, (ng + weight * h, h, ng, nxt))
+        if stats is not None:
+            stats["expanded"] = stats.get("expanded", 0) + expanded
+        return route
+
+    def _refine(self, route, stats):
+        """Expand an abstract route into cells, one cluster-local search per intra-cluster edge."""
+        cells = [route[0]]
+        for a, b in zip(route, route[1:]):
+            ca = self._cluster_of(a)
+            if ca != self._cluster_of(b):
+                # a border crossing: the two cells are adjacent
+                cells.append(b)
+                continue
+            cells += self._local_path(a, b, self._bounds(*ca), stats)[1:]
+        return cells
+
+    def stats(self):
+        return {"clusters": len(self._clusters), "built": self.built, "cluster_size": self.cluster_size}
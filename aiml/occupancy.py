@@ -0,0 +1,177 @@
+# aiml/occupancy.py
+import base64
+from collections import deque
+
+import numpy as np
+
+
+class OccupancyGrid:
+    """Square grid of blocked cells backed by a NumPy bool array.
+
+    The array shares its memory with a flat ``bytearray`` (one byte per cell,
+    index ``row * size + col``), so single-cell probes from pure Python index
+    the bytearray directly while bulk updates and serialization go through
+    NumPy. It also behaves like the old set of (row, col) tuples: ``in``,
+    ``len`` and iteration all work, so callers can pass either.
+    """
+
+    def __init__(self, size, cells=()):
+        self.size = size
+        self.flat = bytearray(size * size)
+        self.array = np.frombuffer(self.flat, dtype=np.bool_).reshape(size, size)
+        self._count = 0
+        for cell in cells:
+            self.add(cell)
+
+    # ---------------------------------------------
+    # Set-like interface
+    # ---------------------------------------------
+    def __contains__(self, cell):
+        r, c = cell
+        n = self.size
+        return 0 <= r < n and 0 <= c < n and self.flat[r * n + c] == 1
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        n = self.size
+        for idx in np.flatnonzero(self.array).tolist():
+            yield divmod(idx, n)
+
+    def __eq__(self, other):
+        if isinstance(other, OccupancyGrid):
+            return self.size == other.size and self.flat == other.flat
+        return NotImplemented
+
+    def blocked(self, r, c):
+        """Unchecked O(1) probe; ``r`` and ``c`` must be inside the grid."""
+        return self.flat[r * self.size + c] == 1
+
+    def add(self, cell):
+        r, c = cell
+        idx = r * self.size + c
+        if not self.flat[idx]:
+            self.flat[idx] = 1
+            self._count += 1
+
+    def discard(self, cell):
+        r, c = cell
+        idx = r * self.size + c
+        if self.flat[idx]:
+            self.flat[idx] = 0
+            self._count -= 1
+
+    def remove(self, cell):
+        if cell not in self:
+            raise KeyError(cell)
+        self.discard(cell)
+
+    def toggle(self, cell):
+        """Flip ``cell``; returns True if it is blocked afterwards."""
+        if cell in self:
+            self.discard(cell)
+            return False
+        self.add(cell)
+        return True
+
+    def clear(self):
+        self.array[:] = False
+        self._count = 0
+
+    def copy(self):
+        grid = OccupancyGrid(self.size)
+        grid.flat[:] = self.flat
+        grid._count = self._count
+        return grid
+
+    # ---------------------------------------------
+    # Bulk operations
+    # ---------------------------------------------
+    def set_region(self, top_left, bottom_right, value=True):
+        """Block (or free, with ``value=False``) an inclusive rectangle of cells.
+
+        Only the part inside the grid changes; a rectangle entirely outside
+        it is a no-op.
+        """
+        (r0, c0), (r1, c1) = top_left, bottom_right
+        r0, r1 = sorted((r0, r1))
+        c0, c1 = sorted((c0, c1))
+        r0, r1 = max(r0, 0), min(r1, self.size - 1)
+        c0, c1 = max(c0, 0), min(c1, self.size - 1)
+        if r0 > r1 or c0 > c1:
+            return
+        self.array[r0:r1 + 1, c0:c1 + 1] = value
+        self._count = int(np.count_nonzero(self.array))
+
+    def clear_region(self, top_left, bottom_right):
+        self.set_region(top_left, bottom_right, False)
+
+    def changes(self, other):
+        """(added, removed) cell lists that turn ``other`` into this grid."""
+        n = self.size
+        diff = self.array != other.array
+        added = np.flatnonzero(diff & self.array).tolist()
+        removed = np.flatnonzero(diff & other.array).tolist()
+        return [divmod(i, n) for i in added], [divmod(i, n) for i in removed]
+
+    # ---------------------------------------------
+    # Packed form (API / storage)
+    # ---------------------------------------------
+    def pack(self):
+        """Base64 of the bit-packed grid, row-major, most significant bit first."""
+        return base64.b64encode(self.packbits().tobytes()).decode("ascii")
+
+    def packbits(self):
+        """The raw bit-packed grid as a uint8 array (what pack() encodes)."""
+        return np.packbits(self.array)
+
+    @classmethod
+    def from_bits(cls, size, bits):
+        grid = cls(size)
+        grid.array[:] = np.unpackbits(bits, count=size * size).reshape(size, size).astype(bool)
+        grid._count = int(np.count_nonzero(grid.array))
+        return grid
+
+    @classmethod
+    def unpack(cls, size, data):
+        return cls.from_bits(size, np.frombuffer(base64.b64decode(data), dtype=np.uint8))
+
+
+class ChangeLog:
+    """Cells toggled per obstacle version, for planners that catch up incrementally.
+
+    Keeps the last ``capacity`` changes. ``since`` answers None when it cannot
+    tell: the changes were dropped, or a bulk change (reset, restore) came
+    after the caller's version. Callers then diff the whole grid instead.
+    """
+
+    def __init__(self, capacity=1024, version=0):
+        self.capacity = capacity
+        self.version = version
+        self._entries = deque()  # (version, cell), oldest first
+        # complete for every version from here on
+        self._floor = version
+
+    def record(self, version, cell):
+        self._entries.append((version, cell))
+        self.version = version
+        while len(self._entries) > self.capacity:
+            self._floor = self._entries.popleft()[0]
+
+    def reset(self, version):
+        """Forget everything: the grid changed in bulk at ``version``."""
+        self._entries.clear()
+        self.version = version
+        self._floor = version
+
+    def since(self, version):
+        """Cells changed after ``version`` (possibly repeated), or None if unknown."""
+        if version is None or version < self._floor:
+            return None
+        cells = []
+        for v, cell in reversed(self._entries):
+            if v <= version:
+                break
+            cells.append(cell)
+        return cells
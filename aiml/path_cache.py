@@ -0,0 +1,81 @@
+# aiml/path_cache.py
+from collections import OrderedDict
+
+from aiml.pathfinding import astar_pathfinding
+
+
+class PathCache:
+    """Bounded LRU cache of grid paths shared by every drone of a simulation.
+
+    Keys are ``(obstacle_version, start, goal)``. When an obstacle is toggled
+    the owner calls :meth:`invalidate_cell`, which drops only the entries the
+    change can affect and carries the rest over to the new version.
+
+    Misses run ``search(start, goal, obstacles, stats)`` when given (e.g.
+    HierarchicalPlanner.find_path on large grids), A* otherwise.
+    """
+
+    def __init__(self, grid_size, max_entries=1024, search=None):
+        self.grid_size = grid_size
+        self.max_entries = max_entries
+        self.search = search
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        # key -> (path or None, frozenset of path cells)
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def find_path(self, start, goal, obstacles, stats=None):
+        """Return the cached path for (start, goal) or search and cache it."""
+        key = (self.version, start, goal)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        if self.search is not None:
+            path = self.search(start, goal, obstacles, stats)
+        else:
+            path = astar_pathfinding(self.grid_size, start, goal, obstacles, stats)
+        self._entries[key] = (path, frozenset(path) if path else frozenset())
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return path
+
+    def invalidate_cell(self, cell, added, version):
+        """Re-key surviving entries to ``version`` after ``cell`` was toggled.
+
+        An added obstacle only breaks paths running through it; failed
+        searches stay failed. A removed obstacle can only make paths shorter,
+        so entries are kept when they already match the Manhattan lower bound.
+        """
+        survivors = OrderedDict()
+        for (_, start, goal), (path, cells) in self._entries.items():
+            if added:
+                if cell in cells:
+                    continue
+            else:
+                if path is None:
+                    continue
+                lower_bound = abs(start[0] - goal[0]) + abs(start[1] - goal[1])
+                if len(path) - 1 != lower_bound:
+                    continue
+            survivors[(version, start, goal)] = (path, cells)
+        self._entries = survivors
+        self.version = version
+
+    def clear(self, version):
+        self._entries.clear()
+        self.version = version
+
+    def cached_cells(self):
+        """Total path cells held by the cache (for memory estimates)."""
+        return sum(len(cells) for _, cells in self._entries.values())
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
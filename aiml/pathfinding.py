@@ -1,70 +1,273 @@
 # aiml/pathfinding.py
+import heapq
 
-class Node:
-    """A node class for A* Pathfinding"""
-    def __init__(self, parent=None, position=None):
-        self.parent = parent
-        self.position = position
-        self.g = 0
-        self.h = 0
-        self.f = 0
+from aiml.occupancy import OccupancyGrid
 
-    def __eq__(self, other):
-        return self.position == other.position
+# 4-connected moves, same order the original Node-based search used
+MOVES = [(0, -1), (0, 1), (-1, 0), (1, 0)]
 
 
-def astar_pathfinding(grid_size, start, end, obstacles):
-    """Returns a list of tuples as a path from start to end avoiding obstacles."""
-    start_node = Node(None, start)
-    end_node = Node(None, end)
+def _blocked_cells(grid_size, obstacles):
+    """Flatten an obstacle collection of (row, col) into a bytearray bitmap.
 
-    open_list = [start_node]
-    closed_list = []
+    An OccupancyGrid of the same size already is one and is used as is.
+    """
+    if isinstance(obstacles, OccupancyGrid) and obstacles.size == grid_size:
+        return obstacles.flat
+    blocked = bytearray(grid_size * grid_size)
+    for r, c in obstacles:
+        if 0 <= r < grid_size and 0 <= c < grid_size:
+            blocked[r * grid_size + c] = 1
+    return blocked
 
-    while open_list:
-        # choose lowest f node
-        current_node = min(open_list, key=lambda o: o.f)
-        open_list.remove(current_node)
-        closed_list.append(current_node)
 
-        # goal reached
-        if current_node == end_node:
+def astar_pathfinding(grid_size, start, end, obstacles, stats=None, heuristic=None):
+    """Returns a list of tuples as a path from start to end avoiding obstacles.
+
+    Cells are flattened to ``row * grid_size + col``; g-scores and parents live
+    in flat lists, closed cells in a bytearray and the open set is a binary heap.
+    If ``stats`` is a dict, its "expanded" count is increased by the number of
+    nodes taken off the heap. ``heuristic(idx)`` replaces the Manhattan
+    distance to ``end`` and must not overestimate it.
+    """
+    n = grid_size
+    sr, sc = start
+    er, ec = end
+    if not (0 <= sr < n and 0 <= sc < n and 0 <= er < n and 0 <= ec < n):
+        return None
+
+    start_idx = sr * n + sc
+    end_idx = er * n + ec
+    if start_idx == end_idx:
+        return [start]
+
+    blocked = _blocked_cells(n, obstacles)
+    if blocked[end_idx]:
+        return None
+
+    size = n * n
+    g = [-1] * size
+    parent = [-1] * size
+    closed = bytearray(size)
+
+    g[start_idx] = 0
+    h0 = abs(sr - er) + abs(sc - ec) if heuristic is None else heuristic(start_idx)
+    # (f, h, idx): ties on f prefer the node closer to the goal
+    open_heap = [(h0, h0, start_idx)]
+    push = heapq.heappush
+    pop = heapq.heappop
+    expanded = 0
+
+    while open_heap:
+        _, _, idx = pop(open_heap)
+        if closed[idx]:
+            continue  # stale heap entry
+        closed[idx] = 1
+        expanded += 1
+
+        if idx == end_idx:
+            if stats is not None:
+                stats["expanded"] = stats.get("expanded", 0) + expanded
             path = []
-            curr = current_node
-            while curr:
-                path.append(curr.position)
-                curr = curr.parent
+            while idx != -1:
+                path.append(divmod(idx, n))
+                idx = parent[idx]
             return path[::-1]
 
-        # explore neighbors
-        children = []
-        for move in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
-            new_pos = (current_node.position[0] + move[0],
-                       current_node.position[1] + move[1])
-
-            # valid boundaries
-            if not (0 <= new_pos[0] < grid_size and 0 <= new_pos[1] < grid_size):
+        r, c = divmod(idx, n)
+        ng = g[idx] + 1
+        for dr, dc in MOVES:
+            nr = r + dr
+            nc = c + dc
+            if not (0 <= nr < n and 0 <= nc < n):
+                continue
+            nidx = nr * n + nc
+            if blocked[nidx] or closed[nidx]:
                 continue
-            # obstacle check
-            if new_pos in obstacles:
+            old = g[nidx]
+            if old != -1 and old <= ng:
                 continue
+            g[nidx] = ng
+            parent[nidx] = idx
+            h = abs(nr - er) + abs(nc - ec) if heuristic is None else heuristic(nidx)
+            push(open_heap, (ng + h, h, nidx))
 
-            children.append(Node(current_node, new_pos))
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + expanded
+    return None
 
-        # process children
-        for child in children:
-            if child in closed_list:
-                continue
 
-            child.g = current_node.g + 1
-            child.h = abs(child.position[0] - end_node.position[0]) + abs(child.position[1] - end_node.position[1])
-            child.f = child.g + child.h
+INF = float("inf")
 
-            # if already in open list with lower g, skip
-            if any(open_node for open_node in open_list
-                   if child == open_node and child.g > open_node.g):
-                continue
 
-            open_list.append(child)
+class DStarLite:
+    """Incremental planner (D* Lite) for one drone and one goal.
+
+    The search runs backwards from the goal, so g-values are distances to the
+    goal and stay valid while the drone moves. After obstacles change only the
+    cells whose distances are affected are re-expanded instead of searching
+    from scratch. Entering a blocked cell costs infinity; leaving one does not,
+    which matches astar_pathfinding never checking the start cell.
+
+    With a ChangeLog the planner remembers the obstacle version it has seen
+    and later applies only the cells toggled since; without one (or when the
+    log cannot tell) it diffs the whole grid.
+    """
+
+    def __init__(self, grid_size, start, goal, obstacles, changes=None):
+        self.grid_size = grid_size
+        self.start = start
+        self.goal = goal
+        self.blocked = self._as_grid(obstacles)
+        self.version = changes.version if changes is not None else None
+        self.km = 0
+        self.expanded = 0
+        self._last = start
+        self._g = {}
+        self._rhs = {goal: 0}
+        self._open = []          # heap of (k1, k2, cell); stale entries skipped
+        self._open_key = {}      # cell -> current key while queued
+        self._push(goal, (self._h(goal), 0))
+
+    def _h(self, cell):
+        return abs(cell[0] - self.start[0]) + abs(cell[1] - self.start[1])
+
+    def _neighbors(self, cell):
+        r, c = cell
+        n = self.grid_size
+        for dr, dc in MOVES:
+            nr = r + dr
+            nc = c + dc
+            if 0 <= nr < n and 0 <= nc < n:
+                yield (nr, nc)
+
+    def _key(self, cell):
+        m = min(self._g.get(cell, INF), self._rhs.get(cell, INF))
+        return (m + self._h(cell) + self.km, m)
+
+    def _push(self, cell, key):
+        self._open_key[cell] = key
+        heapq.heappush(self._open, (key[0], key[1], cell))
+
+    def _top(self):
+        heap = self._open
+        while heap:
+            k1, k2, cell = heap[0]
+            if self._open_key.get(cell) == (k1, k2):
+                return (k1, k2), cell
+            heapq.heappop(heap)
+        return (INF, INF), None
+
+    def _update_vertex(self, cell):
+        if cell != self.goal:
+            best = INF
+            for nxt in self._neighbors(cell):
+                if nxt not in self.blocked:
+                    cost = self._g.get(nxt, INF) + 1
+                    if cost < best:
+                        best = cost
+            self._rhs[cell] = best
+        self._open_key.pop(cell, None)
+        if self._g.get(cell, INF) != self._rhs.get(cell, INF):
+            self._push(cell, self._key(cell))
+
+    def compute(self):
+        """Expand inconsistent cells until the start cell is consistent."""
+        g = self._g
+        rhs = self._rhs
+        while True:
+            top_key, u = self._top()
+            start = self.start
+            start_key = self._key(start)
+            if top_key >= start_key and rhs.get(start, INF) == g.get(start, INF):
+                break
+            if u is None:
+                break
+            heapq.heappop(self._open)
+            del self._open_key[u]
+            self.expanded += 1
+
+            new_key = self._key(u)
+            if top_key < new_key:
+                self._push(u, new_key)
+            elif g.get(u, INF) > rhs.get(u, INF):
+                g[u] = rhs[u]
+                for pred in self._neighbors(u):
+                    self._update_vertex(pred)
+            else:
+                g[u] = INF
+                self._update_vertex(u)
+                for pred in self._neighbors(u):
+                    self._update_vertex(pred)
+
+    def move_start(self, start):
+        """Re-anchor the heuristic after the drone moved to ``start``."""
+        if start != self.start:
+            self.km += abs(self._last[0] - start[0]) + abs(self._last[1] - start[1])
+            self._last = start
+            self.start = start
+
+    def _as_grid(self, obstacles):
+        """Private copy of ``obstacles`` as an OccupancyGrid."""
+        if isinstance(obstacles, OccupancyGrid) and obstacles.size == self.grid_size:
+            return obstacles.copy()
+        n = self.grid_size
+        return OccupancyGrid(n, [(r, c) for r, c in obstacles if 0 <= r < n and 0 <= c < n])
+
+    def update_obstacles(self, obstacles, changes=None):
+        """Apply the difference between the known and the current obstacle set.
+
+        ``changes`` (a ChangeLog) limits the work to the cells toggled since
+        the last update.
+        """
+        cells = changes.since(self.version) if changes is not None else None
+        if changes is not None:
+            self.version = changes.version
+        if cells is None:
+            current = self._as_grid(obstacles)
+            added, removed = current.changes(self.blocked)
+            changed = added + removed
+            if changed:
+                self.blocked = current
+        else:
+            changed = []
+            for cell in set(cells):
+                if (cell in obstacles) != (cell in self.blocked):
+                    self.blocked.toggle(cell)
+                    changed.append(cell)
+        if not changed:
+            return 0
+        for cell in changed:
+            # only edges *into* the toggled cell change cost
+            for pred in self._neighbors(cell):
+                self._update_vertex(pred)
+        return len(changed)
+
+    def find_path(self):
+        """Repair the search and return the current optimal path, or None."""
+        self.compute()
+        cell = self.start
+        if cell == self.goal:
+            return [cell]
+        if self._g.get(cell, INF) == INF:
+            return None
 
-    return None
\ No newline at end of file
+        path = [cell]
+        g = self._g
+        for _ in range(self.grid_size * self.grid_size):
+            best = None
+            best_cost = INF
+            for nxt in self._neighbors(cell):
+                if nxt in self.blocked:
+                    continue
+                cost = g.get(nxt, INF)
+                if cost < best_cost:
+                    best_cost = cost
+                    best = nxt
+            if best is None:
+                return None
+            cell = best
+            path.append(cell)
+            if cell == self.goal:
+                return path
+        return None
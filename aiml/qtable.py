@@ -0,0 +1,132 @@
+# aiml/qtable.py
+import numpy as np
+
+# float64 values
+_VALUE_BYTES = 8
+
+
+def cell_block(grid_size, states):
+    """Side of the square blocks of cells that share one state in a table of ``states`` states.
+
+    1 (a state per cell) whenever the table has room for every cell.
+    """
+    block = 1
+    while (-(-grid_size // block)) ** 2 > states:
+        block += 1
+    return block
+
+
+def states_for(grid_size, agents=1, actions=2, max_bytes=None):
+    """States of a table for a ``grid_size`` grid that stays within ``max_bytes``.
+
+    A state per cell when it fits; on larger maps (a 5000 x 5000 grid has 25M
+    cells) blocks of cells share a state, see :func:`cell_block`.
+    """
+    cells = grid_size * grid_size
+    if not max_bytes:
+        return cells
+    budget = max(1, max_bytes // (max(1, agents * actions) * _VALUE_BYTES))
+    side = -(-grid_size // cell_block(grid_size, min(cells, budget)))
+    return side * side
+
+
+class QTable:
+    """NumPy-backed Q-table for the drones' strategic decisions.
+
+    States are integer cell ids (``row * grid_size + col``), or block ids on
+    grids too large for a state per cell (see :func:`states_for`), so there is
+    no label formatting per decision and no limit on the number of rows. One
+    table holds ``agents`` independent slices of ``(states, actions)``
+    values; drones read and write their slice through :meth:`view`, or all
+    share slice 0 when the table is meant to be shared.
+    """
+
+    def __init__(self, states, actions=2, agents=1, learning_rate=0.1, discount_factor=0.9):
+        self.values = np.zeros((agents, states, actions), dtype=np.float64)
+        self.learning_rate = learning_rate
+        self.discount_factor = discount_factor
+
+    @property
+    def agents(self):
+        return self.values.shape[0]
+
+    @property
+    def states(self):
+        return self.values.shape[1]
+
+    @property
+    def actions(self):
+        return self.values.shape[2]
+
+    def view(self, agent=0):
+        return QView(self, agent)
+
+    def best_action(self, state, agent=0):
+        """Greedy action; ties go to the lowest action, like list.index(max)."""
+        return int(np.argmax(self.values[agent, state]))
+
+    def best_actions(self, states, agents=0):
+        return np.argmax(self.values[agents, states], axis=-1)
+
+    def update(self, states, actions, rewards, next_states, agents=0):
+        """One Q-learning (TD(0)) step for a batch of transitions.
+
+        Arguments are scalars or equal-length arrays. Every transition of a
+        batch reads the table as it was before the batch; transitions that
+        hit the same (agent, state, action) add up their changes. Returns
+        the applied changes.
+        """
+        states = np.asarray(states)
+        actions = np.asarray(actions)
+        agents = np.broadcast_to(np.asarray(agents), states.shape)
+        old = self.values[agents, states, actions]
+        future = self.values[agents, np.asarray(next_states)].max(axis=-1)
+        delta = self.learning_rate * (np.asarray(rewards) + self.discount_factor * future - old)
+        np.add.at(self.values, (agents, states, actions), delta)
+        return delta
+
+    # ---------------------------------------------
+    # Persistence (.npy)
+    # ---------------------------------------------
+    def save(self, path):
+        np.save(path, self.values)
+
+    @classmethod
+    def load(cls, path, agents=None, **kwargs):
+        """Load a table saved with :meth:`save` or a plain ``(states, actions)`` array.
+
+        A single slice is copied to every agent when ``agents`` asks for more.
+        """
+        values = np.load(path)
+        if values.ndim == 2:
+            values = values[np.newaxis]
+        if agents is not None and agents != values.shape[0]:
+            if values.shape[0] != 1:
+                raise ValueError(f"table has {values.shape[0]} agents, expected 1 or {agents}")
+            values = np.repeat(values, agents, axis=0)
+        table = cls(values.shape[1], values.shape[2], values.shape[0], **kwargs)
+        table.values[:] = values
+        return table
+
+
+class QView:
+    """One agent's slice of a QTable."""
+
+    __slots__ = ("table", "agent")
+
+    def __init__(self, table, agent):
+        self.table = table
+        self.agent = agent
+
+    @property
+    def values(self):
+        return self.table.values[self.agent]
+
+    def __getitem__(self, state):
+        return self.table.values[self.agent, state]
+
+    def best_action(self, state):
+        return self.table.best_action(state, self.agent)
+
+    def update(self, state, action, reward, next_state):
+        return self.table.update(state, action, reward, next_state, self.agent)
@@ -0,0 +1,167 @@
+# aiml/reservation.py
+import heapq
+import math
+
+from aiml.pathfinding import MOVES, _blocked_cells
+
+# MOVES plus waiting in place
+_STEPS = MOVES + [(0, 0)]
+
+
+def cell_step_ticks(speed, cell_size, tolerance=1.0):
+    """Ticks a drone flying ``speed`` pixels per tick needs from one cell centre to the next.
+
+    Matches Drone.move_along_path, which snaps to a waypoint once it is
+    within ``speed + tolerance`` pixels.
+    """
+    return max(1, math.ceil((cell_size - tolerance) / speed))
+
+
+class ReservationTable:
+    """Space-time reservations for cooperative routing (windowed HCA*).
+
+    Time is counted in slots of ``step_ticks`` simulation ticks, the time one
+    cell step takes, so the cells of a path fall into consecutive slots.
+    Drones plan one after another: each searches around what the others
+    already reserved, then reserves its own next ``window`` steps (a drone
+    holds one window at a time; reserving again releases the previous one).
+    The rest of its route follows the ordinary planner and is re-reserved
+    window by window as the drone advances.
+    """
+
+    def __init__(self, grid_size, step_ticks, window=8):
+        self.grid_size = grid_size
+        self.step_ticks = step_ticks
+        self.window = window
+        self.slot = 0
+        # slot -> {cell index: drone id}
+        self._slots = {}
+        # drone id -> [(slot, cell index)]
+        self._held = {}
+        # plans that found no conflict-free window and kept their plain route
+        self.fallbacks = 0
+
+    def __len__(self):
+        return sum(len(cells) for cells in self._slots.values())
+
+    def advance(self, tick):
+        """Move the clock to ``tick`` and forget the slots that passed."""
+        self.slot = tick // self.step_ticks
+        for slot in [s for s in self._slots if s < self.slot]:
+            del self._slots[slot]
+
+    def owner(self, slot, idx):
+        cells = self._slots.get(slot)
+        return cells.get(idx) if cells else None
+
+    def reserve(self, drone_id, cells, slot=None):
+        """Reserve flat cell indices ``cells`` for consecutive slots from ``slot`` (default: now)."""
+        self.release(drone_id)
+        slot = self.slot if slot is None else slot
+        held = []
+        for k, idx in enumerate(cells):
+            taken = self._slots.setdefault(slot + k, {})
+            # never take over another drone's claim (possible after a fallback)
+            if idx not in taken:
+                taken[idx] = drone_id
+                held.append((slot + k, idx))
+        self._held[drone_id] = held
+
+    def release(self, drone_id):
+        for slot, idx in self._held.pop(drone_id, ()):
+            cells = self._slots.get(slot)
+            if cells is not None and cells.get(idx) == drone_id:
+                del cells[idx]
+                if not cells:
+                    del self._slots[slot]
+
+    def clear(self):
+        self._slots.clear()
+        self._held.clear()
+
+    # ---------------------------------------------
+    # Planning
+    # ---------------------------------------------
+    def plan(self, drone_id, route, obstacles, stats=None):
+        """Make the first window of ``route`` (a list of (row, col)) conflict-free and reserve it.
+
+        The cell ``window`` steps along the route is the subgoal of a
+        space-time search that may wait or detour around reservations (for
+        up to as many steps again); the rest of the route is kept. Returns
+        (cells, reserved): the new route, with a repeated cell for each wait,
+        and how many of its cells are reserved. Without a conflict-free
+        window the route is returned unchanged (counted in ``fallbacks``).
+        """
+        n = self.grid_size
+        w = min(self.window, len(route) - 1)
+        prefix = self._search(drone_id, route[0], route[w], obstacles, 2 * self.window, stats)
+        if prefix is None:
+            self.fallbacks += 1
+            prefix = [r * n + c for r, c in route[:w + 1]]
+        self.reserve(drone_id, prefix)
+        return [divmod(idx, n) for idx in prefix] + list(route[w + 1:]), len(prefix)
+
+    def _search(self, drone_id, start, goal, obstacles, horizon, stats):
+        """Space-time A* over (cell, step) from ``start`` to ``goal`` within ``horizon`` steps.
+
+        Avoids cells reserved by other drones at the step they would be
+        entered or the step before. Returns flat cell indices, one per step,
+        or None.
+        """
+        n = self.grid_size
+        blocked = _blocked_cells(n, obstacles)
+        s = start[0] * n + start[1]
+        g = goal[0] * n + goal[1]
+        gr, gc = goal
+        base = self.slot
+        owner = self.owner
+        parents = {(s, 0): None}
+        h0 = abs(start[0] - gr) + abs(start[1] - gc)
+        # (f, h, step, cell): ties on f prefer the node closer to the goal
+        open_heap = [(h0, h0, 0, s)]
+        expanded = 0
+        found = None
+        while open_heap:
+            _, _, t, idx = heapq.heappop(open_heap)
+            expanded += 1
+            if idx == g:
+                found = (idx, t)
+                break
+            if t >= horizon:
+                continue
+            r, c = divmod(idx, n)
+            for dr, dc in _STEPS:
+                nr = r + dr
+                nc = c + dc
+                if not (0 <= nr < n and 0 <= nc < n):
+                    continue
+                nxt = nr * n + nc
+                # a drone may leave (or wait in) a blocked start, never enter one;
+                # every path to (cell, step) costs ``step``, so the first one found is kept
+                if (nxt, t + 1) in parents or (blocked[nxt] and nxt != idx):
+                    continue
+                other = owner(base + t + 1, nxt)
+                if other is not None and other != drone_id:
+                    continue
+                # a drone is still leaving the cell it held the step before, which
+                # also rules out head-on swaps
+                other = owner(base + t, nxt)
+                if other is not None and other != drone_id:
+                    continue
+                parents[(nxt, t + 1)] = (idx, t)
+                h = abs(nr - gr) + abs(nc - gc)
+                heapq.heappush(open_heap, (t + 1 + h, h, t + 1, nxt))
+        if stats is not None:
+            stats["expanded"] = stats.get("expanded", 0) + expanded
+        if found is None:
+            return None
+        cells = []
+        node = found
+        while node is not None:
+            cells.append(node[0])
+            node = parents[node]
+        return cells[::-1]
+
+    def stats(self):
+        return {"reserved": len(self), "drones": len(self._held), "fallbacks": self.fallbacks,
+                "window": self.window, "step_ticks": self.step_ticks}
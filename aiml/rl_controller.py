@@ -1,6 +1,11 @@
 import math
 import random
 
+import numpy as np
+
+import config
+from aiml.occupancy import OccupancyGrid
+
 # Actions the drone can take in grid space
 ACTIONS = [
     (0, 1),    # right
@@ -9,16 +14,26 @@ ACTIONS = [
     (-1, 0),   # up
 ]
 
+# index of the "stay in place" column in FleetEnv's tables (choose_action's (0, 0))
+STAY = len(ACTIONS)
+
+# rewards of compute_reward, shared with the batched training mode
+REWARD_OBSTACLE = -10
+REWARD_GOAL = 20
+
+
 class RLController:
-    def __init__(self, grid_size):
+    def __init__(self, grid_size, cell_size=None, rng=None):
         self.grid_size = grid_size
+        self.cell_size = cell_size or getattr(config, "CELL_SIZE", 60)
+        self.rng = rng or random
 
     # ----------------------------------------------------
     # Convert pixel → grid coordinate
     # ----------------------------------------------------
     def pixel_to_grid(self, x, y):
-        col = int(x // 60)
-        row = int(y // 60)
+        col = int(x // self.cell_size)
+        row = int(y // self.cell_size)
         return (row, col)
 
     # ----------------------------------------------------
@@ -30,11 +45,11 @@ class RLController:
 
         # Negative reward for obstacles
         if (dr, dc) in obstacles:
-            return -10
+            return REWARD_OBSTACLE
 
         # Large reward if goal reached
         if abs(dr - tr) < 1 and abs(dc - tc) < 1:
-            return 20
+            return REWARD_GOAL
 
         # Shaping: distance improvement
         dist_before = math.hypot(drone.prev_dist_x, drone.prev_dist_y)
@@ -47,7 +62,7 @@ class RLController:
     # ----------------------------------------------------
     # Select action (epsilon-greedy)
     # ----------------------------------------------------
-    def choose_action(self, drone, target, obstacles):
+    def choose_action(self, drone, target, obstacles, spatial=None):
         dr, dc = self.pixel_to_grid(drone.x, drone.y)
         tr, tc = self.pixel_to_grid(*target)
 
@@ -56,8 +71,8 @@ class RLController:
         drone.prev_dist_y = dc - tc
 
         # RL behavior: 80% greedy, 20% exploration
-        if random.random() < 0.2:
-            return random.choice(ACTIONS)
+        if self.rng.random() < 0.2:
+            return self.rng.choice(ACTIONS)
 
         # Greedy: pick action minimizing distance
         best_action = None
@@ -74,6 +89,10 @@ class RLController:
             if (nr, nc) in obstacles:
                 continue
 
+            # skip cells other drones occupy (spatial index bucket lookup)
+            if spatial is not None and any(o is not drone for o in spatial.drones_in_cell((nr, nc))):
+                continue
+
             dist = math.hypot(nr - tr, nc - tc)
             if dist < best_dist:
                 best_dist = dist
@@ -84,16 +103,108 @@ class RLController:
     # ----------------------------------------------------
     # Apply RL step and return next pixel position
     # ----------------------------------------------------
-    def step(self, drone, target, obstacles):
+    def step(self, drone, target, obstacles, spatial=None):
         dr, dc = self.pixel_to_grid(drone.x, drone.y)
 
-        best_action = self.choose_action(drone, target, obstacles)
+        best_action = self.choose_action(drone, target, obstacles, spatial)
 
         nr = dr + best_action[0]
         nc = dc + best_action[1]
 
         # pixel coordinates
-        new_x = nc * 60 + 30
-        new_y = nr * 60 + 30
+        new_x = nc * self.cell_size + self.cell_size // 2
+        new_y = nr * self.cell_size + self.cell_size // 2
+
+        return new_x, new_y
 
-        return new_x, new_y
\ No newline at end of file
+    # ----------------------------------------------------
+    # Batched training mode
+    # ----------------------------------------------------
+    def training_env(self, num_agents, obstacles=(), epsilon=0.2, seed=None):
+        """A FleetEnv over this controller's grid for ``num_agents`` agents."""
+        return FleetEnv(self.grid_size, num_agents, obstacles, epsilon, seed)
+
+
+class FleetEnv:
+    """Gym-like environment that steps every agent of a fleet at once.
+
+    Agents live on grid cells (ids ``row * grid_size + col``) and each has a
+    target cell. Everything RLController computes per call is tabulated once
+    per grid: ``next_cell[cell, action]`` (moves off the grid stay in place,
+    the last column is "stay"), the blocked flag per cell and the Euclidean
+    length of every (d_row, d_col) offset. ``step`` then applies one action
+    per agent with a handful of array operations. Rewards are those of
+    compute_reward; an agent that reaches its target gets a new one.
+    """
+
+    def __init__(self, grid_size, num_agents, obstacles=(), epsilon=0.2, seed=None):
+        n = grid_size
+        self.grid_size = n
+        self.num_agents = num_agents
+        self.epsilon = epsilon
+        self.rng = np.random.default_rng(seed)
+
+        cells = np.arange(n * n)
+        self.rows, self.cols = np.divmod(cells, n)
+        self.next_cell = np.empty((n * n, len(ACTIONS) + 1), dtype=np.int64)
+        for a, (dr, dc) in enumerate(ACTIONS):
+            nr = self.rows + dr
+            nc = self.cols + dc
+            inside = (nr >= 0) & (nr < n) & (nc >= 0) & (nc < n)
+            self.next_cell[:, a] = np.where(inside, nr * n + nc, cells)
+        self.next_cell[:, STAY] = cells
+        self.distance = np.hypot(*np.meshgrid(np.arange(n), np.arange(n), indexing="ij"))
+        self.set_obstacles(obstacles)
+
+        self.cell = np.zeros(num_agents, dtype=np.int64)
+        self.target = np.zeros(num_agents, dtype=np.int64)
+
+    def set_obstacles(self, obstacles):
+        if isinstance(obstacles, OccupancyGrid) and obstacles.size == self.grid_size:
+            self.blocked = obstacles.array.ravel().copy()
+        else:
+            self.blocked = np.zeros(self.grid_size * self.grid_size, dtype=bool)
+            for r, c in obstacles:
+                self.blocked[r * self.grid_size + c] = True
+        self.free = np.flatnonzero(~self.blocked)
+        # moves choose_action would consider: inside the grid and not blocked
+        self.allowed = (self.next_cell[:, :STAY] != np.arange(self.blocked.size)[:, None]) & ~self.blocked[self.next_cell[:, :STAY]]
+
+    def _dist(self, cells, targets):
+        return self.distance[np.abs(self.rows[cells] - self.rows[targets]), np.abs(self.cols[cells] - self.cols[targets])]
+
+    def _observe(self):
+        return np.stack([self.cell, self.target], axis=1)
+
+    def reset(self, seed=None):
+        """Random free start and target cells; returns (agents, 2) [cell, target]."""
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self.cell = self.rng.choice(self.free, self.num_agents)
+        self.target = self.rng.choice(self.free, self.num_agents)
+        return self._observe()
+
+    def policy(self, epsilon=None):
+        """choose_action for every agent: greedy towards the target, random with ``epsilon``."""
+        epsilon = self.epsilon if epsilon is None else epsilon
+        candidates = self.next_cell[self.cell, :STAY]
+        dist = self._dist(candidates, self.target[:, None])
+        dist = np.where(self.allowed[self.cell], dist, np.inf)
+        # argmin keeps the first minimum, like the strict < in choose_action
+        actions = np.argmin(dist, axis=1)
+        actions[np.isinf(dist[np.arange(self.num_agents), actions])] = STAY
+        explore = self.rng.random(self.num_agents) < epsilon
+        actions[explore] = self.rng.integers(0, len(ACTIONS), int(explore.sum()))
+        return actions
+
+    def step(self, actions):
+        """Apply one action index per agent; returns (obs, rewards, done, info)."""
+        before = self._dist(self.cell, self.target)
+        self.cell = self.next_cell[self.cell, actions]
+        done = self.cell == self.target
+        reward = np.where(self.blocked[self.cell], REWARD_OBSTACLE,
+                          np.where(done, REWARD_GOAL, before - self._dist(self.cell, self.target)))
+        reached = np.flatnonzero(done)
+        if reached.size:
+            self.target[reached] = self.rng.choice(self.free, reached.size)
+        return self._observe(), reward, done, {"reached": reached}
\ No newline at end of file
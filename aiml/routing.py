@@ -0,0 +1,258 @@
+# aiml/routing.py
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from aiml.occupancy import OccupancyGrid
+from aiml.pathfinding import MOVES, astar_pathfinding
+
+UNREACHABLE = -1
+
+
+def _neighbor_lists(n):
+    """Flat neighbour ids of every cell, in MOVES order."""
+    neighbors = []
+    for idx in range(n * n):
+        r, c = divmod(idx, n)
+        neighbors.append([(r + dr) * n + c + dc for dr, dc in MOVES if 0 <= r + dr < n and 0 <= c + dc < n])
+    return neighbors
+
+
+def _bfs(neighbors, blocked, source):
+    """Distances to ``source`` and the next hop towards it, over free cells.
+
+    Blocked cells are never entered but, like the start cell of
+    astar_pathfinding, may be left: they get one more than their closest free
+    neighbour.
+    """
+    size = len(neighbors)
+    dist = [UNREACHABLE] * size
+    hop = [UNREACHABLE] * size
+    if blocked[source]:
+        return dist, hop
+    dist[source] = 0
+    hop[source] = source
+    queue = deque([source])
+    while queue:
+        cur = queue.popleft()
+        d = dist[cur] + 1
+        for nb in neighbors[cur]:
+            if dist[nb] == UNREACHABLE and not blocked[nb]:
+                dist[nb] = d
+                hop[nb] = cur
+                queue.append(nb)
+    for idx in range(size):
+        if blocked[idx]:
+            for nb in neighbors[idx]:
+                if dist[nb] != UNREACHABLE and not blocked[nb] and (dist[idx] == UNREACHABLE or dist[nb] + 1 < dist[idx]):
+                    dist[idx] = dist[nb] + 1
+                    hop[idx] = nb
+    return dist, hop
+
+
+class RoutingTable:
+    """Shortest-path distances and routes for one fixed obstacle set.
+
+    Grids of up to ``max_cells`` cells get all-pairs tables (one BFS per
+    goal): ``distance`` is an array lookup and ``path`` follows next hops,
+    O(path length). Larger grids keep BFS distances from a few far-apart
+    landmarks instead and answer with A* under the ALT lower bound
+    (|d(L, goal) - d(L, cell)|), which expands far fewer nodes around
+    obstacles than the Manhattan heuristic.
+    """
+
+    def __init__(self, grid_size, obstacles, version=0, max_cells=1024, landmarks=8):
+        n = grid_size
+        self.grid_size = n
+        self.version = version
+        if isinstance(obstacles, OccupancyGrid) and obstacles.size == n:
+            self.obstacles = obstacles.copy()
+        else:
+            self.obstacles = OccupancyGrid(n, [(r, c) for r, c in obstacles if 0 <= r < n and 0 <= c < n])
+        blocked = self.obstacles.flat
+        neighbors = _neighbor_lists(n)
+        size = n * n
+
+        started = time.perf_counter()
+        if size <= max_cells:
+            self.mode = "all_pairs"
+            # row = goal, column = start cell
+            self._dist = np.full((size, size), UNREACHABLE, dtype=np.int32)
+            self._hop = np.full((size, size), UNREACHABLE, dtype=np.int32)
+            for goal in range(size):
+                if not blocked[goal]:
+                    self._dist[goal], self._hop[goal] = _bfs(neighbors, blocked, goal)
+            self._landmarks = []
+        else:
+            self.mode = "alt"
+            self._landmarks = self._pick_landmarks(neighbors, blocked, landmarks)
+        self.build_ms = (time.perf_counter() - started) * 1000.0
+
+    @property
+    def nbytes(self):
+        """Approximate bytes held by the precomputed tables."""
+        if self.mode == "all_pairs":
+            return self._dist.nbytes + self._hop.nbytes
+        # landmark tables are plain lists: one pointer per cell
+        return sum(len(dist) for dist in self._landmarks) * 8
+
+    @staticmethod
+    def _pick_landmarks(neighbors, blocked, count):
+        """Farthest-point landmarks: each new one is the free cell farthest from the rest."""
+        free = [idx for idx in range(len(neighbors)) if not blocked[idx]]
+        if not free:
+            return []
+        tables = []
+        nearest = {}
+        landmark = free[0]
+        for _ in range(count):
+            dist, _ = _bfs(neighbors, blocked, landmark)
+            tables.append(dist)
+            for idx in free:
+                d = dist[idx]
+                if d != UNREACHABLE and d < nearest.get(idx, d + 1):
+                    nearest[idx] = d
+            # unreached cells (other components) come first, then the farthest
+            landmark = max(free, key=lambda idx: (idx not in nearest, nearest.get(idx, 0)))
+            if nearest.get(landmark) == 0:
+                break
+        return tables
+
+    def _index(self, cell):
+        r, c = cell
+        n = self.grid_size
+        if 0 <= r < n and 0 <= c < n:
+            return r * n + c
+        return None
+
+    def _alt_heuristic(self, goal):
+        n = self.grid_size
+        gr, gc = divmod(goal, n)
+        pairs = [(dist, dist[goal]) for dist in self._landmarks if dist[goal] != UNREACHABLE]
+
+        def heuristic(idx):
+            r, c = divmod(idx, n)
+            best = abs(r - gr) + abs(c - gc)
+            for dist, to_goal in pairs:
+                d = dist[idx]
+                if d != UNREACHABLE:
+                    diff = d - to_goal if d > to_goal else to_goal - d
+                    if diff > best:
+                        best = diff
+            return best
+        return heuristic
+
+    def distance(self, start, goal):
+        """Number of moves from ``start`` to ``goal``, or None if unreachable."""
+        s = self._index(start)
+        g = self._index(goal)
+        if s is None or g is None:
+            return None
+        if s == g:
+            return 0
+        if self.mode == "all_pairs":
+            d = int(self._dist[g, s])
+            return None if d == UNREACHABLE else d
+        path = self.path(start, goal)
+        return None if path is None else len(path) - 1
+
+    def path(self, start, goal, stats=None):
+        """A shortest path as a list of (row, col), or None; same contract as astar_pathfinding."""
+        s = self._index(start)
+        g = self._index(goal)
+        if s is None or g is None:
+            return None
+        if s == g:
+            return [start]
+        if self.mode != "all_pairs":
+            return astar_pathfinding(self.grid_size, start, goal, self.obstacles, stats, self._alt_heuristic(g))
+        hop = self._hop[g]
+        if hop[s] == UNREACHABLE:
+            return None
+        n = self.grid_size
+        path = [start]
+        idx = s
+        while idx != g:
+            idx = int(hop[idx])
+            path.append(divmod(idx, n))
+        return path
+
+    def find_path(self, start, goal, obstacles=None, stats=None):
+        """PathCache-compatible entry point; ``obstacles`` is the table's own set."""
+        return self.path(start, goal, stats)
+
+
+class Router:
+    """Keeps a RoutingTable for the latest obstacle set.
+
+    ``rebuild`` hands the new obstacle set to a background thread (or builds
+    inline when ``background`` is False). Requests that arrive while a build
+    runs are coalesced into one follow-up build of the newest set. Until the
+    table catches up, ``current`` returns None and callers fall back to A*.
+    """
+
+    def __init__(self, grid_size, max_cells=1024, landmarks=8, background=True):
+        self.grid_size = grid_size
+        self.max_cells = max_cells
+        self.landmarks = landmarks
+        self.background = background
+        self.table = None
+        self.builds = 0
+        self._pending = None
+        self._running = False
+        self._idle = threading.Event()
+        self._idle.set()
+        self._lock = threading.Lock()
+
+    def _build(self, obstacles, version):
+        table = RoutingTable(self.grid_size, obstacles, version, self.max_cells, self.landmarks)
+        with self._lock:
+            self.builds += 1
+            if self.table is None or table.version >= self.table.version:
+                self.table = table
+
+    def rebuild(self, obstacles, version):
+        if not self.background:
+            self._build(obstacles, version)
+            return
+        snapshot = obstacles.copy() if isinstance(obstacles, OccupancyGrid) else set(obstacles)
+        with self._lock:
+            self._pending = (snapshot, version)
+            if self._running:
+                return
+            self._running = True
+            self._idle.clear()
+        threading.Thread(target=self._worker, name="routing-rebuild", daemon=True).start()
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                job, self._pending = self._pending, None
+                if job is None:
+                    self._running = False
+                    self._idle.set()
+                    return
+            self._build(*job)
+
+    def wait(self, timeout=None):
+        """Block until no rebuild is queued or running."""
+        return self._idle.wait(timeout)
+
+    def current(self, version):
+        """The table for obstacle ``version``, or None while it is being rebuilt."""
+        table = self.table
+        if table is not None and table.version == version:
+            return table
+        return None
+
+    def stats(self):
+        table = self.table
+        return {
+            "mode": table.mode if table else None,
+            "version": table.version if table else None,
+            "builds": self.builds,
+            "build_ms": table.build_ms if table else None,
+            "rebuilding": self._running,
+        }
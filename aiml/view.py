@@ -0,0 +1,67 @@
+# aiml/view.py
+"""Pygame drawing for drones, kept out of the Drone core.
+
+pygame is only imported, and the icon only loaded, the first time a drone
+is drawn. All drones with the same icon share one DroneView.
+"""
+import config
+
+_views = {}
+
+
+def drone_view(image_path="drone_icon.png"):
+    """The shared DroneView for ``image_path``."""
+    view = _views.get(image_path)
+    if view is None:
+        view = _views[image_path] = DroneView(image_path)
+    return view
+
+
+def _load_icon(image_path):
+    # defensive: no pygame, no display or no file still draws something (or nothing)
+    try:
+        import pygame
+        image = pygame.image.load(image_path).convert_alpha()
+        return pygame.transform.scale(image, (40, 40))
+    except Exception:
+        try:
+            import pygame
+            image = pygame.Surface((30, 30), pygame.SRCALPHA)
+            pygame.draw.circle(image, (0, 255, 0), (15, 15), 15)
+            return image
+        except Exception:
+            return None
+
+
+class DroneView:
+    def __init__(self, image_path):
+        self.image_path = image_path
+        self._image = None
+        self._loaded = False
+
+    @property
+    def image(self):
+        if not self._loaded:
+            self._image = _load_icon(self.image_path)
+            self._loaded = True
+        return self._image
+
+    def draw(self, drone, surface, font):
+        try:
+            import pygame
+            if len(drone.path) > drone.current_waypoint_index:
+                points = [(drone.x, drone.y)] + drone.waypoints(drone.current_waypoint_index)
+                pygame.draw.lines(surface, getattr(config, "PATH_COLOR", (0, 120, 255)), False, points, 2)
+
+            image = self.image
+            if image:
+                img_rect = image.get_rect(center=(int(drone.x), int(drone.y)))
+                surface.blit(image, img_rect)
+
+            label = font.render(f"Bot {drone.id}", True, getattr(config, "INFO_TEXT_COLOR", (0, 0, 0)))
+            surface.blit(label, (drone.x - 15, drone.y - 35))
+
+            if drone.package:
+                pygame.draw.rect(surface, (255, 255, 0), (int(drone.x) - 4, int(drone.y) + 12, 8, 8))
+        except Exception:
+            pass
@@ -0,0 +1,137 @@
+# backend/assignment.py
+from heapq import heappop, heappush
+from itertools import count
+
+INF = float("inf")
+
+
+class _Unassigned:
+    """Private per-row column meaning "leave this row unmatched"."""
+    __slots__ = ()
+
+
+def hungarian(edges):
+    """Minimum-cost assignment of rows to columns over a sparse edge list.
+
+    ``edges[row]`` is a list of ``(col, cost)`` pairs with non-negative
+    costs; columns are any hashable ids. Returns ``assignment[row] = col``,
+    or None for rows that cannot be matched. The result matches as many rows
+    as possible and, among those matchings, has minimum total cost.
+
+    This is the Hungarian method in its shortest-augmenting-path form: each
+    row is added with a Dijkstra search over reduced costs, which stops at
+    the first free column, so the work depends on the edges actually
+    explored rather than on a rows x columns matrix. Every row also gets a
+    private "unassigned" column priced above any complete alternative, so a
+    cheaper row can displace a dearer one even when no free column is left.
+    """
+    n = len(edges)
+    max_cost = max((cost for row in edges for _, cost in row), default=0)
+    unassigned_cost = (max_cost + 1) * (n + 1)
+    edges = [list(row) + [(_Unassigned(), unassigned_cost)] for row in edges]
+    row_pot = [0.0] * n
+    col_pot = {}
+    match_row = [None] * n     # row -> col
+    match_col = {}             # col -> row
+    order = count()            # heap tie-breaker, column ids are not comparable
+
+    for root in range(n):
+        col_dist = {}
+        pred = {}
+        heap = []
+        for col, cost in edges[root]:
+            d = cost + row_pot[root] - col_pot.get(col, 0.0)
+            if d < col_dist.get(col, INF):
+                col_dist[col] = d
+                pred[col] = root
+                heappush(heap, (d, next(order), col))
+
+        row_dist = {root: 0.0}
+        done = {}
+        target = None
+        while heap:
+            d, _, col = heappop(heap)
+            if col in done or d > col_dist[col]:
+                continue
+            done[col] = d
+            row = match_col.get(col)
+            if row is None:
+                target = col
+                break
+            # the matched edge back to ``row`` is tight (reduced cost 0)
+            row_dist[row] = d
+            for nxt, cost in edges[row]:
+                if nxt in done or nxt == col:
+                    continue
+                nd = d + cost + row_pot[row] - col_pot.get(nxt, 0.0)
+                if nd < col_dist.get(nxt, INF):
+                    col_dist[nxt] = nd
+                    pred[nxt] = row
+                    heappush(heap, (nd, next(order), nxt))
+
+        # keep reduced costs non-negative: nodes settled closer than the
+        # target move by (distance - target distance), everything else by 0
+        reach = done[target]
+        for row, d in row_dist.items():
+            if d < reach:
+                row_pot[row] += d - reach
+        for col, d in done.items():
+            if d < reach:
+                col_pot[col] = col_pot.get(col, 0.0) + d - reach
+
+        col = target
+        while True:
+            row = pred[col]
+            previous = match_row[row]
+            match_row[row] = col
+            match_col[col] = row
+            if row == root:
+                break
+            col = previous
+    return [None if isinstance(col, _Unassigned) else col for col in match_row]
+
+
+def match_tasks(index, obstacles, pickups, k, rounds=3, accept=None, max_expanded=None):
+    """Jointly assign idle drones in ``index`` to pickup cells.
+
+    Each task only considers its ``k`` nearest drones by grid path distance
+    (see GridIndex.nearest_by_path), so no all-pairs matrix is built; the
+    sparse Hungarian method then solves the joint problem. Tasks whose
+    candidates all went to others are retried against the remaining drones
+    for up to ``rounds`` rounds. ``accept`` filters eligible drones;
+    ``max_expanded`` bounds each search (see nearest_by_path).
+    Returns {task index: (drone, distance)}.
+    """
+    result = {}
+    taken = set()
+    pending = list(range(len(pickups)))
+    for _ in range(rounds):
+        if not pending:
+            break
+        eligible = index.count(taken, accept)
+        candidates = [index.nearest_by_path(pickups[t], obstacles, k, exclude=taken, accept=accept, eligible=eligible,
+                                            max_expanded=max_expanded) for t in pending]
+
+        drones = {}
+        edges = []
+        for found in candidates:
+            row = []
+            for dist, drone in found:
+                drones[drone.id] = drone
+                row.append((drone.id, dist))
+            edges.append(row)
+        if not drones:
+            break
+
+        still_pending = []
+        for row, drone_id in enumerate(hungarian(edges)):
+            task = pending[row]
+            if drone_id is None:
+                still_pending.append(task)
+                continue
+            result[task] = (drones[drone_id], dict(edges[row])[drone_id])
+            taken.add(drone_id)
+        if len(still_pending) == len(pending):
+            break
+        pending = still_pending
+    return result
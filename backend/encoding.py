@@ -0,0 +1,110 @@
+# backend/encoding.py
+"""Encodings of the published /state body.
+
+JSON stays the default. Clients that send ``Accept: application/x-dsim-state``
+get a columnar binary body instead. It uses the section layout of
+backend.snapshot, under its own magic: one array per drone field (ids,
+positions, states, batteries, rewards, task pixels with -1 for no task),
+the obstacle bitmap as raw bits, and a JSON "meta" section for everything
+else (tick, revision, logs, stats). ``decode`` turns such a body back into
+the JSON-shaped dict.
+
+Every body is tagged with an ETag that is unique per simulation, revision
+and encoding, so pollers can revalidate with If-None-Match.
+"""
+import base64
+import json
+
+import numpy as np
+
+from backend.snapshot import _HEADER, _pack_sections, _unpack_sections, STATES, SnapshotError
+
+BINARY_MEDIA_TYPE = "application/x-dsim-state"
+MAGIC = b"DSST"
+FORMAT_VERSION = 1
+
+# state keys stored as columns; the rest goes into "meta"
+_COLUMNS = ("drones", "obstacles")
+
+
+def encode_binary(state) -> bytes:
+    drones = state["drones"]
+    tasks = np.full((len(drones), 4), -1, dtype=np.int32)
+    strategic = np.zeros(len(drones), dtype=np.bool_)
+    for i, d in enumerate(drones):
+        task = d["task"]
+        if task is not None:
+            tasks[i] = (*task["pickup"], *task["drop"])
+            strategic[i] = task.get("is_strategic_move", False)
+    meta = {k: v for k, v in state.items() if k not in _COLUMNS}
+    sections = {
+        "meta": np.frombuffer(json.dumps(meta, separators=(",", ":")).encode(), dtype=np.uint8),
+        "id": np.array([d["id"] for d in drones], dtype=np.int32),
+        "pos": np.array([(d["x"], d["y"]) for d in drones], dtype=np.float64).reshape(-1, 2),
+        "state": np.array([STATES.index(d["state"]) for d in drones], dtype=np.uint8),
+        "battery": np.array([d["battery"] for d in drones], dtype=np.float64),
+        "reward": np.array([(d["reward_step"], d["reward_total"]) for d in drones], dtype=np.float64).reshape(-1, 2),
+        "task": tasks,
+        "strategic": strategic,
+        "obstacles": np.frombuffer(base64.b64decode(state["obstacles"]), dtype=np.uint8),
+    }
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(sections)) + _pack_sections(sections)
+
+
+def decode(data):
+    """The state dict a binary body was encoded from (obstacles base64 again, as in JSON)."""
+    if len(data) < _HEADER.size:
+        raise SnapshotError("state body is too short")
+    magic, version, _, count = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise SnapshotError("not a binary state body")
+    cols = _unpack_sections(bytes(data[_HEADER.size:]), count)
+    drones = []
+    for i, drone_id in enumerate(cols["id"].tolist()):
+        task = None
+        if cols["task"][i, 0] >= 0:
+            px, py, dx, dy = cols["task"][i].tolist()
+            task = {"pickup": [px, py], "drop": [dx, dy], "is_strategic_move": bool(cols["strategic"][i])}
+        x, y = cols["pos"][i].tolist()
+        reward_step, reward_total = cols["reward"][i].tolist()
+        drones.append({"id": drone_id, "x": x, "y": y, "state": STATES[cols["state"][i]],
+                       "battery": float(cols["battery"][i]), "task": task,
+                       "reward_step": reward_step, "reward_total": reward_total})
+    state = json.loads(cols["meta"].tobytes())
+    state["drones"] = drones
+    state["obstacles"] = base64.b64encode(cols["obstacles"].tobytes()).decode("ascii")
+    return state
+
+
+# ---------------------------------------------
+# HTTP negotiation
+# ---------------------------------------------
+def wants_binary(accept):
+    """True when an Accept header ranks the binary state at least as high as JSON."""
+    if not accept or BINARY_MEDIA_TYPE not in accept:
+        return False
+    quality = {}
+    for part in accept.split(","):
+        media, _, params = part.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        quality[media.strip().lower()] = q
+    binary = quality.get(BINARY_MEDIA_TYPE, 0.0)
+    return binary > 0 and binary >= quality.get("application/json", 0.0)
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header names ``etag`` (weak comparison, as RFC 9110 asks)."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
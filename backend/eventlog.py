@@ -0,0 +1,68 @@
+# backend/eventlog.py
+import time
+
+
+class EventLog:
+    """Fixed-capacity ring buffer of structured log events.
+
+    Every event gets a sequence id one higher than the previous one (the
+    first is 1). Once ``capacity`` events are stored the oldest are
+    overwritten; readers page through what is left with a ``since`` cursor.
+    """
+
+    def __init__(self, capacity=1000):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._events = [None] * capacity
+        self.last_seq = 0
+        # lowest sequence id ever stored (raised by restore)
+        self._floor = 1
+
+    def __len__(self):
+        return max(0, self.last_seq - self.first_seq + 1)
+
+    @property
+    def first_seq(self):
+        """Sequence id of the oldest event still stored (last_seq + 1 when empty)."""
+        return max(self._floor, self.last_seq - self.capacity + 1) if self.last_seq else 1
+
+    def append(self, message, kind="info"):
+        self.last_seq += 1
+        self._events[self.last_seq % self.capacity] = (self.last_seq, time.time(), kind, message)
+        return self.last_seq
+
+    def restore(self, events, last_seq):
+        """Replace the contents with ``events`` (oldest first) and continue after ``last_seq``."""
+        events = [tuple(e) for e in events][-self.capacity:]
+        self._events = [None] * self.capacity
+        self.last_seq = last_seq
+        self._floor = events[0][0] if events else last_seq + 1
+        for event in events:
+            self._events[event[0] % self.capacity] = event
+
+    def _range(self, first, last):
+        events = self._events
+        capacity = self.capacity
+        return [events[seq % capacity] for seq in range(first, last + 1)]
+
+    def since(self, seq, limit=None):
+        """Events with a sequence id above ``seq``, oldest first, at most ``limit``."""
+        first = max(seq + 1, self.first_seq)
+        last = self.last_seq
+        if limit is not None:
+            last = min(last, first + limit - 1)
+        return self._range(first, last)
+
+    def tail(self, count):
+        """The newest ``count`` events, oldest first."""
+        return self._range(max(self.first_seq, self.last_seq - count + 1), self.last_seq)
+
+    def messages_since(self, seq):
+        """Plain message strings after ``seq`` plus the new cursor."""
+        return [e[3] for e in self.since(seq)], self.last_seq
+
+    @staticmethod
+    def to_dict(event):
+        seq, ts, kind, message = event
+        return {"seq": seq, "time": ts, "kind": kind, "message": message}
@@ -0,0 +1,164 @@
+# backend/journal.py
+"""Input journal: record every mutating Simulation call, replay it headless.
+
+A journal is an append-only JSON-lines file. It opens with a ``begin``
+record holding a compressed snapshot of the simulation (which includes the
+seeded RNG state), followed by one record per ``toggle_obstacle``,
+``assign_task``, ``assign_tasks``, ``step``, ``fast_forward``, ``reset`` and
+``restore``, in the order the simulation lock serialized them. Every
+``check_every`` ticks a ``check`` record stores a digest of the simulation
+state, which replays compare against to catch any divergence.
+
+Replays are bit-exact as long as planning does not depend on timing: with
+routing tables enabled, set ROUTING_BACKGROUND = False while recording.
+
+    python -m backend.journal run.journal            # replay, verify, report ticks/s
+"""
+import argparse
+import base64
+import hashlib
+import json
+import threading
+import time
+
+import config
+
+FORMAT_VERSION = 1
+
+
+class ReplayMismatch(AssertionError):
+    """A replayed simulation diverged from the recorded digest."""
+
+
+def digest(sim):
+    """Hash of the state a replay must reproduce (excludes logs, revisions and caches)."""
+    h = hashlib.sha256()
+    drones = [(d.id, d.x, d.y, d.battery, d.state, d.package, d.reward_total,
+               d.current_waypoint_index, d.waypoints(), d.task) for d in sim.drones]
+    h.update(repr((sim.tick, drones)).encode())
+    h.update(sim.obstacle_grid_coords.packbits().tobytes())
+    h.update(sim.q_table.values.tobytes())
+    h.update(repr(sim.rng.getstate()).encode())
+    return h.hexdigest()
+
+
+class Journal:
+    """Appends simulation inputs to ``path`` (see module docstring)."""
+
+    def __init__(self, path, check_every=None):
+        self.path = path
+        self.check_every = check_every if check_every is not None else getattr(config, "JOURNAL_CHECK_EVERY", 100)
+        self.records = 0
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, op, **fields):
+        fields["op"] = op
+        line = json.dumps(fields, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.records += 1
+
+    def begin(self, snapshot_bytes, seed=None):
+        self.write("begin", version=FORMAT_VERSION, seed=seed,
+                   snapshot=base64.b64encode(snapshot_bytes).decode("ascii"))
+
+    def after_step(self, sim):
+        """Called by Simulation.step (lock held): write a digest every ``check_every`` ticks."""
+        if self.check_every and sim.tick % self.check_every == 0:
+            self.write("check", tick=sim.tick, digest=digest(sim))
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read(path):
+    """Yield the records of a journal file."""
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # a crash can leave a torn last line; anything else is corrupt
+                if f.read().strip():
+                    raise ValueError(f"{path}:{number}: corrupt journal record")
+                return
+
+
+def replay(records, verify=True):
+    """Re-execute journal records headless; returns (simulation, stats).
+
+    Each ``begin`` record (a journal can hold several sessions) restarts from
+    its snapshot. With ``verify``, ``check`` records raise ReplayMismatch on
+    divergence.
+    """
+    from backend.simulation import Simulation
+
+    sim = None
+    ops = 0
+    steps = 0
+    checks = 0
+    started = time.perf_counter()
+    for record in records:
+        op = record["op"]
+        if op == "begin":
+            if record.get("version") != FORMAT_VERSION:
+                raise ValueError(f"unsupported journal version {record.get('version')}")
+            sim = Simulation.from_snapshot(base64.b64decode(record["snapshot"]))
+            continue
+        if sim is None:
+            raise ValueError("journal does not start with a begin record")
+        ops += 1
+        if op == "step":
+            sim.step()
+            steps += 1
+        elif op == "fast_forward":
+            sim.fast_forward(record["ticks"])
+            steps += record["ticks"]
+        elif op == "toggle_obstacle":
+            sim.toggle_obstacle_by_label(record["label"])
+        elif op == "assign_task":
+            sim.assign_task(record["pickup"], record["drop"])
+        elif op == "assign_tasks":
+            sim.assign_tasks([tuple(t) for t in record["tasks"]])
+        elif op == "reset":
+            sim.reset()
+        elif op == "restore":
+            sim.restore(base64.b64decode(record["data"]))
+        elif op == "check":
+            checks += 1
+            if verify and digest(sim) != record["digest"]:
+                raise ReplayMismatch(f"state diverged at tick {record['tick']}")
+        else:
+            raise ValueError(f"unknown journal op {op!r}")
+    elapsed = time.perf_counter() - started
+    return sim, {
+        "ops": ops,
+        "steps": steps,
+        "checks": checks,
+        "seconds": elapsed,
+        "steps_per_second": steps / elapsed if elapsed > 0 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("journal")
+    parser.add_argument("--no-verify", action="store_true", help="skip digest checks")
+    args = parser.parse_args()
+
+    sim, stats = replay(read(args.journal), verify=not args.no_verify)
+    checks = "skipped" if args.no_verify else "passed"
+    print(f"replayed {stats['ops']} ops ({stats['steps']} ticks) in {stats['seconds']:.2f}s, "
+          f"{stats['steps_per_second'] or 0:.0f} ticks/s, {stats['checks']} checks {checks}")
+    if sim is not None:
+        print(f"final tick {sim.tick}, digest {digest(sim)}")
+
+
+if __name__ == "__main__":
+    main()
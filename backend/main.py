@@ -1,39 +1,290 @@
-from fastapi import FastAPI
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
-from backend.model import ToggleObstacleRequest, AssignTaskRequest
+import config
+from backend.model import (
+    ToggleObstacleRequest, AssignTaskRequest, AssignTasksRequest, LoopConfigRequest, LogPage, CreateSessionRequest,
+    FastForwardRequest,
+)
+from backend.encoding import BINARY_MEDIA_TYPE, wants_binary
+from backend.journal import Journal
+from backend.metrics import Registry
+from backend.profiler import SamplingProfiler
+from backend.sessions import DEFAULT_SESSION, Session, SessionError, SessionManager
 from backend.simulation import Simulation
+from backend.snapshot import SnapshotError
+
+sessions = SessionManager(Simulation())
+# the default session, used by the routes without a /sessions/{id} prefix
+sim = sessions.default.sim
+stream = sessions.default.stream
+ticker = sessions.default.ticker
+profiler = SamplingProfiler(getattr(config, "PROFILER_INTERVAL", 0.005))
+
+# server-side metrics; each simulation keeps its own (Simulation.metrics)
+server_metrics = Registry()
+request_seconds = server_metrics.histogram("http_request_seconds", "Request latency including JSON serialization",
+                                           labels=("method", "route"))
+server_metrics.gauge("sessions", "Live simulation sessions", lambda: len(sessions))
+server_metrics.gauge("sessions_evicted", "Sessions evicted for idleness or memory", lambda: sessions.evicted)
+server_metrics.gauge("tick_loop_ticks", "Ticks run by the tick loop", lambda: ticker.ticks)
+server_metrics.gauge("tick_loop_skipped", "Ticks skipped by the tick loop on overload", lambda: ticker.skipped)
+server_metrics.counter_fn("tick_loop_errors_total", "Ticks that raised in Simulation.step", lambda: ticker.errors)
+
+
+async def checkpoint_loop(path, interval):
+    """Background task: write a snapshot to ``path`` every ``interval`` seconds."""
+    compress = getattr(config, "SNAPSHOT_COMPRESS", True)
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(sim.checkpoint, path, compress)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    snapshot_path = getattr(config, "SNAPSHOT_PATH", None)
+    if snapshot_path and os.path.exists(snapshot_path):
+        with open(snapshot_path, "rb") as f:
+            sim.restore(f.read())
+    journal = None
+    if getattr(config, "JOURNAL_PATH", None):
+        journal = Journal(config.JOURNAL_PATH)
+        sim.attach_journal(journal)
+    checkpoints = None
+    if snapshot_path:
+        checkpoints = asyncio.create_task(checkpoint_loop(snapshot_path, getattr(config, "SNAPSHOT_INTERVAL", 5.0)))
+
+    sessions.default.start(getattr(config, "TICK_AUTOSTART", True))
+    reaper = asyncio.create_task(sessions.reaper())
+    yield
+    profiler.stop()
+    for task in (reaper, checkpoints):
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    await sessions.close()
+    if snapshot_path:
+        sim.checkpoint(snapshot_path, getattr(config, "SNAPSHOT_COMPRESS", True))
+    if journal is not None:
+        sim.detach_journal()
+        journal.close()
 
-app = FastAPI(title="Drone Simulation API")
+
+app = FastAPI(title="Drone Simulation API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
-sim = Simulation()
+class RequestTimer:
+    """ASGI middleware feeding ``request_seconds`` (plain ASGI: BaseHTTPMiddleware costs ~15% throughput)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # the route template, so that label values stay bounded
+            route = scope.get("route")
+            request_seconds.observe(time.perf_counter() - started, scope["method"],
+                                    route.path if route is not None else "unmatched")
+
+app.add_middleware(RequestTimer)
+
+async def get_session(session_id: str = DEFAULT_SESSION) -> Session:
+    """The session a request addresses: /sessions/{id}/..., ?session_id=, or the default one."""
+    # async: a plain def dependency would cost every request a threadpool round trip
+    try:
+        session = sessions.get(session_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"unknown session {session_id!r}")
+    session.touch()
+    return session
+
+# ---------------------------------------------
+# Per-session routes, mounted at / (default session) and /sessions/{session_id}
+# ---------------------------------------------
+router = APIRouter()
+
+def state_response(sim, request=None):
+    # pre-serialized once per revision by the simulation, no lock taken; JSON
+    # unless the client asks for the binary encoding, 304 if its copy is current
+    binary = request is not None and wants_binary(request.headers.get("accept"))
+    if_none_match = request.headers.get("if-none-match") if request is not None else None
+    etag, body = sim.state_body(binary, if_none_match)
+    headers = {"ETag": etag, "Vary": "Accept", "Cache-Control": "no-cache"}
+    if body is None:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=BINARY_MEDIA_TYPE if binary else "application/json", headers=headers)
+
+@router.get("/state")
+def get_state(request: Request, session: Session = Depends(get_session)):
+    return state_response(session.sim, request)
+
+@router.get("/logs", response_model=LogPage)
+def get_logs(since: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000),
+             session: Session = Depends(get_session)):
+    return session.sim.get_log_events(since, limit)
 
-@app.get("/state")
-def get_state():
-    return sim.get_state()
+@router.websocket("/ws")
+async def state_stream(websocket: WebSocket, session_id: str = DEFAULT_SESSION):
+    try:
+        session = sessions.get(session_id)
+    except KeyError:
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    session.viewers += 1
+    try:
+        with suppress(WebSocketDisconnect):
+            await session.stream.serve(websocket)
+    finally:
+        session.viewers -= 1
+        session.touch()
 
-@app.post("/toggle_obstacle")
-def toggle_obstacle(req: ToggleObstacleRequest):
-    ok = sim.toggle_obstacle_by_label(req.label)
+@router.post("/toggle_obstacle")
+def toggle_obstacle(req: ToggleObstacleRequest, session: Session = Depends(get_session)):
+    ok = session.sim.toggle_obstacle_by_label(req.label)
     return {"success": ok}
 
-@app.post("/assign_task")
-def assign_task(req: AssignTaskRequest):
-    return sim.assign_task(req.pickup, req.drop)
+@router.post("/assign_task")
+def assign_task(req: AssignTaskRequest, session: Session = Depends(get_session)):
+    return session.sim.assign_task(req.pickup, req.drop)
+
+@router.post("/assign_tasks")
+def assign_tasks(req: AssignTasksRequest, session: Session = Depends(get_session)):
+    return session.sim.assign_tasks([(t.pickup, t.drop) for t in req.tasks])
+
+@router.post("/step")
+def step(session: Session = Depends(get_session)):
+    # manual single step (debugging); the tick loop advances the simulation normally
+    session.sim.step()
+    return state_response(session.sim)
+
+@router.post("/fast_forward")
+def fast_forward(req: FastForwardRequest, session: Session = Depends(get_session)):
+    # event-driven: same end state as ``ticks`` steps, for offline what-if runs
+    try:
+        return session.sim.fast_forward(req.ticks)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+@router.get("/loop")
+def loop_stats(session: Session = Depends(get_session)):
+    return session.ticker.stats()
+
+@router.post("/loop")
+def configure_loop(req: LoopConfigRequest, session: Session = Depends(get_session)):
+    try:
+        session.ticker.configure(rate_hz=req.rate_hz, policy=req.policy)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return session.ticker.stats()
+
+@router.post("/loop/start")
+async def start_loop(session: Session = Depends(get_session)):
+    session.ticker.start()
+    return session.ticker.stats()
+
+@router.post("/loop/stop")
+async def stop_loop(session: Session = Depends(get_session)):
+    await session.ticker.stop()
+    return session.ticker.stats()
+
+@router.get("/snapshot")
+def get_snapshot(compress: bool = False, session: Session = Depends(get_session)):
+    return Response(content=session.sim.snapshot(compress), media_type="application/octet-stream")
+
+@router.post("/restore")
+async def restore(request: Request, session: Session = Depends(get_session)):
+    data = await request.body()
+    try:
+        return await asyncio.to_thread(session.sim.restore, data)
+    except SnapshotError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+@router.get("/metrics")
+def metrics(session: Session = Depends(get_session)):
+    """Prometheus text format: per-phase tick timings, lock waits, search counters (and, for the
+    default session, server-wide request latency and session counts)."""
+    body = session.sim.metrics_text()
+    if session.id == DEFAULT_SESSION:
+        body = server_metrics.render() + body
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@router.post("/reset")
+def reset(session: Session = Depends(get_session)):
+    session.sim.reset()
+    return state_response(session.sim)
+
+# ---------------------------------------------
+# Session management
+# ---------------------------------------------
+@app.get("/sessions")
+def list_sessions():
+    return {**sessions.stats(), "items": [s.info() for s in sessions.sessions()]}
+
+@app.post("/sessions")
+async def create_session(req: CreateSessionRequest):
+    try:
+        session = await sessions.create(req.num_drones, req.seed)
+    except SessionError as exc:
+        raise HTTPException(status_code=exc.status, detail=str(exc))
+    return session.info()
+
+@app.get("/sessions/{session_id}")
+def session_info(session: Session = Depends(get_session)):
+    return session.info()
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    try:
+        await sessions.delete(session_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"unknown session {session_id!r}")
+    except SessionError as exc:
+        raise HTTPException(status_code=exc.status, detail=str(exc))
+    return {"success": True}
+
+app.include_router(router)
+app.include_router(router, prefix="/sessions/{session_id}")
+
+# ---------------------------------------------
+# Sampling profiler (whole process)
+# ---------------------------------------------
+@app.get("/profile")
+def profile_stats():
+    return profiler.stats()
+
+@app.post("/profile/start")
+def start_profile(interval: float = Query(None, gt=0, le=1)):
+    profiler.start(interval)
+    return profiler.stats()
 
-@app.post("/step")
-def step():
-    sim.step()
-    return sim.get_state()
+@app.post("/profile/stop")
+def stop_profile():
+    """Stop sampling and write the collapsed stacks (flame-graph input) to PROFILER_PATH."""
+    profiler.stop()
+    path = profiler.dump(getattr(config, "PROFILER_PATH", "profile.folded"))
+    return {**profiler.stats(), "path": os.path.abspath(path)}
 
-@app.post("/reset")
-def reset():
-    sim.reset()
-    return sim.get_state()
\ No newline at end of file
+@app.get("/profile/stacks")
+def profile_stacks():
+    return PlainTextResponse(profiler.collapsed())
@@ -0,0 +1,230 @@
+# backend/metrics.py
+"""Counters, gauges and histograms rendered in the Prometheus text format.
+
+Only what the simulation needs: metrics are registered on a Registry,
+observed from any thread (each metric has its own lock) and rendered with
+``Registry.render`` for the ``/metrics`` endpoint.
+"""
+import bisect
+import threading
+
+# seconds; from sub-millisecond drone updates up to multi-second overloaded ticks
+TIME_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# per-tick counts (replans, A* nodes expanded)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 100000)
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        # unlabelled counters are exported from the start, at zero
+        self._values = {} if self.label_names else {(): 0}
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """A value read at render time from ``fn`` (a number, or {label tuple: number})."""
+    kind = "gauge"
+
+    def __init__(self, name, help, fn, labels=()):
+        super().__init__(name, help, labels)
+        self.fn = fn
+
+    def render(self):
+        lines = self.header()
+        value = self.fn()
+        items = sorted(value.items()) if isinstance(value, dict) else [((), value)]
+        for labels, v in items:
+            if v is not None:
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(v)}")
+        return lines
+
+
+class CounterFn(Gauge):
+    """A counter whose running total is kept elsewhere and read from ``fn`` at render time."""
+    kind = "counter"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=TIME_BUCKETS, labels=()):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series = {}
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        names = self.label_names
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = _labels(names, labels, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(names, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(names, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name, help, fn, labels=()):
+        return self._add(Gauge(name, help, fn, labels))
+
+    def counter_fn(self, name, help, fn, labels=()):
+        return self._add(CounterFn(name, help, fn, labels))
+
+    def histogram(self, name, help, buckets=TIME_BUCKETS, labels=()):
+        return self._add(Histogram(name, help, buckets, labels))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------
+# Simulation metrics
+# ---------------------------------------------
+class SimulationMetrics:
+    """The per-tick instrumentation of one Simulation.
+
+    Tick phases: ``index`` (blocked-drone lookup), ``plan`` (A* / D* Lite /
+    routing / reservations, summed over drones), ``strategic`` (Q-learning
+    decisions after deliveries), ``move`` (the rest of Drone.update, spatial
+    index upkeep and the conflict count), ``journal`` (recording the step and
+    Journal.after_step) and ``publish`` (building the published state).
+    ``state_seconds`` times every publish, including those after batches of
+    commands.
+    """
+
+    def __init__(self, sim):
+        r = self.registry = Registry()
+        self.ticks = r.counter("sim_ticks_total", "Simulation steps")
+        self.tick_seconds = r.histogram("sim_tick_seconds", "Duration of Simulation.step, excluding lock wait")
+        self.phase_seconds = r.histogram("sim_tick_phase_seconds", "Time per phase of Simulation.step",
+                                         labels=("phase",))
+        self.lock_wait = r.histogram("sim_lock_wait_seconds", "Time spent waiting for the simulation lock",
+                                     labels=("op",))
+        self.replans = r.histogram("sim_replans_per_tick", "Drones that replanned around an obstacle per tick",
+                                   COUNT_BUCKETS)
+        self.expanded = r.histogram("sim_astar_expanded_per_tick", "Search nodes expanded per tick",
+                                    COUNT_BUCKETS)
+        self.state_seconds = r.histogram("sim_state_build_seconds", "Time to build the published /state payload")
+        self.replans_total = r.counter("sim_replans_total", "Replans around obstacles")
+        self.fast_forward_ticks = r.counter("sim_fast_forward_ticks_total", "Ticks skipped over by fast_forward")
+        self.expanded_total = r.counter("sim_astar_expanded_total", "Search nodes expanded")
+        self.conflicts = r.histogram("sim_conflicts_per_tick", "Busy drones sharing a cell with another busy drone",
+                                     COUNT_BUCKETS)
+        self.conflicts_total = r.counter("sim_conflicts_total", "Busy drones sharing a cell, summed over ticks")
+        r.gauge("sim_tick", "Current simulation tick", lambda: sim.tick)
+        r.gauge("sim_drones", "Drones by state", lambda: _drone_states(sim), labels=("state",))
+        r.gauge("sim_obstacles", "Blocked cells", lambda: len(sim.obstacle_grid_coords))
+        r.counter_fn("sim_path_cache_hits_total", "Path cache hits", lambda: sim.path_cache.hits)
+        r.counter_fn("sim_path_cache_misses_total", "Path cache misses", lambda: sim.path_cache.misses)
+        r.gauge("sim_path_cache_entries", "Entries in the path cache", lambda: len(sim.path_cache))
+        r.gauge("sim_reservations", "Cooperative routing: reserved cells and drones holding a window",
+                lambda: _reservation_stats(sim), labels=("stat",))
+        r.counter_fn("sim_reservation_fallbacks_total", "Cooperative plans that kept their plain route",
+                     lambda: sim.reservations.fallbacks if sim.reservations is not None else None)
+
+    def observe_tick(self, seconds, phases, replans, expanded, conflicts=0):
+        self.ticks.inc()
+        self.tick_seconds.observe(seconds)
+        for phase, value in phases.items():
+            self.phase_seconds.observe(value, phase)
+        self.replans.observe(replans)
+        self.expanded.observe(expanded)
+        if replans:
+            self.replans_total.inc(replans)
+        if expanded:
+            self.expanded_total.inc(expanded)
+        self.conflicts.observe(conflicts)
+        if conflicts:
+            self.conflicts_total.inc(conflicts)
+
+
+def _reservation_stats(sim):
+    if sim.reservations is None:
+        return {}
+    stats = sim.reservations.stats()
+    return {(k,): stats[k] for k in ("reserved", "drones")}
+
+
+def _drone_states(sim):
+    counts = {}
+    for d in list(sim.drones):
+        counts[(d.state,)] = counts.get((d.state,), 0) + 1
+    return counts
@@ -1,7 +1,9 @@
 # backend/model.py
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
+import config
+
 class ToggleObstacleRequest(BaseModel):
     label: str
 
@@ -9,6 +11,16 @@ class AssignTaskRequest(BaseModel):
     pickup: str
     drop: str
 
+class AssignTasksRequest(BaseModel):
+    tasks: List[AssignTaskRequest]
+
+class FastForwardRequest(BaseModel):
+    ticks: int = Field(ge=0, le=getattr(config, "FAST_FORWARD_MAX_TICKS", 10000))
+
+class LoopConfigRequest(BaseModel):
+    rate_hz: Optional[float] = None
+    policy: Optional[str] = None
+
 class DroneState(BaseModel):
     id: int
     x: float
@@ -21,9 +33,26 @@ class Obstacle(BaseModel):
     row: int
     col: int
 
+class LogEvent(BaseModel):
+    seq: int
+    time: float
+    kind: str
+    message: str
+
+class LogPage(BaseModel):
+    events: List[LogEvent]
+    next: int
+    first_seq: int
+    last_seq: int
+
 class StateResponse(BaseModel):
     drones: List[DroneState]
-    obstacles: List[Obstacle]
+    obstacles: str              # base64 bit-packed grid, row-major, MSB first
     logs: List[str]
+    log_seq: int
     grid_size: int
-    cell_size: int
\ No newline at end of file
+    cell_size: int
+
+class CreateSessionRequest(BaseModel):
+    num_drones: Optional[int] = None
+    seed: Optional[int] = None
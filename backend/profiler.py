@@ -0,0 +1,99 @@
+# backend/profiler.py
+"""Opt-in sampling profiler producing flame-graph input.
+
+A daemon thread wakes every ``interval`` seconds, grabs the current Python
+stack of every other thread (``sys._current_frames``) and counts each
+distinct stack. ``collapsed()`` renders the counts in the "collapsed stack"
+format understood by flamegraph.pl, speedscope and inferno::
+
+    thread;module:function;module:function 42
+
+Sampling costs nothing until started and only a few microseconds per sample
+while running; the default 5 ms interval keeps the overhead around 1%.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def _frame_name(code):
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_name}"
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = 0
+        self.stacks = Counter()
+        self.started_at = None
+        self.stopped_at = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=None):
+        """Start sampling (no-op while running); clears samples of the previous run."""
+        if self.running:
+            return
+        if interval is not None:
+            self.interval = interval
+        self.samples = 0
+        self.stacks = Counter()
+        self.started_at = time.time()
+        self.stopped_at = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+            self.stopped_at = time.time()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            sampled = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}").replace(";", ":"))
+                sampled.append(";".join(reversed(stack)))
+            with self._lock:
+                self.stacks.update(sampled)
+                self.samples += 1
+
+    def collapsed(self):
+        """The samples so far as collapsed stacks, one "stack count" line each."""
+        with self._lock:
+            items = sorted(self.stacks.items())
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        return path
+
+    def stats(self):
+        end = self.stopped_at or time.time()
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "samples": self.samples,
+            "stacks": len(self.stacks),
+            "seconds": end - self.started_at if self.started_at else None,
+        }
@@ -0,0 +1,374 @@
+# backend/sessions.py
+"""Many independent simulations behind one API.
+
+Every Session owns a Simulation (its own lock, RNG, caches and metrics) plus
+the StateStream and TickLoop that serve it, so sessions never contend with
+each other. The SessionManager creates sessions, looks them up by id for the
+routes, evicts sessions nobody has touched for ``idle_timeout`` seconds and
+keeps each under a memory cap: over the cap its caches are dropped first, and
+if that is not enough the session is evicted.
+
+With ``workers`` > 0, new sessions are hosted in worker processes instead
+(the least loaded one is picked). The API process then only holds a
+RemoteSimulation proxy per session, so the simulations of different shards
+also step in parallel rather than sharing one interpreter. Worker processes
+are spawned and read the ``config`` module as it is on disk.
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+import uuid
+from contextlib import suppress
+
+import config
+from backend.simulation import Simulation
+from backend.streaming import StateStream
+from backend.ticker import TickLoop
+
+DEFAULT_SESSION = "default"
+
+
+class SessionError(Exception):
+    """A session could not be created; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# ---------------------------------------------
+# Process shards
+# ---------------------------------------------
+def _serve_shard(conn):
+    """Worker process loop: host simulations by session id and answer calls on them."""
+    sims = {}
+    while True:
+        try:
+            session_id, method, args, kwargs = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        try:
+            if method == "__create__":
+                sims[session_id] = Simulation(*args, **kwargs)
+                result = None
+            elif method == "__delete__":
+                result = sims.pop(session_id, None) is not None
+            elif method == "__getattr__":
+                result = getattr(sims[session_id], args[0])
+            else:
+                result = getattr(sims[session_id], method)(*args, **kwargs)
+        except Exception as exc:
+            conn.send((False, exc))
+        else:
+            conn.send((True, result))
+
+
+class Shard:
+    """One worker process; calls from any thread are serialized over its pipe."""
+
+    def __init__(self, index):
+        self.index = index
+        self.sessions = 0
+        ctx = multiprocessing.get_context("spawn")
+        self._conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_serve_shard, args=(child,), name=f"sim-shard-{index}", daemon=True)
+        self.process.start()
+        child.close()
+        self._lock = threading.Lock()
+
+    def call(self, session_id, method, *args, **kwargs):
+        with self._lock:
+            try:
+                self._conn.send((session_id, method, args, kwargs))
+                ok, result = self._conn.recv()
+            except (EOFError, OSError) as exc:
+                raise RuntimeError(f"simulation shard {self.index} is gone") from exc
+        if not ok:
+            raise result
+        return result
+
+    def close(self):
+        self._conn.close()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class RemoteSimulation:
+    """Stands in for a Simulation hosted by a Shard.
+
+    Forwards the calls the routes, TickLoop and StateStream make; results and
+    exceptions (e.g. SnapshotError) come back pickled.
+    """
+
+    def __init__(self, shard, session_id, num_drones=None, seed=None):
+        self.shard = shard
+        self.session_id = session_id
+        shard.call(session_id, "__create__", num_drones, seed=seed)
+        self.num_drones = num_drones if num_drones is not None else getattr(config, "NUM_DRONES", 2)
+
+    def _call(self, method, *args, **kwargs):
+        return self.shard.call(self.session_id, method, *args, **kwargs)
+
+    @property
+    def revision(self):
+        return self._call("__getattr__", "revision")
+
+    @property
+    def tick(self):
+        return self._call("__getattr__", "tick")
+
+    def step(self):
+        return self._call("step")
+
+    def fast_forward(self, ticks):
+        return self._call("fast_forward", ticks)
+
+    def get_state(self, include_logs=True):
+        return self._call("get_state", include_logs)
+
+    def state_json(self):
+        return self._call("state_json")
+
+    def state_body(self, binary=False, if_none_match=None):
+        return self._call("state_body", binary, if_none_match)
+
+    def get_logs_since(self, seq):
+        return self._call("get_logs_since", seq)
+
+    def get_log_events(self, since=0, limit=100):
+        return self._call("get_log_events", since, limit)
+
+    def toggle_obstacle_by_label(self, label):
+        return self._call("toggle_obstacle_by_label", label)
+
+    def assign_task(self, pickup_label, drop_label):
+        return self._call("assign_task", pickup_label, drop_label)
+
+    def assign_tasks(self, tasks):
+        return self._call("assign_tasks", tasks)
+
+    def reset(self):
+        return self._call("reset")
+
+    def snapshot(self, compress=False):
+        return self._call("snapshot", compress)
+
+    def restore(self, data):
+        result = self._call("restore", data)
+        self.num_drones = result["drones"]
+        return result
+
+    def memory_bytes(self):
+        return self._call("memory_bytes")
+
+    def trim_caches(self):
+        return self._call("trim_caches")
+
+    def metrics_text(self):
+        return self._call("metrics_text")
+
+    def close(self):
+        with suppress(Exception):
+            self._call("__delete__")
+
+
+# ---------------------------------------------
+# Sessions
+# ---------------------------------------------
+class Session:
+    def __init__(self, session_id, sim, shard=None):
+        self.id = session_id
+        self.sim = sim
+        self.shard = shard
+        self.stream = StateStream(sim)
+        self.ticker = TickLoop(sim, on_tick=self.publish_tick)
+        self.created = time.time()
+        self.last_used = time.monotonic()
+        # open /ws connections; a watched session is never idle
+        self.viewers = 0
+        self.memory = None
+        self._pump = None
+
+    async def publish_tick(self):
+        """Push the new tick to /ws viewers right away instead of waiting for the pump."""
+        if await asyncio.to_thread(self.stream.poll):
+            await self.stream.notify()
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+    def idle_for(self):
+        return 0.0 if self.viewers else time.monotonic() - self.last_used
+
+    def start(self, autostart=True):
+        """Start the stream pump (and the tick loop); needs a running event loop."""
+        self._pump = asyncio.create_task(self.stream.pump())
+        if autostart:
+            self.ticker.start()
+
+    async def stop(self):
+        await self.ticker.stop()
+        pump, self._pump = self._pump, None
+        if pump is not None:
+            pump.cancel()
+            with suppress(asyncio.CancelledError):
+                await pump
+
+    def info(self):
+        return {
+            "id": self.id,
+            "created": self.created,
+            "idle_seconds": self.idle_for(),
+            "viewers": self.viewers,
+            "drones": len(self.sim.drones) if self.shard is None else self.sim.num_drones,
+            "shard": self.shard.index if self.shard is not None else None,
+            "memory_bytes": self.memory,
+            "ticking": self.ticker.running,
+        }
+
+
+class SessionManager:
+    """Creates, finds and evicts sessions (see module docstring)."""
+
+    def __init__(self, default_sim=None, max_sessions=None, idle_timeout=None, max_bytes=None,
+                 max_drones=None, workers=None):
+        self.max_sessions = max_sessions if max_sessions is not None else getattr(config, "SESSION_MAX", 32)
+        self.idle_timeout = idle_timeout if idle_timeout is not None else getattr(config, "SESSION_IDLE_TIMEOUT", 900.0)
+        self.max_bytes = max_bytes if max_bytes is not None else getattr(config, "SESSION_MAX_BYTES", None)
+        self.max_drones = max_drones if max_drones is not None else getattr(config, "SESSION_MAX_DRONES", 10000)
+        workers = workers if workers is not None else getattr(config, "SESSION_WORKERS", 0)
+        self.evicted = 0
+        self._workers = workers
+        self._shards = []
+        # guards _shards and Shard.sessions, which _build and _release touch from worker threads
+        self._shards_lock = threading.Lock()
+        self._sessions = {}
+        # slots taken by creates still starting up (counted against max_sessions)
+        self._pending = 0
+        # the default session is local, never evicted, and what the unprefixed routes use
+        self.default = Session(DEFAULT_SESSION, default_sim or Simulation())
+        self._sessions[DEFAULT_SESSION] = self.default
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id):
+        """The session with ``session_id``; raises KeyError."""
+        return self._sessions[session_id]
+
+    def sessions(self):
+        return list(self._sessions.values())
+
+    def _shard(self):
+        """The least loaded shard (spawning up to ``workers`` of them), with one session booked on it."""
+        with self._shards_lock:
+            if len(self._shards) < self._workers:
+                self._shards.append(Shard(len(self._shards)))
+            shard = min(self._shards, key=lambda shard: shard.sessions)
+            shard.sessions += 1
+            return shard
+
+    def _unbook(self, shard):
+        with self._shards_lock:
+            shard.sessions -= 1
+
+    def _build(self, session_id, num_drones, seed):
+        if self._workers:
+            shard = self._shard()
+            try:
+                sim = RemoteSimulation(shard, session_id, num_drones, seed)
+            except BaseException:
+                self._unbook(shard)
+                raise
+            return Session(session_id, sim, shard)
+        return Session(session_id, Simulation(num_drones, seed=seed))
+
+    async def create(self, num_drones=None, seed=None, autostart=None):
+        if num_drones is None:
+            num_drones = getattr(config, "NUM_DRONES", 2)
+        if not 0 <= num_drones <= self.max_drones:
+            raise SessionError(f"num_drones must be between 0 and {self.max_drones}")
+        # the default session does not count against the limit; the slot is
+        # taken before the first await so that concurrent creates cannot overshoot
+        if len(self._sessions) - 1 + self._pending >= self.max_sessions:
+            raise SessionError(f"session limit ({self.max_sessions}) reached", status=429)
+        self._pending += 1
+        try:
+            session_id = uuid.uuid4().hex[:12]
+            session = await asyncio.to_thread(self._build, session_id, num_drones, seed)
+            try:
+                session.memory = await asyncio.to_thread(session.sim.memory_bytes)
+            except BaseException:
+                await asyncio.to_thread(self._release, session)
+                raise
+            if self.max_bytes and session.memory > self.max_bytes:
+                await asyncio.to_thread(self._release, session)
+                raise SessionError(f"session would need ~{session.memory} bytes, over the {self.max_bytes} byte cap",
+                                   status=413)
+            self._sessions[session_id] = session
+        finally:
+            self._pending -= 1
+        session.start(getattr(config, "TICK_AUTOSTART", True) if autostart is None else autostart)
+        return session
+
+    def _release(self, session):
+        if session.shard is not None:
+            session.sim.close()
+            self._unbook(session.shard)
+
+    async def delete(self, session_id):
+        if session_id == DEFAULT_SESSION:
+            raise SessionError("the default session cannot be deleted")
+        session = self._sessions.pop(session_id)
+        await session.stop()
+        await asyncio.to_thread(self._release, session)
+        return session
+
+    async def reap(self):
+        """Evict idle sessions and enforce the memory cap; returns the evicted ids."""
+        evicted = []
+        for session in self.sessions():
+            if session is self.default:
+                continue
+            if self.idle_timeout and session.idle_for() > self.idle_timeout:
+                evicted.append(session.id)
+                continue
+            session.memory = await asyncio.to_thread(session.sim.memory_bytes)
+            if self.max_bytes and session.memory > self.max_bytes:
+                await asyncio.to_thread(session.sim.trim_caches)
+                session.memory = await asyncio.to_thread(session.sim.memory_bytes)
+                if session.memory > self.max_bytes:
+                    evicted.append(session.id)
+        for session_id in evicted:
+            with suppress(KeyError):
+                await self.delete(session_id)
+                self.evicted += 1
+        return evicted
+
+    async def reaper(self, interval=None):
+        """Background task: ``reap`` every ``interval`` seconds."""
+        interval = interval or getattr(config, "SESSION_REAP_INTERVAL", 30.0)
+        while True:
+            await asyncio.sleep(interval)
+            await self.reap()
+
+    async def close(self):
+        """Stop every session (the default one included) and the worker processes."""
+        for session in self.sessions():
+            await session.stop()
+            if session is not self.default:
+                self._sessions.pop(session.id, None)
+        with self._shards_lock:
+            shards, self._shards = self._shards, []
+        for shard in shards:
+            await asyncio.to_thread(shard.close)
+
+    def stats(self):
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "evicted": self.evicted,
+            "shards": [{"index": s.index, "sessions": s.sessions, "pid": s.process.pid} for s in self._shards],
+        }
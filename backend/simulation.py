@@ -1,18 +1,57 @@
 # backend/simulation.py
-import math
 from typing import List, Tuple, Dict
 import config
 from aiml.agent import Drone
+from aiml.hpa import HierarchicalPlanner
+from aiml.occupancy import ChangeLog, OccupancyGrid
+from aiml.path_cache import PathCache
+from aiml.qtable import QTable, states_for
+from aiml.reservation import ReservationTable, cell_step_ticks
+from aiml.routing import Router
+from backend.eventlog import EventLog
+from backend.metrics import SimulationMetrics
+from backend import encoding, snapshot
+from backend.assignment import match_tasks
+from backend.spatial import GridIndex
+from utils import drone_home, pixel_to_grid
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+import base64
+import heapq
+import json
+import os
+import random
 import threading
+import time
 
 # ---------------------------------------------
 # Helper Functions
 # ---------------------------------------------
+def row_label(row: int) -> str:
+    """Row letters, spreadsheet style: 0 → 'A', 25 → 'Z', 26 → 'AA', 702 → 'AAA'."""
+    letters = ""
+    row += 1
+    while row:
+        row, rem = divmod(row - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
 def label_to_coord(label: str) -> Tuple[int, int]:
-    """Convert 'A1' to (0,0), 'B4' to (1,3) etc."""
-    row = ord(label[0].upper()) - 65
-    col = int(label[1:]) - 1
-    return (row, col)
+    """Convert 'A1' to (0,0), 'B4' to (1,3), 'AA10' to (26,9) etc.; ValueError if malformed."""
+    label = label.strip().upper()
+    split = len(label) - len(label.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    letters, digits = label[:split], label[split:]
+    if not letters or not digits.isdigit():
+        raise ValueError(f"invalid cell label {label!r}")
+    row = 0
+    for ch in letters:
+        row = row * 26 + ord(ch) - 64
+    return (row - 1, int(digits) - 1)
+
+def coord_to_label(row: int, col: int) -> str:
+    """Convert (0,0) to 'A1', (26,9) to 'AA10' etc."""
+    return f"{row_label(row)}{col + 1}"
 
 def coord_to_center(row: int, col: int) -> Tuple[int, int]:
     """Convert cell (row,col) → pixel center (x,y)."""
@@ -21,24 +60,238 @@ def coord_to_center(row: int, col: int) -> Tuple[int, int]:
     return (x, y)
 
 
+class PublishedState:
+    """The state readers see, published after every tick or batch of commands.
+
+    Built once under the simulation lock and never modified afterwards
+    (read-copy-update): readers take the current instance without locking
+    and must treat ``state`` as read-only. The JSON and binary bodies are
+    serialized on first use and then shared by every reader of this revision;
+    ``etag`` tells revisions (and simulations, via ``epoch``) apart.
+    """
+    __slots__ = ("revision", "state", "etag", "_json", "_binary")
+
+    def __init__(self, state, epoch=""):
+        self.revision = state["revision"]
+        self.state = state
+        self.etag = f'"{epoch}-{self.revision}"'
+        self._json = None
+        self._binary = None
+
+    def json(self) -> bytes:
+        body = self._json
+        if body is None:
+            # same encoding as FastAPI's JSONResponse
+            body = self._json = json.dumps(self.state, ensure_ascii=False, allow_nan=False,
+                                           separators=(",", ":")).encode("utf-8")
+        return body
+
+    def binary(self) -> bytes:
+        body = self._binary
+        if body is None:
+            body = self._binary = encoding.encode_binary(self.state)
+        return body
+
+    def body(self, binary=False, if_none_match=None):
+        """(ETag, body) in the requested encoding; body is None if ``if_none_match`` names the ETag."""
+        etag = self.etag[:-1] + '-bin"' if binary else self.etag
+        if encoding.etag_matches(if_none_match, etag):
+            return etag, None
+        return etag, self.binary() if binary else self.json()
+
+
+# rough per-object sizes (CPython, 64-bit) for Simulation.memory_bytes
+_DRONE_BYTES = 450
+_WAYPOINT_BYTES = 4
+_CACHED_CELL_BYTES = 112
+_HPA_CLUSTER_BYTES = 16000
+_LOG_EVENT_BYTES = 250
+
+
 # ---------------------------------------------
 # MAIN SIMULATION CLASS
 # ---------------------------------------------
 class Simulation:
-    def __init__(self):
+    def __init__(self, num_drones=None, seed=None):
         self.grid_size = config.GRID_SIZE
         self.cell_size = config.CELL_SIZE
 
-        self.obstacle_grid_coords = set()
+        # every random draw of the simulation (drone exploration) comes from here
+        if seed is None:
+            seed = getattr(config, "RANDOM_SEED", None)
+        self.seed = seed if seed is not None else random.SystemRandom().randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        # input journal (backend.journal), attached with attach_journal
+        self.journal = None
+
+        self.obstacle_grid_coords = OccupancyGrid(self.grid_size)
+        # bumped on every obstacle change; part of the path cache key
+        self.obstacle_version = 0
+        # cells toggled per version, so D* Lite planners catch up without a grid diff
+        self.obstacle_changes = ChangeLog(getattr(config, "OBSTACLE_CHANGE_LOG", 1024))
+        # large grids plan hierarchically (aiml.hpa), behind the same path cache
+        self.hpa = None
+        if self.grid_size >= getattr(config, "HPA_MIN_GRID", 256):
+            self.hpa = HierarchicalPlanner(self.grid_size, self.obstacle_grid_coords,
+                                           getattr(config, "HPA_CLUSTER_SIZE", 16),
+                                           getattr(config, "HPA_HEURISTIC_WEIGHT", 1.0))
+        self.path_cache = PathCache(self.grid_size, getattr(config, "PATH_CACHE_SIZE", 1024),
+                                    self.hpa.find_path if self.hpa is not None else None)
+        # optional precomputed routes for mostly static maps, rebuilt off the request path
+        self.router = None
+        if getattr(config, "ROUTING_TABLES", False):
+            self.router = Router(self.grid_size,
+                                 getattr(config, "ROUTING_ALL_PAIRS_MAX_CELLS", 1024),
+                                 getattr(config, "ROUTING_LANDMARKS", 8),
+                                 getattr(config, "ROUTING_BACKGROUND", True))
+            self.router.rebuild(self.obstacle_grid_coords, self.obstacle_version)
+        # cooperative routing: drones reserve their next cells in space-time
+        self.reservations = None
+        if getattr(config, "COOPERATIVE_ROUTING", False):
+            step_ticks = cell_step_ticks(getattr(config, "DRONE_SPEED", 2.0), self.cell_size,
+                                         getattr(config, "WAYPOINT_TOLERANCE", 1.0))
+            self.reservations = ReservationTable(self.grid_size, step_ticks, getattr(config, "COOP_WINDOW", 8))
 
         # initialize drones
+        if num_drones is None:
+            num_drones = getattr(config, "NUM_DRONES", 2)
+        # one NumPy Q-table for the fleet: a slice per drone, or slice 0 for all when shared
+        shared = getattr(config, "Q_TABLE_SHARED", False)
+        agents = 1 if shared else num_drones
+        q_path = getattr(config, "Q_TABLE_PATH", None)
+        if q_path and os.path.exists(q_path):
+            self.q_table = QTable.load(q_path, agents)
+        else:
+            states = states_for(self.grid_size, agents, max_bytes=getattr(config, "Q_TABLE_MAX_BYTES", None))
+            self.q_table = QTable(states, agents=agents)
         self.drones = [
-            Drone(1, 30, 30, 'drone_icon.png'),
-            Drone(2, 90, 30, 'drone_icon.png')
+            Drone(idx + 1, *drone_home(idx), 'drone_icon.png', self.q_table.view(0 if shared else idx), self.rng)
+            for idx in range(num_drones)
         ]
 
-        self.logs = []
+        self.logs = EventLog(getattr(config, "LOG_CAPACITY", 1000))
+        self.log_tail = getattr(config, "LOG_STATE_TAIL", 20)
+        # tick counts steps; revision counts every mutation (steps, toggles, tasks, resets)
+        self.tick = 0
+        self.revision = 0
+        # drones bucketed by current cell and next-waypoint cell
+        self.spatial = GridIndex(self.grid_size, self.cell_size)
+        for d in self.drones:
+            self._reindex(d)
+
+        # planning cost of the most recent tick
+        self.replan_stats = {"replans": 0, "plan_ms": 0.0, "expanded": 0, "conflicts": 0}
         self._lock = threading.Lock()
+        # per-phase timings and counters for /metrics
+        self.metrics = SimulationMetrics(self) if getattr(config, "METRICS_ENABLED", True) else None
+        # mutations queued for the next tick boundary: (function, args, Future)
+        self._commands = deque()
+        # ids of drones changed by commands since the last publish (None: all);
+        # only those are rebuilt, at their slot in the last published list
+        self._dirty = None
+        self._drone_slots = {}
+        # (obstacle_version, packed bitmap): packed once per map change
+        self._packed_obstacles = (None, None)
+        # part of every ETag: revisions restart at 0 in a new simulation or process
+        self._epoch = os.urandom(4).hex()
+        self._published = None
+        self._publish()
+
+    @contextmanager
+    def _locked(self, op):
+        """The simulation lock, recording how long ``op`` waited for it."""
+        if self.metrics is None:
+            with self._lock:
+                yield
+            return
+        t0 = time.perf_counter()
+        with self._lock:
+            self.metrics.lock_wait.observe(time.perf_counter() - t0, op)
+            yield
+
+    # ---------------------------------------------
+    # Commands and published state
+    # ---------------------------------------------
+    def _submit(self, op, fn, *args):
+        """Queue a mutation and return its result once it has been applied.
+
+        Commands run at tick boundaries: a step in progress applies nothing
+        mid-tick, the next one applies everything queued before it starts,
+        and between ticks the submitting thread applies the queue itself.
+        """
+        future = Future()
+        self._commands.append((fn, args, future))
+        with self._locked(op):
+            self._apply_commands()
+        return future.result()
+
+    def _apply_commands(self):
+        """Run queued commands in order (lock held), then publish once for the batch."""
+        if not self._commands:
+            return
+        while self._commands:
+            fn, args, future = self._commands.popleft()
+            try:
+                future.set_result(fn(*args))
+            except Exception as exc:
+                future.set_exception(exc)
+        self._publish()
+
+    def _changed(self, d):
+        if self._dirty is not None:
+            self._dirty.add(d.id)
+
+    def _publish(self):
+        """Build the state readers see (lock held)."""
+        started = time.perf_counter()
+        self._published = PublishedState(self._build_state(), self._epoch)
+        if self.metrics is not None:
+            self.metrics.state_seconds.observe(time.perf_counter() - started)
+
+    # ---------------------------------------------
+    # Spatial index upkeep
+    # ---------------------------------------------
+    def _reindex(self, d):
+        heading = None
+        if d.path and d.current_waypoint_index < len(d.path):
+            heading = divmod(d.path[d.current_waypoint_index], self.grid_size)
+        self.spatial.place(d, pixel_to_grid((d.x, d.y)), heading)
+
+    def _routing(self):
+        """Routing table for the current obstacles, or None (disabled or rebuilding)."""
+        if self.router is None:
+            return None
+        return self.router.current(self.obstacle_version)
+
+    def _rebuild_derived(self):
+        """Drop and rebuild state derived from drones and obstacles.
+
+        Used after a restore, and when a journal starts, so that a replay
+        starting from a snapshot has the same (cold) caches as the original.
+        """
+        # a fresh version: nothing cached for the old obstacles may survive
+        self.obstacle_version += 1
+        self.obstacle_changes.reset(self.obstacle_version)
+        self.path_cache.clear(self.obstacle_version)
+        if self.hpa is not None:
+            self.hpa.bind(self.obstacle_grid_coords)
+        if self.router is not None:
+            self.router.rebuild(self.obstacle_grid_coords, self.obstacle_version)
+        if self.reservations is not None:
+            self.reservations.clear()
+        for d in self.drones:
+            d.planner = None
+        self.spatial = GridIndex(self.grid_size, self.cell_size)
+        for d in self.drones:
+            self._reindex(d)
+
+    @staticmethod
+    def _is_busy(d):
+        return d.state != "idle"
+
+    @staticmethod
+    def _is_available(d):
+        return d.state == "idle" and getattr(d, "battery", 100) > getattr(d, "low_battery_threshold", 0)
 
     # ---------------------------------------------
     # Toggle obstacles
@@ -48,14 +301,26 @@ class Simulation:
             r, c = label_to_coord(label)
         except Exception:
             return False
+        if not (0 <= r < self.grid_size and 0 <= c < self.grid_size):
+            return False
 
-        with self._lock:
-            if (r, c) in self.obstacle_grid_coords:
-                self.obstacle_grid_coords.remove((r, c))
-                self.logs.append(f"Removed obstacle {label}")
-            else:
-                self.obstacle_grid_coords.add((r, c))
-                self.logs.append(f"Added obstacle {label}")
+        return self._submit("toggle_obstacle", self._toggle_obstacle, label, (r, c))
+
+    def _toggle_obstacle(self, label, cell):
+        self._record("toggle_obstacle", label=label)
+        added = self.obstacle_grid_coords.toggle(cell)
+        if added:
+            self.logs.append(f"Added obstacle {label}", "obstacle")
+        else:
+            self.logs.append(f"Removed obstacle {label}", "obstacle")
+        self.obstacle_version += 1
+        self.obstacle_changes.record(self.obstacle_version, cell)
+        self.path_cache.invalidate_cell(cell, added, self.obstacle_version)
+        if self.hpa is not None:
+            self.hpa.update_cell(cell)
+        if self.router is not None:
+            self.router.rebuild(self.obstacle_grid_coords, self.obstacle_version)
+        self.revision += 1
         return True
 
     # ---------------------------------------------
@@ -63,94 +328,422 @@ class Simulation:
     # ---------------------------------------------
     def assign_task(self, pickup_label: str, drop_label: str) -> Dict:
         try:
-            pickup_center = coord_to_center(*label_to_coord(pickup_label))
-            drop_center = coord_to_center(*label_to_coord(drop_label))
+            pickup = label_to_coord(pickup_label)
+            drop = label_to_coord(drop_label)
+            if not all(0 <= v < self.grid_size for v in pickup + drop):
+                raise ValueError(pickup_label, drop_label)
+            pickup_center = coord_to_center(*pickup)
+            drop_center = coord_to_center(*drop)
         except Exception:
             return {"success": False, "message": "Invalid labels"}
 
-        with self._lock:
-            available = [
-                d for d in self.drones
-                if d.state == "idle" and getattr(d, "battery", 100) > getattr(d, "low_battery_threshold", 0)
-            ]
+        return self._submit("assign_task", self._assign_task, pickup_label, drop_label, pickup_center, drop_center)
+
+    def _assign_task(self, pickup_label, drop_label, pickup_center, drop_center):
+        self._record("assign_task", pickup=pickup_label, drop=drop_label)
+        self.revision += 1
+        routing = self._routing()
+        if routing is not None:
+            # O(1) path distances from the routing table (ties go to the lower id)
+            closest = self._nearest_by_route(routing, pixel_to_grid(pickup_center))
+        else:
+            # closest idle drone from the spatial index (ties go to the lower id)
+            closest = self.spatial.nearest(pickup_center[0], pickup_center[1], self._is_available)
+        if closest is None:
+            msg = "All drones are busy or have low battery."
+            self.logs.append(msg, "task")
+            return {"success": False, "message": msg}
+
+        closest.set_task(pickup_center, drop_center)
+        self._reindex(closest)
+        self._changed(closest)
+        msg = f"Bot {closest.id} assigned {pickup_label} → {drop_label}"
+        self.logs.append(msg, "task")
+
+        return {"success": True, "message": msg, "drone_id": closest.id}
+
+    def _nearest_by_route(self, routing, pickup):
+        best = None
+        best_key = None
+        for d in self.drones:
+            if not self._is_available(d):
+                continue
+            dist = routing.distance(pixel_to_grid((d.x, d.y)), pickup)
+            if dist is not None and (best_key is None or (dist, d.id) < best_key):
+                best_key = (dist, d.id)
+                best = d
+        return best
+
+    # ---------------------------------------------
+    # Assign Tasks (batched, jointly optimal)
+    # ---------------------------------------------
+    def assign_tasks(self, tasks: List[Tuple[str, str]]) -> Dict:
+        """Assign many (pickup, drop) label pairs at once.
+
+        Each task looks at its nearest idle drones in the spatial index by
+        obstacle-aware grid distance and the whole batch is matched to
+        minimize the total distance to the pickups.
+        """
+        results = [None] * len(tasks)
+        valid = []
+        for i, (pickup_label, drop_label) in enumerate(tasks):
+            try:
+                pickup = label_to_coord(pickup_label)
+                drop = label_to_coord(drop_label)
+                if not all(0 <= v < self.grid_size for v in pickup + drop):
+                    raise ValueError(pickup_label, drop_label)
+            except Exception:
+                results[i] = {"pickup": pickup_label, "drop": drop_label,
+                              "success": False, "message": "Invalid labels"}
+                continue
+            valid.append((i, pickup, drop))
 
-            if not available:
-                msg = "All drones are busy or have low battery."
-                self.logs.append(msg)
-                return {"success": False, "message": msg}
+        return self._submit("assign_tasks", self._assign_tasks, tasks, valid, results)
 
-            # choose closest drone
-            closest = min(
-                available,
-                key=lambda d: math.hypot(d.x - pickup_center[0], d.y - pickup_center[1])
-            )
+    def _assign_tasks(self, tasks, valid, results):
+        self._record("assign_tasks", tasks=[list(t) for t in tasks])
+        k = getattr(config, "ASSIGN_CANDIDATES", 8)
+        matched = match_tasks(self.spatial, self.obstacle_grid_coords, [p for _, p, _ in valid], k,
+                              accept=self._is_available, max_expanded=getattr(config, "ASSIGN_MAX_EXPANDED", None))
 
-            closest.set_task(pickup_center, drop_center)
-            msg = f"Bot {closest.id} assigned {pickup_label} → {drop_label}"
-            self.logs.append(msg)
+        assigned = 0
+        for row, (i, pickup, drop) in enumerate(valid):
+            pickup_label, drop_label = tasks[i]
+            if row not in matched:
+                results[i] = {"pickup": pickup_label, "drop": drop_label,
+                              "success": False, "message": "No idle drone can reach the pickup"}
+                continue
+            drone, distance = matched[row]
+            drone.set_task(coord_to_center(*pickup), coord_to_center(*drop))
+            self._reindex(drone)
+            self._changed(drone)
+            msg = f"Bot {drone.id} assigned {pickup_label} → {drop_label}"
+            self.logs.append(msg, "task")
+            results[i] = {"pickup": pickup_label, "drop": drop_label, "success": True,
+                          "message": msg, "drone_id": drone.id, "distance": distance}
+            assigned += 1
 
-            return {"success": True, "message": msg, "drone_id": closest.id}
+        self.revision += 1
+        return {"success": assigned > 0, "assigned": assigned, "results": results}
 
     # ---------------------------------------------
     # Step Simulation
     # ---------------------------------------------
     def step(self) -> List[str]:
         step_logs = []
-        with self._lock:
+        replans = 0
+        plan_ms = 0.0
+        expanded = 0
+        strategic_ms = 0.0
+        with self._locked("step"):
+            # commands queued since the last tick are applied at its boundary
+            self._apply_commands()
+            started = time.perf_counter()
+            self._record("step")
+            recorded = time.perf_counter()
+            # drones standing in or heading into an obstacle, found from the
+            # obstacle side instead of probing every drone
+            blocked_ids = self.spatial.touching(self.obstacle_grid_coords)
+            # the routing table answers with the PathCache interface when it is current
+            planner = self._routing() or self.path_cache
+            reservations = self.reservations
+            if reservations is not None:
+                reservations.advance(self.tick)
+            indexed = time.perf_counter()
             for d in self.drones:
-                msg = d.update(self.obstacle_grid_coords)
+                msg = d.update(self.obstacle_grid_coords, planner, d.id in blocked_ids, reservations,
+                               self.obstacle_changes)
+                self._reindex(d)
+                if d.replanned:
+                    replans += 1
+                plan_ms += d.plan_ms
+                expanded += d.plan_expanded
+                strategic_ms += d.strategic_ms
                 if msg:
                     step_logs.append(msg)
-                    self.logs.append(msg)
+                    self.logs.append(msg, "drone")
+            # busy drones sharing a cell: what cooperative routing avoids
+            conflicts = self.spatial.crowded(self._is_busy)
+            moved = time.perf_counter()
+            self.replan_stats = {"replans": replans, "plan_ms": plan_ms, "expanded": expanded,
+                                 "conflicts": conflicts}
+            self.tick += 1
+            self.revision += 1
+            if self.journal is not None:
+                self.journal.after_step(self)
+            journaled = time.perf_counter()
+            self._dirty = None
+            self._publish()
+            if self.metrics is not None:
+                finished = time.perf_counter()
+                plan_s = plan_ms / 1000.0
+                strategic_s = strategic_ms / 1000.0
+                self.metrics.observe_tick(finished - started, {
+                    "index": indexed - recorded,
+                    "plan": plan_s,
+                    "strategic": strategic_s,
+                    "move": max(0.0, moved - indexed - plan_s - strategic_s),
+                    "journal": (recorded - started) + (journaled - moved),
+                    "publish": finished - journaled,
+                }, replans, expanded, conflicts)
         return step_logs
 
+    # ---------------------------------------------
+    # Fast-forward (event-driven, for offline what-if runs)
+    # ---------------------------------------------
+    def fast_forward(self, ticks: int) -> Dict:
+        """Advance ``ticks`` ticks at once, ending in the state ``ticks`` step() calls reach.
+
+        Only drone events run the full Drone.update: reaching a waypoint,
+        pickup, drop-off, delivery, planning, a new reservation window,
+        an obstacle or an empty battery. A priority queue of (tick, drone
+        index) replays them in the order stepping would. Between events, a
+        drone coasts through its uneventful ticks in one tight loop (see
+        Drone.coast), and idle drones are skipped entirely. Per-tick
+        metrics and the published state of intermediate ticks are not
+        produced.
+        """
+        if ticks < 0:
+            raise ValueError("ticks must be >= 0")
+        with self._locked("fast_forward"):
+            self._apply_commands()
+            self._record("fast_forward", ticks=ticks)
+            started = time.perf_counter()
+            end = self.tick + ticks
+            obstacles = self.obstacle_grid_coords
+            reservations = self.reservations
+            queue = [(self.tick, i) for i, d in enumerate(self.drones)
+                     if d.task is not None or d.state != "idle"]
+            heapq.heapify(queue)
+            events = 0
+            while queue:
+                tick, i = heapq.heappop(queue)
+                if tick >= end:
+                    break
+                d = self.drones[i]
+                if reservations is not None:
+                    reservations.advance(tick)
+                msg = d.update(obstacles, self._routing() or self.path_cache, None, reservations,
+                               self.obstacle_changes)
+                events += 1
+                if msg:
+                    self.logs.append(msg, "drone")
+                if d.task is None:
+                    # idle until the next command
+                    continue
+                tick += 1
+                tick += d.coast(end - tick, obstacles, reservations)
+                if tick < end:
+                    heapq.heappush(queue, (tick, i))
+            for d in self.drones:
+                self._reindex(d)
+            self.tick = end
+            self.revision += 1
+            if self.journal is not None:
+                self.journal.after_step(self)
+            self._dirty = None
+            self._publish()
+            if self.metrics is not None:
+                self.metrics.fast_forward_ticks.inc(ticks)
+            return {"success": True, "tick": self.tick, "ticks": ticks, "events": events,
+                    "seconds": time.perf_counter() - started}
+
     # ---------------------------------------------
     # Reset Simulation
     # ---------------------------------------------
     def reset(self):
+        self._submit("reset", self._reset)
+
+    def _reset(self):
+        self._record("reset")
+        self._dirty = None
+        self.obstacle_grid_coords.clear()
+        self.obstacle_version += 1
+        self.obstacle_changes.reset(self.obstacle_version)
+        self.path_cache.clear(self.obstacle_version)
+        if self.hpa is not None:
+            self.hpa.reset()
+        if self.router is not None:
+            self.router.rebuild(self.obstacle_grid_coords, self.obstacle_version)
+        if self.reservations is not None:
+            self.reservations.clear()
+        self.logs.append("Environment reset", "reset")
+        self.revision += 1
+
+        for idx, d in enumerate(self.drones):
+            d.x, d.y = drone_home(idx)
+            d.state = "idle"
+            d.task = None
+            if hasattr(d, "battery"):
+                d.battery = 100
+            if hasattr(d, "reward_total"):
+                d.reward_total = 0
+            if hasattr(d, "reward_step"):
+                d.reward_step = 0
+            self._reindex(d)
+
+    # ---------------------------------------------
+    # Snapshot / Restore
+    # ---------------------------------------------
+    def snapshot(self, compress=False) -> bytes:
+        """Full state as versioned binary (see backend.snapshot)."""
+        with self._locked("snapshot"):
+            return snapshot.dump(self, compress)
+
+    def restore(self, data: bytes) -> Dict:
+        """Replace the state with a snapshot; raises snapshot.SnapshotError on bad data."""
+        return self._submit("restore", self._restore, data)
+
+    def _restore(self, data):
+        meta = snapshot.restore(self, data)
+        self._dirty = None
+        self._record("restore", data=base64.b64encode(data).decode("ascii"))
+        self.logs.append(f"Restored snapshot from tick {meta['tick']}", "reset")
+        return {"success": True, "tick": self.tick, "drones": len(self.drones)}
+
+    def checkpoint(self, path, compress=True):
+        snapshot.write_file(path, self.snapshot(compress))
+
+    @classmethod
+    def from_snapshot(cls, data: bytes):
+        """A new, independent Simulation from snapshot bytes (e.g. to fork a what-if run)."""
+        sim = cls(num_drones=0)
+        sim.restore(data)
+        return sim
+
+    # ---------------------------------------------
+    # Input journal (record / replay, see backend.journal)
+    # ---------------------------------------------
+    def _record(self, op, **fields):
+        if self.journal is not None:
+            self.journal.write(op, **fields)
+
+    def attach_journal(self, journal):
+        """Start recording inputs to ``journal`` from the current state on."""
+        with self._lock:
+            # start from cold caches, exactly like a replay restored from the snapshot
+            self._rebuild_derived()
+            journal.begin(snapshot.dump(self, compress=True), self.seed)
+            self.journal = journal
+
+    def detach_journal(self):
         with self._lock:
-            self.obstacle_grid_coords.clear()
-            self.logs.append("Environment reset")
-
-            for idx, d in enumerate(self.drones):
-                d.x = 30 + idx * 60
-                d.y = 30
-                d.state = "idle"
-                d.task = None
-                if hasattr(d, "battery"):
-                    d.battery = 100
-                if hasattr(d, "reward_total"):
-                    d.reward_total = 0
-                if hasattr(d, "reward_step"):
-                    d.reward_step = 0
+            journal, self.journal = self.journal, None
+        return journal
 
     # ---------------------------------------------
-    # Get State (FINAL FIXED)
+    # Session upkeep (see backend.sessions)
     # ---------------------------------------------
-    def get_state(self):
+    def memory_bytes(self) -> int:
+        """Estimated memory held by this simulation: Q-table, drones, paths, caches, logs."""
+        with self._lock:
+            total = self.q_table.values.nbytes + len(self.obstacle_grid_coords.flat)
+            total += len(self.drones) * _DRONE_BYTES
+            total += sum(len(d.path) for d in self.drones) * _WAYPOINT_BYTES
+            total += self.path_cache.cached_cells() * _CACHED_CELL_BYTES
+            if self.hpa is not None:
+                total += len(self.hpa) * _HPA_CLUSTER_BYTES
+            total += len(self.logs) * _LOG_EVENT_BYTES
+            if self.router is not None and self.router.table is not None:
+                total += self.router.table.nbytes
+            return total
+
+    def trim_caches(self):
+        """Drop the path cache, HPA clusters and per-drone planners; they are rebuilt on demand."""
         with self._lock:
-            drones_state = []
+            self.path_cache.clear(self.obstacle_version)
+            if self.hpa is not None:
+                self.hpa.reset()
             for d in self.drones:
-                drones_state.append({
-                    "id": d.id,
-                    "x": d.x,
-                    "y": d.y,
-                    "state": d.state,
-                    "battery": getattr(d, "battery", None),
-                    "task": getattr(d, "task", None),
-
-                    # Rewards for RL UI
-                    "reward_step": getattr(d, "reward_step", 0),
-                    "reward_total": getattr(d, "reward_total", 0)
-                })
-
-            obstacles = [{"row": r, "col": c} for (r, c) in list(self.obstacle_grid_coords)]
-            logs = list(self.logs)
+                d.planner = None
+
+    def metrics_text(self) -> str:
+        """This simulation's metrics in the Prometheus text format ('' when disabled)."""
+        return self.metrics.registry.render() if self.metrics is not None else ""
 
+    # ---------------------------------------------
+    # Logs since a cursor
+    # ---------------------------------------------
+    def get_logs_since(self, seq: int):
+        """Return (log lines appended after ``seq``, new seq)."""
+        with self._lock:
+            return self.logs.messages_since(seq)
+
+    def get_log_events(self, since: int = 0, limit: int = 100) -> Dict:
+        """Structured log events after ``since`` for cursor-based paging."""
+        with self._lock:
+            events = self.logs.since(since, limit)
             return {
-                "drones": drones_state,
-                "obstacles": obstacles,
-                "logs": logs,
-                "grid_size": self.grid_size,
-                "cell_size": self.cell_size
-            }
\ No newline at end of file
+                "events": [EventLog.to_dict(e) for e in events],
+                "next": events[-1][0] if events else max(since, self.logs.first_seq - 1),
+                "first_seq": self.logs.first_seq,
+                "last_seq": self.logs.last_seq,
+            }
+
+    # ---------------------------------------------
+    # Get State (FINAL FIXED)
+    # ---------------------------------------------
+    def get_state(self, include_logs=True):
+        """The latest published state (lock-free; treat it as read-only)."""
+        state = self._published.state
+        if not include_logs:
+            state = {**state, "logs": []}
+        return state
+
+    def state_json(self) -> bytes:
+        """The latest published state, serialized once per revision (lock-free)."""
+        return self._published.json()
+
+    def state_body(self, binary=False, if_none_match=None):
+        """(ETag, body) of the latest published state, see PublishedState.body (lock-free)."""
+        return self._published.body(binary, if_none_match)
+
+    @staticmethod
+    def _drone_view(d):
+        return {
+            "id": d.id,
+            "x": d.x,
+            "y": d.y,
+            "state": d.state,
+            "battery": getattr(d, "battery", None),
+            "task": getattr(d, "task", None),
+
+            # Rewards for RL UI
+            "reward_step": getattr(d, "reward_step", 0),
+            "reward_total": getattr(d, "reward_total", 0)
+        }
+
+    def _build_state(self):
+        dirty = self._dirty
+        if dirty is None or self._published is None:
+            drones_state = [self._drone_view(d) for d in self.drones]
+            self._drone_slots = {d.id: i for i, d in enumerate(self.drones)}
+        else:
+            # only drones touched by commands changed: patch a copy of the last list
+            drones_state = list(self._published.state["drones"])
+            for i in (self._drone_slots[drone_id] for drone_id in dirty):
+                drones_state[i] = self._drone_view(self.drones[i])
+        self._dirty = set()
+
+        # packed bitmap, see OccupancyGrid.pack; repacked only when the map changed
+        version, obstacles = self._packed_obstacles
+        if version != self.obstacle_version:
+            obstacles = self.obstacle_grid_coords.pack()
+            self._packed_obstacles = (self.obstacle_version, obstacles)
+        # only a tail; older lines are paged through /logs
+        logs = [e[3] for e in self.logs.tail(self.log_tail)]
+
+        return {
+            "drones": drones_state,
+            "obstacles": obstacles,
+            "logs": logs,
+            "log_seq": self.logs.last_seq,
+            "tick": self.tick,
+            "revision": self.revision,
+            "grid_size": self.grid_size,
+            "cell_size": self.cell_size,
+            "path_cache": self.path_cache.stats(),
+            "routing": self.router.stats() if self.router is not None else None,
+            "reservations": self.reservations.stats() if self.reservations is not None else None,
+            "replanning": dict(self.replan_stats)
+        }
\ No newline at end of file
@@ -0,0 +1,269 @@
+# backend/snapshot.py
+"""Binary snapshots of a Simulation.
+
+Layout (little endian)::
+
+    header   "DSIM" | u16 format version | u16 flags | u32 section count
+    section  u8 name length | name | u8 dtype length | dtype | u8 ndim |
+             u32 * ndim shape | raw array bytes
+
+Bulk per-drone fields, paths, the Q-table, the obstacle bitmap and the RNG
+state (Simulation.rng) are stored as raw NumPy arrays; the few irregular fields (tasks, log
+events, counters) go into a JSON "meta" section. With FLAG_ZLIB everything
+after the header is zlib-compressed.
+"""
+import array
+import json
+import os
+import random
+import struct
+import zlib
+
+import numpy as np
+
+from aiml.agent import Drone
+from aiml.occupancy import OccupancyGrid
+from aiml.qtable import QTable
+
+MAGIC = b"DSIM"
+FORMAT_VERSION = 1
+FLAG_ZLIB = 1
+
+_HEADER = struct.Struct("<4sHHI")
+
+# Drone.state <-> uint8 code
+STATES = ["idle", "to_pickup", "to_drop", "dropping"]
+
+
+class SnapshotError(ValueError):
+    """Raised for data that is not a readable snapshot."""
+
+
+def _pack_sections(sections):
+    out = []
+    for name, values in sections.items():
+        values = np.ascontiguousarray(values)
+        name_b = name.encode()
+        dtype_b = values.dtype.str.encode()
+        out.append(struct.pack("<B", len(name_b)) + name_b)
+        out.append(struct.pack("<B", len(dtype_b)) + dtype_b)
+        out.append(struct.pack(f"<B{values.ndim}I", values.ndim, *values.shape))
+        out.append(values.tobytes())
+    return b"".join(out)
+
+
+def _unpack_sections(body, count):
+    sections = {}
+    view = memoryview(body)
+    pos = 0
+    try:
+        for _ in range(count):
+            size = view[pos]
+            name = bytes(view[pos + 1:pos + 1 + size]).decode()
+            pos += 1 + size
+            size = view[pos]
+            dtype = np.dtype(bytes(view[pos + 1:pos + 1 + size]).decode())
+            pos += 1 + size
+            ndim = view[pos]
+            shape = struct.unpack_from(f"<{ndim}I", view, pos + 1)
+            pos += 1 + 4 * ndim
+            nbytes = dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+            if pos + nbytes > len(view):
+                raise SnapshotError(f"section {name!r} is truncated")
+            sections[name] = np.frombuffer(view[pos:pos + nbytes], dtype=dtype).reshape(shape).copy()
+            pos += nbytes
+    except (IndexError, struct.error, TypeError, ValueError) as exc:
+        raise SnapshotError(f"corrupt snapshot: {exc}") from exc
+    return sections
+
+
+def dump(sim, compress=False):
+    """Serialize ``sim`` (call with its lock held) and return the bytes."""
+    drones = sim.drones
+    n = sim.grid_size
+    cell = sim.cell_size
+
+    path_cells = []
+    offsets = [0]
+    for d in drones:
+        path_cells.extend(d.path)
+        offsets.append(len(path_cells))
+
+    version, internal, gauss_next = sim.rng.getstate()
+    meta = {
+        "tick": sim.tick,
+        "revision": sim.revision,
+        "obstacle_version": sim.obstacle_version,
+        "grid_size": n,
+        "cell_size": cell,
+        "ids": [d.id for d in drones],
+        "tasks": [d.task for d in drones],
+        "task_pathlen": [d.current_task_pathlen for d in drones],
+        "strategic": [[d.last_strategic_state, d.last_strategic_action] for d in drones],
+        "coop": [[d.waited, d.rewindow_at] for d in drones],
+        "q_agents": [d.q_table.agent for d in drones],
+        "log_seq": sim.logs.last_seq,
+        "logs": [list(e) for e in sim.logs.since(0)],
+        "random": [version, gauss_next],
+    }
+    sections = {
+        "meta": np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8),
+        "pos": np.array([(d.x, d.y) for d in drones], dtype=np.float64).reshape(-1, 2),
+        "floats": np.array([(d.speed, d.battery, d.low_battery_threshold, d.epsilon, d.reward_step, d.reward_total)
+                            for d in drones], dtype=np.float64).reshape(-1, 6),
+        "state": np.array([STATES.index(d.state) for d in drones], dtype=np.uint8),
+        "package": np.array([d.package for d in drones], dtype=np.bool_),
+        "waypoint": np.array([d.current_waypoint_index for d in drones], dtype=np.int32),
+        "path_offsets": np.array(offsets, dtype=np.int64),
+        "path_cells": np.array(path_cells, dtype=np.int32),
+        "q_table": sim.q_table.values,
+        "obstacles": sim.obstacle_grid_coords.packbits(),
+        "random": np.array(internal, dtype=np.uint32),
+    }
+    body = _pack_sections(sections)
+    flags = 0
+    if compress:
+        body = zlib.compress(body, 1)
+        flags |= FLAG_ZLIB
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, flags, len(sections)) + body
+
+
+def load(data):
+    """Parse snapshot bytes into (meta dict, {section name: array})."""
+    if len(data) < _HEADER.size:
+        raise SnapshotError("snapshot is too short")
+    magic, version, flags, count = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError("not a simulation snapshot")
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"unsupported snapshot version {version} (expected {FORMAT_VERSION})")
+    body = bytes(data[_HEADER.size:])
+    if flags & FLAG_ZLIB:
+        try:
+            body = zlib.decompress(body)
+        except zlib.error as exc:
+            raise SnapshotError(f"corrupt snapshot: {exc}") from exc
+    sections = _unpack_sections(body, count)
+    try:
+        meta = json.loads(sections.pop("meta").tobytes())
+    except (KeyError, UnicodeDecodeError, ValueError) as exc:
+        raise SnapshotError(f"corrupt snapshot meta: {exc}") from exc
+    if not isinstance(meta, dict):
+        raise SnapshotError("corrupt snapshot meta: not an object")
+    return meta, sections
+
+
+def _check(values, name, dtype_kind, shape):
+    """``values``, after checking its dtype kind ('f', 'iu', ...) and ``shape`` (None: any length)."""
+    if values.dtype.kind not in dtype_kind or values.ndim != len(shape) or any(
+            want is not None and got != want for got, want in zip(values.shape, shape)):
+        raise SnapshotError(f"section {name!r} has dtype {values.dtype} and shape {values.shape}")
+    return values
+
+
+def _parse(meta, arrays, sim):
+    """Validated drones, Q-table, obstacles, logs and RNG state of a snapshot, built aside from ``sim``."""
+    n = sim.grid_size
+    q_values = _check(arrays["q_table"], "q_table", "f", (None, None, None))
+    q_table = QTable(q_values.shape[1], q_values.shape[2], q_values.shape[0])
+    q_table.values[:] = q_values
+
+    bits = _check(arrays["obstacles"], "obstacles", "u", (-(-n * n // 8),))
+    obstacles = OccupancyGrid.from_bits(n, bits)
+
+    ids = meta["ids"]
+    count = len(ids)
+    pos = _check(arrays["pos"], "pos", "f", (count, 2)).tolist()
+    floats = _check(arrays["floats"], "floats", "f", (count, 6)).tolist()
+    states = _check(arrays["state"], "state", "u", (count,)).tolist()
+    package = _check(arrays["package"], "package", "b", (count,)).tolist()
+    waypoint = _check(arrays["waypoint"], "waypoint", "iu", (count,)).tolist()
+    offsets = _check(arrays["path_offsets"], "path_offsets", "iu", (count + 1,)).tolist()
+    cells = _check(arrays["path_cells"], "path_cells", "iu", (None,))
+    if offsets[0] != 0 or offsets[-1] != len(cells) or any(a > b for a, b in zip(offsets, offsets[1:])):
+        raise SnapshotError("path offsets do not match the path cells")
+    if len(cells) and not (0 <= cells.min() and cells.max() < n * n):
+        raise SnapshotError("path cell outside the grid")
+    if any(not 0 <= code < len(STATES) for code in states):
+        raise SnapshotError("unknown drone state code")
+    q_agents = meta["q_agents"]
+    if len(q_agents) != count or any(not 0 <= agent < q_table.agents for agent in q_agents):
+        raise SnapshotError("drone Q-table agent outside the table")
+    path_cells = cells.tolist()
+    coop = meta.get("coop")
+
+    drones = []
+    for i, drone_id in enumerate(ids):
+        d = Drone(drone_id, *pos[i], 'drone_icon.png', q_table.view(q_agents[i]), sim.rng)
+        d.speed, d.battery, d.low_battery_threshold, d.epsilon, d.reward_step, d.reward_total = floats[i]
+        d.state = STATES[states[i]]
+        d.package = bool(package[i])
+        d.current_waypoint_index = int(waypoint[i])
+        d.path = array.array("i", path_cells[offsets[i]:offsets[i + 1]])
+        task = meta["tasks"][i]
+        if task is not None:
+            task = {"pickup": tuple(task["pickup"]), "drop": tuple(task["drop"]),
+                    "is_strategic_move": task["is_strategic_move"]}
+        d.task = task
+        d.current_task_pathlen = meta["task_pathlen"][i]
+        d.last_strategic_state, d.last_strategic_action = meta["strategic"][i]
+        if coop is not None:
+            d.waited, d.rewindow_at = coop[i]
+        drones.append(d)
+
+    log_seq = int(meta["log_seq"])
+    logs = [tuple(e) for e in meta["logs"]]
+    if any(len(e) != 4 or not isinstance(e[0], int) or not 0 < e[0] <= log_seq for e in logs):
+        raise SnapshotError("corrupt snapshot log events")
+
+    version, gauss_next = meta["random"]
+    rng_state = (version, tuple(_check(arrays["random"], "random", "u", (None,)).tolist()), gauss_next)
+    # let Random reject a malformed state before anything is replaced
+    random.Random().setstate(rng_state)
+
+    counters = {k: int(meta[k]) for k in ("tick", "revision", "obstacle_version")}
+    return q_table, obstacles, drones, logs, log_seq, rng_state, counters
+
+
+def restore(sim, data):
+    """Replace the state of ``sim`` with a snapshot (call with its lock held).
+
+    All or nothing: every section is parsed and validated before ``sim`` is
+    touched, and any problem raises SnapshotError. Derived state is rebuilt
+    rather than stored: the spatial index, the path cache (cleared), HPA
+    clusters, routing tables, reservations (cleared) and per-drone D* Lite
+    planners.
+    """
+    meta, arrays = load(data)
+    try:
+        if meta["grid_size"] != sim.grid_size or meta["cell_size"] != sim.cell_size:
+            raise SnapshotError(f"snapshot grid {meta['grid_size']}x{meta['grid_size']} @ {meta['cell_size']}px "
+                                f"does not match {sim.grid_size}x{sim.grid_size} @ {sim.cell_size}px")
+        q_table, obstacles, drones, logs, log_seq, rng_state, counters = _parse(meta, arrays, sim)
+    except SnapshotError:
+        raise
+    except (KeyError, IndexError, TypeError, ValueError, AttributeError) as exc:
+        raise SnapshotError(f"corrupt snapshot: {exc!r}") from exc
+
+    sim.q_table = q_table
+    sim.obstacle_grid_coords = obstacles
+    sim.drones = drones
+    sim.logs.restore(logs, log_seq)
+    sim.rng.setstate(rng_state)
+
+    sim.tick = counters["tick"]
+    # keep revisions increasing so viewers notice the change
+    sim.revision = max(sim.revision, counters["revision"]) + 1
+    sim.obstacle_version = max(sim.obstacle_version, counters["obstacle_version"])
+    sim._rebuild_derived()
+    return meta
+
+
+def write_file(path, data):
+    """Write ``data`` to ``path`` atomically (a crash leaves the old file intact)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
@@ -0,0 +1,257 @@
+# backend/spatial.py
+import math
+from collections import deque
+
+from aiml.pathfinding import MOVES
+
+
+def _distance(pair):
+    return pair[0]
+
+
+class GridIndex:
+    """Grid-bucket spatial index over drones.
+
+    Every drone sits in the bucket of the cell it is in and, while it follows
+    a path, in a second bucket for the cell of its next waypoint. Queries
+    only visit the buckets near the query point.
+    """
+
+    def __init__(self, grid_size, cell_size):
+        self.grid_size = grid_size
+        self.cell_size = cell_size
+        self._cells = {}        # (row, col) -> {drone id: drone}
+        self._heading = {}      # (row, col) -> {drone id: drone}
+        self._where = {}        # drone id -> (cell, heading cell or None)
+
+    def __len__(self):
+        return len(self._where)
+
+    # ---------------------------------------------
+    # Maintenance
+    # ---------------------------------------------
+    @staticmethod
+    def _bucket_add(buckets, cell, drone):
+        buckets.setdefault(cell, {})[drone.id] = drone
+
+    @staticmethod
+    def _bucket_remove(buckets, cell, drone_id):
+        bucket = buckets.get(cell)
+        if bucket is not None:
+            bucket.pop(drone_id, None)
+            if not bucket:
+                del buckets[cell]
+
+    def place(self, drone, cell, heading=None):
+        """Insert ``drone`` or move it to ``cell`` / ``heading``."""
+        old = self._where.get(drone.id)
+        if old == (cell, heading):
+            return
+        if old is not None:
+            old_cell, old_heading = old
+            if old_cell != cell:
+                self._bucket_remove(self._cells, old_cell, drone.id)
+            if old_heading is not None and old_heading != heading:
+                self._bucket_remove(self._heading, old_heading, drone.id)
+        self._bucket_add(self._cells, cell, drone)
+        if heading is not None:
+            self._bucket_add(self._heading, heading, drone)
+        self._where[drone.id] = (cell, heading)
+
+    def remove(self, drone):
+        old = self._where.pop(drone.id, None)
+        if old is not None:
+            self._bucket_remove(self._cells, old[0], drone.id)
+            if old[1] is not None:
+                self._bucket_remove(self._heading, old[1], drone.id)
+
+    # ---------------------------------------------
+    # Queries
+    # ---------------------------------------------
+    def drones_in_cell(self, cell):
+        bucket = self._cells.get(cell)
+        return list(bucket.values()) if bucket else []
+
+    def heading_into(self, cell):
+        bucket = self._heading.get(cell)
+        return list(bucket.values()) if bucket else []
+
+    def crowded(self, accept=None):
+        """How many drones share their cell with another one (counting only drones ``accept`` passes)."""
+        total = 0
+        for bucket in self._cells.values():
+            if len(bucket) > 1:
+                k = len(bucket) if accept is None else sum(1 for d in bucket.values() if accept(d))
+                if k > 1:
+                    total += k
+        return total
+
+    def touching(self, cells):
+        """Ids of drones that are in, or whose next waypoint is in, any of ``cells``.
+
+        Walks the occupied buckets (at most two per drone) and probes
+        ``cells`` for each, so the cost never depends on the grid size.
+        """
+        found = set()
+        for buckets in (self._cells, self._heading):
+            for cell, bucket in buckets.items():
+                if cell in cells:
+                    found.update(bucket)
+        return found
+
+    def _ring(self, center, radius):
+        """Cells at Chebyshev distance ``radius`` from ``center``, clipped to the grid."""
+        r0, c0 = center
+        n = self.grid_size
+        if radius == 0:
+            yield center
+            return
+        for c in range(c0 - radius, c0 + radius + 1):
+            for r in (r0 - radius, r0 + radius):
+                if 0 <= r < n and 0 <= c < n:
+                    yield (r, c)
+        for r in range(r0 - radius + 1, r0 + radius):
+            for c in (c0 - radius, c0 + radius):
+                if 0 <= r < n and 0 <= c < n:
+                    yield (r, c)
+
+    def _cell_of(self, x, y):
+        last = self.grid_size - 1
+        return (max(0, min(int(y // self.cell_size), last)),
+                max(0, min(int(x // self.cell_size), last)))
+
+    def nearest(self, x, y, accept=None):
+        """Drone closest to pixel (x, y) by Euclidean distance, ties to the lower id.
+
+        Searches rings of cells outwards and stops once no farther ring can
+        hold anything closer than the best match so far, once every drone was
+        looked at, or at the edge of the grid. Once the rings would cover more
+        cells than there are drones, the drones are scanned directly instead,
+        so a query never costs more than O(drones).
+        """
+        center = self._cell_of(x, y)
+        r0, c0 = center
+        last = self.grid_size - 1
+        max_radius = max(r0, c0, last - r0, last - c0)
+        total = len(self._where)
+        seen = 0
+        walked = 0
+        best = None
+        best_key = None
+
+        def consider(drone):
+            nonlocal best, best_key
+            if accept is not None and not accept(drone):
+                return
+            key = (math.hypot(drone.x - x, drone.y - y), drone.id)
+            if best_key is None or key < best_key:
+                best_key = key
+                best = drone
+
+        for radius in range(max_radius + 1):
+            # anything in this ring is at least (radius - 1) cells away
+            if best is not None and best_key[0] < (radius - 1) * self.cell_size:
+                break
+            if seen >= total:
+                break
+            walked += max(1, 8 * radius)
+            if walked > total:
+                for bucket in self._cells.values():
+                    for drone in bucket.values():
+                        consider(drone)
+                break
+            for cell in self._ring(center, radius):
+                bucket = self._cells.get(cell)
+                if not bucket:
+                    continue
+                seen += len(bucket)
+                for drone in bucket.values():
+                    consider(drone)
+        return best
+
+    def within_radius(self, x, y, radius, accept=None):
+        """Drones within ``radius`` pixels of (x, y)."""
+        r_lo, c_lo = self._cell_of(x - radius, y - radius)
+        r_hi, c_hi = self._cell_of(x + radius, y + radius)
+        limit = radius * radius
+        found = []
+        for r in range(r_lo, r_hi + 1):
+            for c in range(c_lo, c_hi + 1):
+                bucket = self._cells.get((r, c))
+                if not bucket:
+                    continue
+                for drone in bucket.values():
+                    if (drone.x - x) ** 2 + (drone.y - y) ** 2 <= limit and (accept is None or accept(drone)):
+                        found.append(drone)
+        return found
+
+    def count(self, exclude=(), accept=None):
+        """How many indexed drones are not in ``exclude`` and pass ``accept``."""
+        return sum(1 for bucket in self._cells.values() for drone_id, drone in bucket.items()
+                   if drone_id not in exclude and (accept is None or accept(drone)))
+
+    def nearest_by_path(self, start, obstacles, k, exclude=(), accept=None, eligible=None, max_expanded=None):
+        """Up to ``k`` (distance, drone) pairs closest to ``start`` by grid path.
+
+        A breadth-first search from ``start`` over free cells visits cells in
+        path-distance order and stops as soon as ``k`` drones were seen, or
+        once all ``eligible`` drones were (computed with ``count`` if not
+        given), so only the neighbourhood that matters is explored. Drones
+        standing on a blocked cell are still found (they may leave it), but
+        the search does not pass through it. After ``max_expanded`` cells the
+        drones not reached yet are ranked by Manhattan distance instead (at
+        least the search radius, a lower bound on their path distance).
+        """
+        n = self.grid_size
+        found = []
+        if start in obstacles:
+            return found
+        if eligible is None:
+            eligible = self.count(exclude, accept)
+        if not eligible:
+            return found
+
+        def wanted(drone_id, drone):
+            return drone_id not in exclude and (accept is None or accept(drone))
+
+        seen = {start}
+        queue = deque([(start, 0)])
+        expanded = 0
+        while queue:
+            cell, dist = queue.popleft()
+            expanded += 1
+            if max_expanded is not None and expanded > max_expanded:
+                reached = {drone.id for _, drone in found}
+                r0, c0 = start
+                for (r, c), bucket in self._cells.items():
+                    estimate = max(dist, abs(r - r0) + abs(c - c0))
+                    found.extend((estimate, d) for i, d in bucket.items() if i not in reached and wanted(i, d))
+                break
+            if len(found) >= k:
+                found.sort(key=_distance)
+                if found[k - 1][0] <= dist:
+                    return found[:k]
+            if len(found) >= eligible:
+                # every drone that could be returned has been seen
+                break
+            bucket = self._cells.get(cell)
+            if bucket:
+                for drone_id, drone in bucket.items():
+                    if wanted(drone_id, drone):
+                        found.append((dist, drone))
+
+            r, c = cell
+            for dr, dc in MOVES:
+                nxt = (r + dr, c + dc)
+                if nxt in seen or not (0 <= nxt[0] < n and 0 <= nxt[1] < n):
+                    continue
+                seen.add(nxt)
+                if nxt in obstacles:
+                    # reachable only as a start: collect, do not expand
+                    blocked = self._cells.get(nxt)
+                    if blocked:
+                        found.extend((dist + 1, d) for i, d in blocked.items() if wanted(i, d))
+                    continue
+                queue.append((nxt, dist + 1))
+        found.sort(key=_distance)
+        return found[:k]
@@ -0,0 +1,167 @@
+# backend/streaming.py
+import asyncio
+import json
+import threading
+from collections import deque
+
+import config
+from aiml.occupancy import OccupancyGrid
+
+# top-level state keys that get their own delta treatment
+_DIFFED_KEYS = ("drones", "obstacles", "logs", "log_seq")
+
+
+class StateStream:
+    """Turns simulation revisions into a sequence of WebSocket messages.
+
+    Every new revision is diffed against the previously published state once,
+    serialized once, and the resulting text is shared by all viewers. Every
+    ``snapshot_every`` messages a full snapshot is published instead of a
+    delta so viewers can resync; a viewer that falls further behind than the
+    kept history is sent the latest snapshot directly.
+    """
+
+    def __init__(self, sim, snapshot_every=None, history=None, poll_interval=None, log_tail=None):
+        self.sim = sim
+        self.snapshot_every = snapshot_every or getattr(config, "STREAM_SNAPSHOT_EVERY", 50)
+        self.poll_interval = poll_interval or getattr(config, "STREAM_POLL_INTERVAL", 0.05)
+        self.log_tail = log_tail or getattr(config, "STREAM_LOG_TAIL", 50)
+        self.seq = 0
+        self._history = deque(maxlen=history or getattr(config, "STREAM_HISTORY", 64))
+        self._revision = None
+        self._drones = {}
+        self._obstacles = None
+        self._packed = None
+        self._meta = {}
+        self._logs = deque(maxlen=self.log_tail)
+        self._log_seq = 0
+        self._snapshot = None
+        self._snapshot_text = None
+        self._changed = None
+        # poll() runs in a worker thread, viewers read from the event loop
+        self._lock = threading.Lock()
+
+    # ---------------------------------------------
+    # Publishing (one diff per revision, shared by all viewers)
+    # ---------------------------------------------
+    def poll(self):
+        """Publish a message if the simulation changed. Returns True if it did."""
+        with self._lock:
+            if self.sim.revision == self._revision:
+                return False
+            return self._publish()
+
+    def _publish(self):
+        state = self.sim.get_state(include_logs=False)
+        # the log went backwards (a snapshot was restored): resend its tail in a snapshot
+        rewound = state["log_seq"] < self._log_seq
+        if rewound:
+            self._log_seq = max(0, state["log_seq"] - self.log_tail)
+            self._logs.clear()
+        new_logs, self._log_seq = self.sim.get_logs_since(self._log_seq)
+        self._revision = state["revision"]
+
+        drones = {d["id"]: d for d in state["drones"]}
+        if state["obstacles"] == self._packed:
+            # unchanged map: skip unpacking and diffing the bitmap (large on big grids)
+            obstacles = self._obstacles
+            added = removed = []
+        else:
+            obstacles = OccupancyGrid.unpack(state["grid_size"], state["obstacles"])
+            if self._obstacles is None or self._obstacles.size != obstacles.size:
+                self._obstacles = OccupancyGrid(obstacles.size)
+            added, removed = obstacles.changes(self._obstacles)
+            self._packed = state["obstacles"]
+        meta = {k: v for k, v in state.items() if k not in _DIFFED_KEYS}
+
+        seq = self.seq + 1
+        first = self._snapshot is None
+        delta = {
+            "type": "delta",
+            "seq": seq,
+            "drones": [d for i, d in drones.items() if self._drones.get(i) != d],
+            "removed_drones": [i for i in self._drones if i not in drones],
+            "obstacles_added": [{"row": r, "col": c} for (r, c) in added],
+            "obstacles_removed": [{"row": r, "col": c} for (r, c) in removed],
+            "logs": new_logs,
+            "log_seq": self._log_seq,
+            "meta": {k: v for k, v in meta.items() if self._meta.get(k) != v},
+        }
+
+        self._drones = drones
+        self._obstacles = obstacles
+        self._meta = meta
+        self._logs.extend(new_logs)
+
+        # the snapshot is only serialized when someone needs it
+        snapshot = dict(state)
+        snapshot["logs"] = list(self._logs)
+        snapshot["log_seq"] = self._log_seq
+        self._snapshot = snapshot
+        self._snapshot_text = None
+        self.seq = seq
+
+        if first or rewound or seq % self.snapshot_every == 0:
+            text = self._snapshot_message()
+        else:
+            text = json.dumps(delta)
+        self._history.append((seq, text))
+        return True
+
+    def _snapshot_message(self):
+        if self._snapshot_text is None:
+            self._snapshot_text = json.dumps({"type": "snapshot", "seq": self.seq, "state": self._snapshot})
+        return self._snapshot_text
+
+    def snapshot(self):
+        """(seq, text) of a full snapshot of the latest published state."""
+        if self._snapshot is None:
+            self.poll()
+        with self._lock:
+            return self.seq, self._snapshot_message()
+
+    def messages_since(self, seq):
+        """(last seq, messages after ``seq``), or None if the viewer must resync."""
+        with self._lock:
+            if seq >= self.seq:
+                return seq, []
+            if not self._history or self._history[0][0] > seq + 1:
+                return None
+            return self.seq, [text for s, text in self._history if s > seq]
+
+    # ---------------------------------------------
+    # Async side (FastAPI)
+    # ---------------------------------------------
+    def _condition(self):
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+
+    async def notify(self):
+        changed = self._condition()
+        async with changed:
+            changed.notify_all()
+
+    async def pump(self):
+        """Background task: publish new revisions and wake waiting viewers."""
+        while True:
+            if await asyncio.to_thread(self.poll):
+                await self.notify()
+            await asyncio.sleep(self.poll_interval)
+
+    async def serve(self, websocket):
+        """Stream messages to one connected viewer until it disconnects."""
+        seq, text = self.snapshot()
+        await websocket.send_text(text)
+        changed = self._condition()
+        while True:
+            async with changed:
+                await changed.wait_for(lambda: self.seq > seq)
+            since = self.messages_since(seq)
+            if since is None:
+                seq, text = self.snapshot()
+                pending = [text]
+            else:
+                seq, pending = since
+            for text in pending:
+                await websocket.send_text(text)
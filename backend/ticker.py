@@ -0,0 +1,130 @@
+# backend/ticker.py
+import asyncio
+import logging
+import time
+from collections import deque
+
+import config
+
+POLICIES = ("skip", "catchup")
+
+logger = logging.getLogger(__name__)
+
+
+class TickLoop:
+    """Drives ``Simulation.step`` at a fixed rate from an asyncio task.
+
+    Ticks are scheduled on an absolute timeline (``period`` apart). When a
+    tick overruns and the loop falls behind, the ``skip`` policy drops the
+    missed ticks and realigns to the next slot, while ``catchup`` runs the
+    missed ticks back to back, up to ``max_catchup`` of them, before skipping
+    the rest. Tick duration and jitter (how late a tick started relative to
+    its slot) are kept over a rolling window. A tick that raises is logged
+    and counted in ``errors`` (the last one kept for ``stats``), and the loop
+    keeps ticking.
+    """
+
+    def __init__(self, sim, rate_hz=None, policy=None, max_catchup=None, on_tick=None, window=None):
+        self.sim = sim
+        self.rate_hz = rate_hz or getattr(config, "TICK_RATE_HZ", 8.0)
+        self.policy = policy or getattr(config, "TICK_POLICY", "skip")
+        self.max_catchup = max_catchup if max_catchup is not None else getattr(config, "TICK_MAX_CATCHUP", 5)
+        self.on_tick = on_tick
+        if self.policy not in POLICIES:
+            raise ValueError(f"unknown tick policy {self.policy!r}")
+
+        self.ticks = 0
+        self.skipped = 0
+        self.errors = 0
+        self.last_error = None
+        self._durations = deque(maxlen=window or getattr(config, "TICK_STATS_WINDOW", 256))
+        self._jitter = deque(maxlen=self._durations.maxlen)
+        self._started = deque(maxlen=self._durations.maxlen)
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def configure(self, rate_hz=None, policy=None):
+        if policy is not None:
+            if policy not in POLICIES:
+                raise ValueError(f"unknown tick policy {policy!r}")
+            self.policy = policy
+        if rate_hz is not None:
+            if rate_hz <= 0:
+                raise ValueError("rate_hz must be positive")
+            self.rate_hz = rate_hz
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        next_slot = time.perf_counter()
+        while True:
+            period = 1.0 / self.rate_hz
+            now = time.perf_counter()
+            if now < next_slot:
+                await asyncio.sleep(next_slot - now)
+
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self.sim.step)
+            except Exception as exc:
+                logger.exception("tick %d failed", self.ticks)
+                self.errors += 1
+                self.last_error = f"{type(exc).__name__}: {exc}"
+            finished = time.perf_counter()
+            self.ticks += 1
+            self._durations.append(finished - started)
+            self._jitter.append(max(0.0, started - next_slot))
+            self._started.append(started)
+            if self.on_tick is not None:
+                await self.on_tick()
+
+            next_slot += period
+            behind = time.perf_counter() - next_slot
+            if behind > 0:
+                missed = int(behind // period) + 1
+                if self.policy == "catchup":
+                    missed -= self.max_catchup
+                if missed > 0:
+                    next_slot += missed * period
+                    self.skipped += missed
+
+    def stats(self):
+        durations = self._durations
+        jitter = self._jitter
+        started = self._started
+        measured_hz = None
+        if len(started) > 1 and started[-1] > started[0]:
+            measured_hz = (len(started) - 1) / (started[-1] - started[0])
+        return {
+            "running": self.running,
+            "rate_hz": self.rate_hz,
+            "policy": self.policy,
+            "ticks": self.ticks,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "measured_hz": measured_hz,
+            "tick_ms": {
+                "last": durations[-1] * 1000.0 if durations else None,
+                "mean": sum(durations) * 1000.0 / len(durations) if durations else None,
+                "max": max(durations) * 1000.0 if durations else None,
+            },
+            "jitter_ms": {
+                "mean": sum(jitter) * 1000.0 / len(jitter) if jitter else None,
+                "max": max(jitter) * 1000.0 if jitter else None,
+            },
+        }
@@ -0,0 +1,211 @@
+"""
+Check the struct-of-arrays Fleet in aiml/fleet.py against a loop of
+Drone.update, then time both.
+
+The check runs both engines side by side on the same random tasks, obstacle
+toggles and near-empty batteries, in every routing mode (A* through the path
+cache, D* Lite, cooperative routing), and stops at the first tick where a
+drone, a log line or the Q-table differs.
+
+Run from the project root:
+    python -m benchmarks.bench_fleet
+    python -m benchmarks.bench_fleet --fleets 1000 10000 --ticks 50
+    python -m benchmarks.bench_fleet --check-ticks 5000 --skip-timing
+"""
+import argparse
+import random
+import time
+
+import config
+from aiml.agent import Drone
+from aiml.fleet import Fleet, STATE_NAMES
+from aiml.occupancy import OccupancyGrid, ChangeLog
+from aiml.path_cache import PathCache
+from aiml.qtable import QTable, states_for
+from aiml.reservation import ReservationTable, cell_step_ticks
+from utils import drone_home, grid_to_pixel_center
+
+MODES = ("astar", "dstar", "coop")
+
+
+# ---------------------------------------------
+# Two copies of one world
+# ---------------------------------------------
+class World:
+    """Obstacles, path cache and reservations for one engine."""
+
+    def __init__(self, mode):
+        n = config.GRID_SIZE
+        self.obstacles = OccupancyGrid(n)
+        self.version = 0
+        self.changes = ChangeLog(getattr(config, "OBSTACLE_CHANGE_LOG", 1024))
+        self.cache = PathCache(n, getattr(config, "PATH_CACHE_SIZE", 1024))
+        self.reservations = None
+        if mode == "coop":
+            step_ticks = cell_step_ticks(getattr(config, "DRONE_SPEED", 2.0), config.CELL_SIZE,
+                                         getattr(config, "WAYPOINT_TOLERANCE", 1.0))
+            self.reservations = ReservationTable(n, step_ticks, getattr(config, "COOP_WINDOW", 8))
+
+    def toggle(self, cell):
+        added = self.obstacles.toggle(cell)
+        self.version += 1
+        self.changes.record(self.version, cell)
+        self.cache.invalidate_cell(cell, added, self.version)
+
+    def advance(self, tick):
+        if self.reservations is not None:
+            self.reservations.advance(tick)
+
+
+def make_engines(count, mode, seed, shared=False):
+    """(drones, drone world, fleet, fleet world), set up the same way Simulation sets up its drones."""
+    incremental = config.INCREMENTAL_REPLANNING
+    config.INCREMENTAL_REPLANNING = mode == "dstar"
+    try:
+        agents = 1 if shared else count
+        states = states_for(config.GRID_SIZE, agents, max_bytes=getattr(config, "Q_TABLE_MAX_BYTES", None))
+        table = QTable(states, agents=agents)
+        rng = random.Random(seed)
+        drones = [Drone(i + 1, *drone_home(i), None, table.view(0 if shared else i), rng) for i in range(count)]
+        fleet = Fleet(count, q_table=QTable(states, agents=agents), rng=random.Random(seed))
+    finally:
+        config.INCREMENTAL_REPLANNING = incremental
+    return drones, World(mode), fleet, World(mode)
+
+
+def step_drones(drones, world, tick):
+    world.advance(tick)
+    logs = []
+    for d in drones:
+        msg = d.update(world.obstacles, world.cache, None, world.reservations, world.changes)
+        if msg:
+            logs.append(msg)
+    return logs
+
+
+def step_fleet(fleet, world, tick):
+    world.advance(tick)
+    return fleet.step(world.obstacles, world.cache, world.reservations, world.changes)
+
+
+def assign_idle(drones, fleet, rng, share):
+    """Give a random task to about ``share`` of the idle drones, in both engines."""
+    n = config.GRID_SIZE
+    for i, d in enumerate(drones):
+        if d.task is None and rng.random() < share:
+            pickup = grid_to_pixel_center((rng.randrange(n), rng.randrange(n)))
+            drop = grid_to_pixel_center((rng.randrange(n), rng.randrange(n)))
+            d.set_task(pickup, drop)
+            fleet.set_task(i, pickup, drop)
+
+
+# ---------------------------------------------
+# Parity check
+# ---------------------------------------------
+def _diff(d, fleet, i):
+    """Name of the first field where drone ``d`` and fleet slot ``i`` differ, or None."""
+    task = None
+    if d.task is not None:
+        task = (tuple(map(float, d.task["pickup"])), tuple(map(float, d.task["drop"])), d.task["is_strategic_move"])
+    fleet_task = None
+    if fleet.has_task[i]:
+        fleet_task = (tuple(fleet.pickup[i].tolist()), tuple(fleet.drop[i].tolist()), bool(fleet.strategic[i]))
+    pairs = {
+        "x": (d.x, fleet.x[i]),
+        "y": (d.y, fleet.y[i]),
+        "battery": (d.battery, fleet.battery[i]),
+        "state": (d.state, STATE_NAMES[fleet.state[i]]),
+        "package": (d.package, fleet.package[i]),
+        "reward_step": (d.reward_step, fleet.reward_step[i]),
+        "reward_total": (d.reward_total, fleet.reward_total[i]),
+        "task": (task, fleet_task),
+        "path": (list(d.path), list(fleet.paths[i])),
+        "waypoint": (d.current_waypoint_index, fleet.wp[i]),
+        "waited": (d.waited, fleet.waited[i]),
+        "rewindow_at": (-1 if d.rewindow_at is None else d.rewindow_at, fleet.rewindow_at[i]),
+        "replanned": (d.replanned, fleet.replanned[i]),
+        "plan_expanded": (d.plan_expanded, fleet.plan_expanded[i]),
+    }
+    for name, (want, got) in pairs.items():
+        if want != got:
+            return f"{name}: drone {want!r}, fleet {got!r}"
+    return None
+
+
+def check(count, ticks, mode, seed, shared=False):
+    """Run both engines for ``ticks`` ticks; raises AssertionError at the first difference."""
+    drones, drone_world, fleet, fleet_world = make_engines(count, mode, seed, shared)
+    scenario = random.Random(seed + 1)
+    n = config.GRID_SIZE
+    # some drones start nearly empty, to run out of battery mid-task
+    for i in range(0, count, 7):
+        drones[i].battery = fleet.battery[i] = scenario.uniform(0.0, 3.0)
+
+    for tick in range(ticks):
+        if tick % 5 == 0:
+            assign_idle(drones, fleet, scenario, 0.5)
+        if tick % 20 == 10:
+            cell = (scenario.randrange(n), scenario.randrange(n))
+            drone_world.toggle(cell)
+            fleet_world.toggle(cell)
+        want = step_drones(drones, drone_world, tick)
+        got = step_fleet(fleet, fleet_world, tick)
+        if want != got:
+            raise AssertionError(f"{mode}: tick {tick}: logs differ\n  drones: {want}\n  fleet:  {got}")
+        for i, d in enumerate(drones):
+            problem = _diff(d, fleet, i)
+            if problem:
+                raise AssertionError(f"{mode}: tick {tick}: drone {d.id}: {problem}")
+    if not (drones[0].q_table.table.values == fleet.q_table.values).all():
+        raise AssertionError(f"{mode}: Q-tables differ after {ticks} ticks")
+
+
+# ---------------------------------------------
+# Timing
+# ---------------------------------------------
+def time_step(count, ticks, seed):
+    """Mean ms per tick of a Drone.update loop and of Fleet.step, every drone kept busy."""
+    drones, drone_world, fleet, fleet_world = make_engines(count, "astar", seed)
+    scenario = random.Random(seed + 1)
+    drone_ms = fleet_ms = 0.0
+    for tick in range(ticks + 1):
+        assign_idle(drones, fleet, scenario, 1.0)
+        t0 = time.perf_counter()
+        step_drones(drones, drone_world, tick)
+        t1 = time.perf_counter()
+        step_fleet(fleet, fleet_world, tick)
+        t2 = time.perf_counter()
+        # the first tick plans every path; leave it out
+        if tick:
+            drone_ms += (t1 - t0) * 1000.0
+            fleet_ms += (t2 - t1) * 1000.0
+    return drone_ms / ticks, fleet_ms / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fleets", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--ticks", type=int, default=30, help="timed ticks per fleet size")
+    parser.add_argument("--check-drones", type=int, default=40)
+    parser.add_argument("--check-ticks", type=int, default=1500)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--skip-timing", action="store_true")
+    args = parser.parse_args()
+
+    for k, mode in enumerate(MODES):
+        t0 = time.perf_counter()
+        check(args.check_drones, args.check_ticks, mode, args.seed, shared=k % 2 == 1)
+        print(f"parity {mode:>6}: {args.check_drones} drones x {args.check_ticks} ticks match "
+              f"({time.perf_counter() - t0:.1f}s)")
+    if args.skip_timing:
+        return
+
+    print(f"{'drones':>8} {'Drone ms':>10} {'Fleet ms':>10} {'speedup':>8}")
+    for count in args.fleets:
+        drone_ms, fleet_ms = time_step(count, args.ticks, args.seed)
+        speedup = f"{drone_ms / fleet_ms:.1f}x" if fleet_ms > 0 else "-"
+        print(f"{count:>8} {drone_ms:>10.2f} {fleet_ms:>10.2f} {speedup:>8}")
+
+
+if __name__ == "__main__":
+    main()
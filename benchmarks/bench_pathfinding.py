@@ -0,0 +1,159 @@
+"""
+Benchmark the heap-based A* in aiml/pathfinding.py against the original
+Node/list implementation it replaced.
+
+Run from the project root:
+    python -m benchmarks.bench_pathfinding
+    python -m benchmarks.bench_pathfinding --sizes 10 100 1000 --density 0.2
+"""
+import argparse
+import random
+import time
+
+from aiml.pathfinding import astar_pathfinding
+
+
+# ---------------------------------------------
+# Original implementation (kept for comparison)
+# ---------------------------------------------
+class Node:
+    """A node class for A* Pathfinding"""
+    def __init__(self, parent=None, position=None):
+        self.parent = parent
+        self.position = position
+        self.g = 0
+        self.h = 0
+        self.f = 0
+
+    def __eq__(self, other):
+        return self.position == other.position
+
+
+def legacy_astar_pathfinding(grid_size, start, end, obstacles):
+    start_node = Node(None, start)
+    end_node = Node(None, end)
+
+    open_list = [start_node]
+    closed_list = []
+
+    while open_list:
+        current_node = min(open_list, key=lambda o: o.f)
+        open_list.remove(current_node)
+        closed_list.append(current_node)
+
+        if current_node == end_node:
+            path = []
+            curr = current_node
+            while curr:
+                path.append(curr.position)
+                curr = curr.parent
+            return path[::-1]
+
+        children = []
+        for move in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
+            new_pos = (current_node.position[0] + move[0],
+                       current_node.position[1] + move[1])
+            if not (0 <= new_pos[0] < grid_size and 0 <= new_pos[1] < grid_size):
+                continue
+            if new_pos in obstacles:
+                continue
+            children.append(Node(current_node, new_pos))
+
+        for child in children:
+            if child in closed_list:
+                continue
+            child.g = current_node.g + 1
+            child.h = abs(child.position[0] - end_node.position[0]) + abs(child.position[1] - end_node.position[1])
+            child.f = child.g + child.h
+            if any(open_node for open_node in open_list
+                   if child == open_node and child.g > open_node.g):
+                continue
+            open_list.append(child)
+
+    return None
+
+
+# ---------------------------------------------
+# Benchmark helpers
+# ---------------------------------------------
+def make_grid(grid_size, density, seed, attempts=50):
+    """Random obstacle set with opposite corners free and a path between them."""
+    rng = random.Random(seed)
+    start = (0, 0)
+    end = (grid_size - 1, grid_size - 1)
+    for _ in range(attempts):
+        obstacles = set()
+        for r in range(grid_size):
+            for c in range(grid_size):
+                if rng.random() < density:
+                    obstacles.add((r, c))
+        obstacles.discard(start)
+        obstacles.discard(end)
+        if astar_pathfinding(grid_size, start, end, obstacles):
+            return start, end, obstacles
+    raise RuntimeError(f"no connected {grid_size}x{grid_size} grid at density {density}")
+
+
+def time_call(fn, args, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def run(sizes, density, seed, legacy_max, repeat):
+    rows = []
+    for size in sizes:
+        start, end, obstacles = make_grid(size, density, seed)
+        args = (size, start, end, obstacles)
+        reps = repeat if size <= 100 else 1
+
+        new_t, new_path = time_call(astar_pathfinding, args, reps)
+        row = {
+            "grid": f"{size}x{size}",
+            "obstacles": len(obstacles),
+            "path_len": len(new_path) if new_path else None,
+            "heap_ms": new_t * 1000.0,
+            "legacy_ms": None,
+            "speedup": None,
+        }
+
+        if size <= legacy_max:
+            old_t, old_path = time_call(legacy_astar_pathfinding, args, reps)
+            old_len = len(old_path) if old_path else None
+            if old_len != row["path_len"]:
+                raise AssertionError(f"{size}x{size}: path length {row['path_len']} != legacy {old_len}")
+            row["legacy_ms"] = old_t * 1000.0
+            row["speedup"] = old_t / new_t if new_t > 0 else None
+
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--density", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=5)
+    # the legacy search re-queues duplicate nodes, so it stops finishing in
+    # reasonable time somewhere past 12x12 at 20% density
+    parser.add_argument("--legacy-max", type=int, default=10,
+                        help="largest grid the legacy search is run on")
+    args = parser.parse_args()
+
+    rows = run(args.sizes, args.density, args.seed, args.legacy_max, args.repeat)
+
+    print(f"{'grid':>11} {'obstacles':>10} {'path':>6} {'heap ms':>10} {'legacy ms':>11} {'speedup':>8}")
+    for row in rows:
+        legacy = f"{row['legacy_ms']:.2f}" if row["legacy_ms"] is not None else "skipped"
+        speedup = f"{row['speedup']:.1f}x" if row["speedup"] is not None else "-"
+        print(f"{row['grid']:>11} {row['obstacles']:>10} {str(row['path_len']):>6} "
+              f"{row['heap_ms']:>10.2f} {legacy:>11} {speedup:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Benchmark suite: A* pathfinding, Simulation.step and API throughput.
+
+Every benchmark produces one named result (e.g. "step/drones=1000") with a
+median, a min and the unit; "better" says whether lower (timings) or higher
+(throughput) values are an improvement. Results are written as JSON and can
+be compared against an earlier run; the process exits with status 1 when a
+result got worse than the baseline by more than --threshold.
+
+Run from the project root:
+    python -m benchmarks.suite --out bench.json
+    python -m benchmarks.suite --baseline bench.json --threshold 0.15
+    python -m benchmarks.suite --only astar step --quick
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import config
+from aiml.pathfinding import astar_pathfinding
+from benchmarks.bench_pathfinding import make_grid
+
+GROUPS = ("astar", "step", "api")
+
+
+def _result(name, group, params, samples, unit, better="lower"):
+    return {
+        "name": name,
+        "group": group,
+        "params": params,
+        "unit": unit,
+        "better": better,
+        "median": statistics.median(samples),
+        "min": min(samples) if better == "lower" else max(samples),
+        "samples": len(samples),
+    }
+
+
+def _timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples
+
+
+# ---------------------------------------------
+# A*
+# ---------------------------------------------
+def bench_astar(sizes, densities, repeat, seed):
+    results = []
+    for size in sizes:
+        for density in densities:
+            start, end, obstacles = make_grid(size, density, seed)
+            reps = repeat if size <= 100 else max(1, repeat // 5)
+            samples = _timed(lambda: astar_pathfinding(size, start, end, obstacles), reps)
+            results.append(_result(f"astar/{size}x{size}/density={density}", "astar",
+                                   {"size": size, "density": density, "obstacles": len(obstacles)},
+                                   samples, "ms"))
+    return results
+
+
+# ---------------------------------------------
+# Simulation.step
+# ---------------------------------------------
+def _busy_simulation(drones, seed):
+    """A Simulation with every drone on a random task and ~10% obstacles."""
+    from backend.simulation import Simulation, coord_to_label
+
+    sim = Simulation(drones, seed=seed)
+    rng = random.Random(seed)
+    n = sim.grid_size
+    for _ in range(n * n // 10):
+        r, c = rng.randrange(1, n), rng.randrange(n)
+        sim.toggle_obstacle_by_label(coord_to_label(r, c))
+    free = [(r, c) for r in range(n) for c in range(n) if (r, c) not in sim.obstacle_grid_coords]
+    for _ in range(drones):
+        (pr, pc), (dr, dc) = rng.choice(free), rng.choice(free)
+        sim.assign_task(coord_to_label(pr, pc), coord_to_label(dr, dc))
+    return sim
+
+
+def bench_step(fleets, ticks, seed):
+    results = []
+    for drones in fleets:
+        sim = _busy_simulation(drones, seed)
+        sim.step()  # first plans are part of setup
+        samples = _timed(sim.step, ticks)
+        results.append(_result(f"step/drones={drones}", "step", {"drones": drones, "ticks": ticks},
+                               samples, "ms"))
+    return results
+
+
+# ---------------------------------------------
+# API (FastAPI TestClient, no network)
+# ---------------------------------------------
+def bench_api(requests):
+    # the app's own simulation (config.NUM_DRONES drones), stepped only by the requests
+    config.TICK_AUTOSTART = False
+    from fastapi.testclient import TestClient
+    from backend import main
+
+    drones = len(main.sim.drones)
+    results = []
+    with TestClient(main.app) as client:
+        for method, path in (("get", "/state"), ("post", "/step")):
+            call = getattr(client, method)
+            call(path)
+            samples = _timed(lambda: call(path), requests)
+            per_second = [1000.0 / s for s in samples if s > 0]
+            results.append(_result(f"api/{method.upper()} {path}", "api",
+                                   {"drones": drones, "requests": requests},
+                                   per_second, "req/s", better="higher"))
+    return results
+
+
+# ---------------------------------------------
+# Baseline comparison
+# ---------------------------------------------
+def compare(results, baseline, threshold):
+    """Rows of (result, baseline median or None, relative change, regressed)."""
+    previous = {r["name"]: r for r in baseline.get("results", [])}
+    rows = []
+    for result in results:
+        base = previous.get(result["name"])
+        if base is None or not base["median"]:
+            rows.append((result, None, None, False))
+            continue
+        change = (result["median"] - base["median"]) / base["median"]
+        worse = change if result["better"] == "lower" else -change
+        rows.append((result, base["median"], change, worse > threshold))
+    return rows
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=list(GROUPS))
+    parser.add_argument("--quick", action="store_true", help="small sizes for a fast smoke run")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--sizes", type=int, nargs="+")
+    parser.add_argument("--densities", type=float, nargs="+", default=[0.1, 0.2, 0.3])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--fleets", type=int, nargs="+")
+    parser.add_argument("--ticks", type=int, default=30, help="timed ticks per fleet size")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="relative slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    sizes = args.sizes or ([10, 50] if args.quick else [10, 100, 500])
+    fleets = args.fleets or ([2, 100] if args.quick else [2, 100, 1000, 10000])
+
+    results = []
+    if "astar" in args.only:
+        results += bench_astar(sizes, args.densities, args.repeat, args.seed)
+    if "step" in args.only:
+        results += bench_step(fleets, args.ticks, args.seed)
+    if "api" in args.only:
+        results += bench_api(args.requests // (4 if args.quick else 1))
+
+    report = {
+        "meta": {
+            "time": time.time(),
+            "git": _git_revision(),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "grid_size": config.GRID_SIZE,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    rows = compare(results, baseline or {}, args.threshold)
+
+    print(f"{'benchmark':<36} {'median':>12} {'unit':>6} {'baseline':>12} {'change':>8}")
+    regressions = 0
+    for result, base, change, regressed in rows:
+        base_text = f"{base:.3f}" if base is not None else "-"
+        change_text = f"{change:+.1%}" if change is not None else "-"
+        flag = "  REGRESSION" if regressed else ""
+        regressions += regressed
+        print(f"{result['name']:<36} {result['median']:>12.3f} {result['unit']:>6} "
+              f"{base_text:>12} {change_text:>8}{flag}")
+    if regressions:
+        print(f"{regressions} regression(s) above {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ CELL_SIZE = 60          # each cell = 60 pixels
 
 # Simulation parameters
 FPS = 60                # backend won't use this, pygame did
+NUM_DRONES = 2          # drones created by backend.simulation.Simulation
 
 # UI layout (used only in original pygame)
 LEFT_PANEL_WIDTH = 400
@@ -20,4 +21,70 @@ REWARD_AVOID = 1.0            # positive for successful obstacle avoidance (repl
 REWARD_BLOCKED = -5.0         # penalty when no path can be found
 REWARD_LOW_BATTERY = -3.0
 REWARD_RETURN_BASE = 2.0
-REWARD_SHORT_PATH_MULTIPLIER = 0.5  # bonus multiplied by (GRID_SIZE - path_len)
\ No newline at end of file
+REWARD_SHORT_PATH_MULTIPLIER = 0.5  # bonus multiplied by (GRID_SIZE - path_len)
+
+# --- Path planning ---
+PATH_CACHE_SIZE = 1024        # max (start, goal) entries in the shared path cache
+INCREMENTAL_REPLANNING = False  # drones repair a per-drone D* Lite search instead of re-running A*
+OBSTACLE_CHANGE_LOG = 1024      # obstacle toggles remembered for D* Lite catch-up (older: full grid diff)
+ROUTING_TABLES = False        # precompute routes for the current obstacles (for mostly static maps)
+ROUTING_ALL_PAIRS_MAX_CELLS = 1024  # up to this many cells: all-pairs tables; above: ALT landmarks
+ROUTING_LANDMARKS = 8         # landmarks for the ALT heuristic on larger grids
+ROUTING_BACKGROUND = True     # rebuild routing tables in a background thread after map changes
+HPA_MIN_GRID = 256            # grids at least this wide plan hierarchically (clusters + entrance graph)
+HPA_CLUSTER_SIZE = 16         # cluster side in cells for hierarchical planning
+HPA_HEURISTIC_WEIGHT = 1.1    # >1: visit fewer clusters on long routes, routes up to this factor longer
+
+# --- Cooperative routing ---
+COOPERATIVE_ROUTING = False   # drones route around each other with a space-time reservation table
+COOP_WINDOW = 8               # cell steps reserved per plan; re-reserved after half of them are flown
+
+# --- State streaming (/ws) ---
+STREAM_POLL_INTERVAL = 0.05   # seconds between checks for a new simulation revision
+STREAM_SNAPSHOT_EVERY = 50    # every Nth message is a full snapshot for resync
+STREAM_HISTORY = 64           # messages kept for viewers that fall behind
+STREAM_LOG_TAIL = 50          # log lines included in a snapshot
+
+# --- Server tick loop ---
+TICK_AUTOSTART = True         # start the fixed-rate loop with the FastAPI app
+TICK_RATE_HZ = 8.0            # simulation ticks per second (~the old 120 ms client timer)
+TICK_POLICY = "skip"          # on overload: "skip" missed ticks or "catchup" (run them back to back)
+TICK_MAX_CATCHUP = 5          # ticks replayed at most per overrun with "catchup"
+TICK_STATS_WINDOW = 256       # ticks kept for duration / jitter stats
+FAST_FORWARD_MAX_TICKS = 10000  # largest POST /fast_forward (it holds the simulation lock throughout)
+
+# --- Event log ---
+LOG_CAPACITY = 1000           # events kept in the ring buffer
+LOG_STATE_TAIL = 20           # newest log lines included in /state
+
+# --- Batched task assignment ---
+ASSIGN_CANDIDATES = 8         # nearest idle drones considered per task
+ASSIGN_MAX_EXPANDED = 20000   # cells searched per task; farther drones are ranked by Manhattan distance
+
+# --- Q-learning (strategic decisions) ---
+Q_TABLE_SHARED = False        # all drones learn into one table instead of one slice each
+Q_TABLE_PATH = None           # .npy table (e.g. from train.py) loaded by Simulation if present
+Q_TABLE_MAX_BYTES = 64 * 1024 * 1024  # above this, blocks of cells share a Q state (large grids)
+
+# --- Record / replay ---
+RANDOM_SEED = None            # seed of Simulation.rng (None: a fresh one per start, recorded in journals)
+JOURNAL_PATH = None           # append every mutating call to this journal file (None disables)
+JOURNAL_CHECK_EVERY = 100     # ticks between state digests in the journal
+
+# --- Snapshots ---
+SNAPSHOT_PATH = None          # checkpoint file; restored at startup if present (None disables)
+SNAPSHOT_INTERVAL = 5.0       # seconds between checkpoints while the server runs
+SNAPSHOT_COMPRESS = True      # zlib-compress checkpoint files
+
+# --- Metrics / profiling ---
+METRICS_ENABLED = True        # per-tick phase timings, lock waits and search counters at /metrics
+PROFILER_INTERVAL = 0.005     # seconds between stack samples of the opt-in profiler (/profile/start)
+PROFILER_PATH = "profile.folded"  # collapsed-stack file written by /profile/stop (flamegraph.pl, speedscope)
+
+# --- Sessions ---
+SESSION_MAX = 32              # sessions besides the default one (POST /sessions answers 429 beyond)
+SESSION_IDLE_TIMEOUT = 900.0  # seconds without requests or /ws viewers before a session is evicted
+SESSION_REAP_INTERVAL = 30.0  # seconds between idle / memory checks
+SESSION_MAX_DRONES = 10000    # drones per session
+SESSION_MAX_BYTES = 256 * 1024 * 1024  # estimated memory per session: caches dropped, then evicted
+SESSION_WORKERS = 0           # >0: host new sessions in this many worker processes
@@ -1,31 +1,91 @@
-import React, { useEffect, useState, useRef } from "react";
+import React, { useEffect, useState } from "react";
 import axios from "axios";
 
 const BACKEND = process.env.REACT_APP_BACKEND || "http://localhost:8000";
+const WS_URL = BACKEND.replace(/^http/, "ws") + "/ws";
+const LOG_LIMIT = 200;
+
+// Expand the server's packed obstacle bitmap (base64, row-major, MSB first)
+function decodeObstacles(packed, gridSize) {
+  const bytes = atob(packed);
+  const obstacles = [];
+  for (let i = 0; i < gridSize * gridSize; i++) {
+    if ((bytes.charCodeAt(i >> 3) >> (7 - (i & 7))) & 1) {
+      obstacles.push({ row: Math.floor(i / gridSize), col: i % gridSize });
+    }
+  }
+  return obstacles;
+}
+
+// Row letters as the server parses them: A..Z, AA..ZZ, AAA...
+function rowLabel(row) {
+  let letters = "";
+  for (let n = row + 1; n > 0; n = Math.floor((n - 1) / 26)) {
+    letters = String.fromCharCode(65 + ((n - 1) % 26)) + letters;
+  }
+  return letters;
+}
+
+function fromServer(state) {
+  return { ...state, obstacles: decodeObstacles(state.obstacles, state.grid_size) };
+}
+
+// Merge a /ws message (full snapshot or per-tick delta) into the current state
+function applyMessage(prev, msg) {
+  if (msg.type === "snapshot") return fromServer(msg.state);
+  if (!prev) return prev;
+
+  const drones = new Map(prev.drones.map((d) => [d.id, d]));
+  msg.drones.forEach((d) => drones.set(d.id, d));
+  msg.removed_drones.forEach((id) => drones.delete(id));
+
+  const removed = new Set(msg.obstacles_removed.map((o) => `${o.row}-${o.col}`));
+  const obstacles = prev.obstacles
+    .filter((o) => !removed.has(`${o.row}-${o.col}`))
+    .concat(msg.obstacles_added);
+
+  return {
+    ...prev,
+    ...msg.meta,
+    drones: [...drones.values()],
+    obstacles,
+    logs: prev.logs.concat(msg.logs).slice(-LOG_LIMIT),
+    log_seq: msg.log_seq
+  };
+}
 
 function App() {
   const [state, setState] = useState(null);
-  const intervalRef = useRef(null);
 
   useEffect(() => {
-    fetchState();
+    let socket = null;
+    let closed = false;
+
+    function connect() {
+      socket = new WebSocket(WS_URL);
+      socket.onmessage = (ev) => {
+        const msg = JSON.parse(ev.data);
+        setState((prev) => applyMessage(prev, msg));
+      };
+      socket.onclose = () => {
+        if (!closed) setTimeout(connect, 1000);
+      };
+    }
 
-    intervalRef.current = setInterval(async () => {
-      try {
-        const res = await axios.post(`${BACKEND}/step`);
-        setState(res.data);
-      } catch {
-        fetchState();
-      }
-    }, 120);
+    // the server tick loop advances the simulation; state arrives over /ws
+    fetchState();
+    connect();
 
-    return () => clearInterval(intervalRef.current);
+    return () => {
+      closed = true;
+      if (socket) socket.close();
+    };
   }, []);
 
   async function fetchState() {
     try {
       const res = await axios.get(`${BACKEND}/state`);
-      setState(res.data);
+      setState(fromServer(res.data));
     } catch (err) {
       console.error("Error fetching state:", err);
     }
@@ -33,12 +93,10 @@ function App() {
 
   async function toggleObstacle(label) {
     await axios.post(`${BACKEND}/toggle_obstacle`, { label });
-    fetchState();
   }
 
   async function assignTask(pickup, drop) {
     await axios.post(`${BACKEND}/assign_task`, { pickup, drop });
-    fetchState();
   }
 
   if (!state)
@@ -68,7 +126,7 @@ function App() {
             [...Array(gridSize)].map((__, c) => {
               const left = c * cellSize;
               const top = r * cellSize;
-              const label = `${String.fromCharCode(65 + r)}${c + 1}`;
+              const label = `${rowLabel(r)}${c + 1}`;
               const key = `cell-${r}-${c}`;
               const isObs = obsSet.has(`${r}-${c}`);
 
@@ -129,6 +187,9 @@ function App() {
         <button onClick={fetchState} style={{ marginLeft: 8 }}>
           Refresh
         </button>
+        <button onClick={() => axios.post(`${BACKEND}/step`)} style={{ marginLeft: 8 }}>
+          Step
+        </button>
 
         <h3 style={{ marginTop: 20 }}>Assign Delivery Task</h3>
         <TaskForm onAssign={assignTask} />
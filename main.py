@@ -8,6 +8,8 @@ This project is now structured as:
 To run:
 1. Start backend: uvicorn backend.main:app --reload
 2. Start frontend: npm start (inside frontend/)
+
+Headless RL training (no server): python train.py --episodes 256
 """
 
 print("This project now uses FastAPI backend + React frontend.")
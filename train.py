@@ -0,0 +1,151 @@
+"""Headless Q-learning runner.
+
+Runs many independent Simulation episodes without the API or the UI, feeding
+them scripted tasks and obstacle changes, spread over a process pool. Every
+episode is seeded from ``--seed`` and its index, so a run is reproducible no
+matter how episodes land on workers. The drones' strategic Q-tables are
+merged across all episodes and written to ``--out`` as a .npy QTable (point
+config.Q_TABLE_PATH at it to start the server from it).
+
+    python train.py --episodes 256 --workers 8
+"""
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import config
+from aiml.qtable import QTable
+from backend.simulation import Simulation, coord_to_label
+
+# episodes per worker task; fixed so the merge order (and so the float sums)
+# does not depend on the number of workers
+BATCH_SIZE = 4
+
+
+def _label(cell):
+    # Simulation.assign_task / toggle_obstacle_by_label still take "A1" labels
+    return coord_to_label(*cell)
+
+
+def _random_cell(rng, size):
+    return (rng.randrange(size), rng.randrange(size))
+
+
+def run_episode(seed, settings):
+    """Play one scripted episode; returns (stats, Q values of shape (agents, states, actions))."""
+    # the simulation seeds its own RNG (drone exploration); ``rng`` scripts the inputs
+    rng = random.Random(seed)
+    sim = Simulation(settings["drones"], seed=seed)
+    size = sim.grid_size
+
+    for _ in range(settings["obstacles"]):
+        sim.toggle_obstacle_by_label(_label(_random_cell(rng, size)))
+
+    delivered = 0
+    for tick in range(settings["ticks"]):
+        if tick % settings["task_every"] == 0:
+            pickup = _random_cell(rng, size)
+            drop = _random_cell(rng, size)
+            if pickup not in sim.obstacle_grid_coords and drop not in sim.obstacle_grid_coords:
+                sim.assign_task(_label(pickup), _label(drop))
+        if settings["churn_every"] and tick and tick % settings["churn_every"] == 0:
+            sim.toggle_obstacle_by_label(_label(_random_cell(rng, size)))
+        for msg in sim.step():
+            if "delivered" in msg:
+                delivered += 1
+
+    stats = {
+        "delivered": delivered,
+        "reward": sum(d.reward_total for d in sim.drones),
+    }
+    return stats, sim.q_table.values
+
+
+def run_batch(seeds, settings):
+    """Worker entry point: play ``seeds`` and pre-merge their Q-tables."""
+    totals = None
+    counts = None
+    delivered = 0
+    reward = 0.0
+    for seed in seeds:
+        stats, values = run_episode(seed, settings)
+        delivered += stats["delivered"]
+        reward += stats["reward"]
+        # only entries a drone actually updated (non-zero) count towards the average
+        touched = values != 0.0
+        if totals is None:
+            totals = np.zeros(values.shape[1:])
+            counts = np.zeros(values.shape[1:], dtype=np.int64)
+        totals += np.where(touched, values, 0.0).sum(axis=0)
+        counts += touched.sum(axis=0)
+    return {"episodes": len(seeds), "delivered": delivered, "reward": reward,
+            "totals": totals, "counts": counts}
+
+
+def merge(batches):
+    """Average every (state, action) over the drones that updated it."""
+    totals = sum(b["totals"] for b in batches)
+    counts = sum(b["counts"] for b in batches)
+    table = QTable(totals.shape[0], totals.shape[1])
+    np.divide(totals, counts, out=table.values[0], where=counts > 0)
+    return table
+
+
+def train(episodes, workers, seed, settings):
+    seeds = [seed + i for i in range(episodes)]
+    batches = [seeds[i:i + BATCH_SIZE] for i in range(0, episodes, BATCH_SIZE)]
+
+    started = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_batch, batches, [settings] * len(batches)))
+    else:
+        results = [run_batch(b, settings) for b in batches]
+    elapsed = time.perf_counter() - started
+
+    return {
+        "episodes": episodes,
+        "seconds": elapsed,
+        "episodes_per_second": episodes / elapsed if elapsed > 0 else None,
+        "delivered": sum(r["delivered"] for r in results),
+        "mean_reward": sum(r["reward"] for r in results) / max(1, episodes),
+        "q_table": merge(results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--episodes", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ticks", type=int, default=2000, help="simulation steps per episode")
+    parser.add_argument("--drones", type=int, default=getattr(config, "NUM_DRONES", 2))
+    parser.add_argument("--obstacles", type=int, default=10, help="random obstacles placed at episode start")
+    parser.add_argument("--task-every", type=int, default=60, help="ticks between scripted tasks")
+    parser.add_argument("--churn-every", type=int, default=200,
+                        help="ticks between random obstacle toggles (0 disables)")
+    parser.add_argument("--out", default="q_table.npy")
+    args = parser.parse_args()
+
+    settings = {
+        "ticks": args.ticks,
+        "drones": args.drones,
+        "obstacles": args.obstacles,
+        "task_every": args.task_every,
+        "churn_every": args.churn_every,
+    }
+    result = train(args.episodes, args.workers, args.seed, settings)
+
+    result["q_table"].save(args.out)
+
+    print(f"{result['episodes']} episodes in {result['seconds']:.2f}s "
+          f"({result['episodes_per_second']:.1f} episodes/s, {args.workers} workers)")
+    print(f"delivered {result['delivered']}, mean reward {result['mean_reward']:.2f}, Q-table -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
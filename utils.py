@@ -27,6 +27,16 @@ def grid_to_pixel_center(pos):
     return (x, y)
 
 
+def drone_home(index):
+    """
+    Pixel start position of the index-th drone: cell centers along row A,
+    wrapping to the next row (and back to A1 once the grid is full).
+    """
+    cell = index % (config.GRID_SIZE * config.GRID_SIZE)
+    row, col = divmod(cell, config.GRID_SIZE)
+    return grid_to_pixel_center((row, col))
+
+
 def get_cell_center(grid_cells, label):
     """
     Use the REAL grid cell coordinates directly.